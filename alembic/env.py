@@ -8,6 +8,9 @@ import app.models.Role
 import app.models.UserOrganizations
 import app.models.Cluster
 import app.models.Deployment
+import app.models.Node
+import app.models.DeploymentOutbox
+import app.models.DeploymentArchive
 
 from logging.config import fileConfig
 from alembic import context
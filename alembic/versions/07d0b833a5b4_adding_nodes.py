@@ -0,0 +1,51 @@
+"""adding nodes
+
+Revision ID: 07d0b833a5b4
+Revises: a5802e9c79ad
+Create Date: 2025-06-02 10:12:41.318204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '07d0b833a5b4'
+down_revision: Union[str, None] = 'a5802e9c79ad'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('nodes',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('cluster_id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=100), nullable=False),
+    sa.Column('total_cpu', sa.Float(), nullable=False),
+    sa.Column('total_ram', sa.Integer(), nullable=False),
+    sa.Column('total_gpu', sa.Integer(), nullable=False),
+    sa.Column('available_cpu', sa.Float(), nullable=False),
+    sa.Column('available_ram', sa.Integer(), nullable=False),
+    sa.Column('available_gpu', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.CheckConstraint('available_cpu >= 0 AND available_cpu <= total_cpu', name='ck_node_cpu'),
+    sa.CheckConstraint('available_ram >= 0 AND available_ram <= total_ram', name='ck_node_ram'),
+    sa.CheckConstraint('available_gpu >= 0 AND available_gpu <= total_gpu', name='ck_node_gpu'),
+    sa.ForeignKeyConstraint(['cluster_id'], ['clusters.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('cluster_id', 'name', name='uq_cluster_node_name')
+    )
+    op.create_index('ix_nodes_cluster_id', 'nodes', ['cluster_id'], unique=False)
+    op.add_column('deployments', sa.Column('node_id', sa.Integer(), nullable=True))
+    op.create_foreign_key('fk_deployments_node_id', 'deployments', 'nodes', ['node_id'], ['id'], ondelete='SET NULL')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_constraint('fk_deployments_node_id', 'deployments', type_='foreignkey')
+    op.drop_column('deployments', 'node_id')
+    op.drop_index('ix_nodes_cluster_id', table_name='nodes')
+    op.drop_table('nodes')
@@ -0,0 +1,41 @@
+"""any cluster deployments
+
+Revision ID: 3c1e9a7f52d4
+Revises: 07d0b833a5b4
+Create Date: 2025-06-04 15:27:09.481377
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3c1e9a7f52d4'
+down_revision: Union[str, None] = '07d0b833a5b4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('deployments', sa.Column('organization_id', sa.Integer(), nullable=True))
+    op.add_column('deployments', sa.Column('any_cluster', sa.Boolean(), server_default=sa.false(), nullable=False))
+    op.create_foreign_key('fk_deployments_organization_id', 'deployments', 'organizations', ['organization_id'], ['id'], ondelete='CASCADE')
+    op.create_index('ix_deploy_organization_id', 'deployments', ['organization_id'], unique=False)
+    op.execute(
+        "UPDATE deployments SET organization_id = clusters.organization_id "
+        "FROM clusters WHERE clusters.id = deployments.cluster_id"
+    )
+    op.alter_column('deployments', 'cluster_id', existing_type=sa.Integer(), nullable=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DELETE FROM deployments WHERE cluster_id IS NULL")
+    op.alter_column('deployments', 'cluster_id', existing_type=sa.Integer(), nullable=False)
+    op.drop_index('ix_deploy_organization_id', table_name='deployments')
+    op.drop_constraint('fk_deployments_organization_id', 'deployments', type_='foreignkey')
+    op.drop_column('deployments', 'any_cluster')
+    op.drop_column('deployments', 'organization_id')
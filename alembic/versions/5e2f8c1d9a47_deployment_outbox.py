@@ -0,0 +1,41 @@
+"""deployment outbox
+
+Revision ID: 5e2f8c1d9a47
+Revises: 9b4d2e61c8a0
+Create Date: 2025-06-09 14:03:27.540981
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5e2f8c1d9a47'
+down_revision: Union[str, None] = '9b4d2e61c8a0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('deployment_outbox',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('deployment_id', sa.Integer(), nullable=False),
+    sa.Column('payload', sa.JSON(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('delivered_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['deployment_id'], ['deployments.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_outbox_pending', 'deployment_outbox', ['id'], unique=False,
+                    postgresql_where=sa.text('delivered_at IS NULL'))
+    op.create_index('ix_outbox_deployment_id', 'deployment_outbox', ['deployment_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_outbox_deployment_id', table_name='deployment_outbox')
+    op.drop_index('ix_outbox_pending', table_name='deployment_outbox')
+    op.drop_table('deployment_outbox')
@@ -0,0 +1,34 @@
+"""deployment gangs
+
+Revision ID: 9b4d2e61c8a0
+Revises: 3c1e9a7f52d4
+Create Date: 2025-06-06 09:41:52.117530
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9b4d2e61c8a0'
+down_revision: Union[str, None] = '3c1e9a7f52d4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('deployments', sa.Column('gang_id', sa.String(length=64), nullable=True))
+    op.add_column('deployments', sa.Column('gang_size', sa.Integer(), nullable=True))
+    op.create_check_constraint('ck_gang_size_pos', 'deployments', 'gang_size IS NULL OR gang_size >= 1')
+    op.create_index('ix_deploy_gang_id', 'deployments', ['gang_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_deploy_gang_id', table_name='deployments')
+    op.drop_constraint('ck_gang_size_pos', 'deployments', type_='check')
+    op.drop_column('deployments', 'gang_size')
+    op.drop_column('deployments', 'gang_id')
@@ -0,0 +1,36 @@
+"""deployment hot query indexes
+
+Revision ID: c81f4a2b6d3e
+Revises: 5e2f8c1d9a47
+Create Date: 2025-06-11 10:22:45.318604
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c81f4a2b6d3e'
+down_revision: Union[str, None] = '5e2f8c1d9a47'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_deploy_cluster_status', 'deployments', ['cluster_id', 'status'], unique=False)
+    op.drop_index('ix_deploy_cluster_id', table_name='deployments')
+    op.create_index('ix_deploy_running', 'deployments', ['cluster_id'], unique=False,
+                    postgresql_where=sa.text("status = 'RUNNING'"))
+    op.create_index('ix_deploy_queued', 'deployments', ['cluster_id'], unique=False,
+                    postgresql_where=sa.text("status = 'QUEUED'"))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_deploy_queued', table_name='deployments')
+    op.drop_index('ix_deploy_running', table_name='deployments')
+    op.create_index('ix_deploy_cluster_id', 'deployments', ['cluster_id'], unique=False)
+    op.drop_index('ix_deploy_cluster_status', table_name='deployments')
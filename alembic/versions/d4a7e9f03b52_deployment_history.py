@@ -0,0 +1,62 @@
+"""deployment history
+
+Revision ID: d4a7e9f03b52
+Revises: c81f4a2b6d3e
+Create Date: 2025-06-12 16:47:09.204311
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd4a7e9f03b52'
+down_revision: Union[str, None] = 'c81f4a2b6d3e'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('deployment_history',
+    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('owner_id', sa.Integer(), nullable=False),
+    sa.Column('cluster_id', sa.Integer(), nullable=True),
+    sa.Column('organization_id', sa.Integer(), nullable=True),
+    sa.Column('any_cluster', sa.Boolean(), nullable=False),
+    sa.Column('gang_id', sa.String(length=64), nullable=True),
+    sa.Column('gang_size', sa.Integer(), nullable=True),
+    sa.Column('node_id', sa.Integer(), nullable=True),
+    sa.Column('image', sa.String(length=255), nullable=False),
+    sa.Column('required_cpu', sa.Float(), nullable=False),
+    sa.Column('required_ram', sa.Integer(), nullable=False),
+    sa.Column('required_gpu', sa.Integer(), nullable=False),
+    sa.Column('priority', postgresql.ENUM('HIGH', 'LOW', name='priority_level', create_type=False), nullable=False),
+    sa.Column('status', postgresql.ENUM('QUEUED', 'RUNNING', 'COMPLETED', 'FAILED', name='deployment_status', create_type=False), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('started_at', sa.DateTime(), nullable=True),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.Column('retry_count', sa.Integer(), nullable=False),
+    sa.Column('archived_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['cluster_id'], ['clusters.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['node_id'], ['nodes.id'], ondelete='SET NULL'),
+    sa.ForeignKeyConstraint(['organization_id'], ['organizations.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['owner_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_history_owner_id', 'deployment_history', ['owner_id'], unique=False)
+    op.create_index('ix_history_cluster_id', 'deployment_history', ['cluster_id'], unique=False)
+    op.create_index('ix_history_organization_id', 'deployment_history', ['organization_id'], unique=False)
+    op.create_index('ix_history_finished_at', 'deployment_history', ['finished_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_history_finished_at', table_name='deployment_history')
+    op.drop_index('ix_history_organization_id', table_name='deployment_history')
+    op.drop_index('ix_history_cluster_id', table_name='deployment_history')
+    op.drop_index('ix_history_owner_id', table_name='deployment_history')
+    op.drop_table('deployment_history')
@@ -1,8 +1,10 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, Header, HTTPException, Request
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.core.database import AsyncSessionLocal
 from app.core.jwt import auth
-from app.schemas.cluster import ClusterCreate, ClusterRead
+from app.core.status_stream import event_stream
+from app.schemas.cluster import ClusterCreate, ClusterRead, ClusterStatusRead, NodeCreate, NodeRead
 from app.crud.cluster import (
     create_cluster,
     list_clusters,
@@ -10,10 +12,12 @@ from app.crud.cluster import (
     delete_cluster,
     get_cluster_status,
     list_cluster_deployments,
+    add_node,
+    list_nodes,
 )
-from app.crud.org import get_user_org_membership
+from app.crud.org import get_membership_role
 from app.models.Role import RoleEnum
-from typing import List
+from typing import List, Optional
 
 async def get_async_db():
     async with AsyncSessionLocal() as session:
@@ -30,8 +34,8 @@ async def create_cluster_endpoint(
     org_id = getattr(data, 'organization_id', None)
     if org_id is None:
         raise HTTPException(status_code=400, detail="organization_id is required in the request body")
-    membership = await get_user_org_membership(db, current_user.id, org_id)
-    if not membership or membership.role != RoleEnum.Admin:
+    role = await get_membership_role(db, current_user.id, org_id)
+    if role != RoleEnum.Admin:
         raise HTTPException(status_code=403, detail="Only Admins can create clusters in this organization")
     return await create_cluster(db, current_user.id, org_id, data)
 
@@ -58,12 +62,12 @@ async def delete_cluster_endpoint(
 ):
     cluster = await get_cluster(db, current_user, cluster_id)
     org_id = cluster.organization_id
-    membership = await get_user_org_membership(db, current_user.id, org_id)
-    if not membership or membership.role != RoleEnum.Admin:
+    role = await get_membership_role(db, current_user.id, org_id)
+    if role != RoleEnum.Admin:
         raise HTTPException(status_code=403, detail="Only Admins can delete clusters in this organization")
     await delete_cluster(db, current_user, cluster_id)
 
-@router.get("/{cluster_id}/status", name="get_cluster_status")
+@router.get("/{cluster_id}/status", response_model=ClusterStatusRead, name="get_cluster_status")
 async def get_cluster_status_endpoint(
     cluster_id: int,
     db: AsyncSession = Depends(get_async_db),
@@ -71,6 +75,22 @@ async def get_cluster_status_endpoint(
 ):
     return await get_cluster_status(db, current_user, cluster_id)
 
+@router.get("/{cluster_id}/events", name="stream_cluster_events")
+async def stream_cluster_events_endpoint(
+    cluster_id: int,
+    request: Request,
+    db: AsyncSession = Depends(get_async_db),
+    current_user=Depends(auth),
+    last_event_id: Optional[str] = Header(None, alias="Last-Event-ID"),
+):
+    await get_cluster(db, current_user, cluster_id)
+    await db.close()  # the stream can stay open for hours; don't hold a DB connection
+    return StreamingResponse(
+        event_stream(request, cluster_id=cluster_id, last_event_id=last_event_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 @router.get("/{cluster_id}/deployments", name="list_cluster_deployments")
 async def list_cluster_deployments_endpoint(
     cluster_id: int,
@@ -79,3 +99,23 @@ async def list_cluster_deployments_endpoint(
 ):
     return await list_cluster_deployments(db, current_user, cluster_id)
 
+@router.post("/{cluster_id}/nodes", response_model=NodeRead, name="add_node")
+async def add_node_endpoint(
+    cluster_id: int,
+    data: NodeCreate,
+    db: AsyncSession = Depends(get_async_db),
+    current_user=Depends(auth),
+):
+    cluster = await get_cluster(db, current_user, cluster_id)
+    role = await get_membership_role(db, current_user.id, cluster.organization_id)
+    if role != RoleEnum.Admin:
+        raise HTTPException(status_code=403, detail="Only Admins can add nodes to clusters in this organization")
+    return await add_node(db, cluster, data)
+
+@router.get("/{cluster_id}/nodes", response_model=List[NodeRead], name="list_nodes")
+async def list_nodes_endpoint(
+    cluster_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    current_user=Depends(auth),
+):
+    return await list_nodes(db, current_user, cluster_id)
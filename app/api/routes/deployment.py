@@ -1,29 +1,34 @@
 # app/api/routes/deployment.py
 
-from fastapi import APIRouter, Depends, HTTPException, status, Path
+from fastapi import APIRouter, Depends, Header, HTTPException, Request, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.future import select
-from sqlalchemy import and_
-from typing import List
+from typing import List, Optional
 
-from app.core.database import AsyncSessionLocal
+from app.core.database import get_async_db
 from app.core.jwt import auth
+from app.core.access import DeploymentAccess, deployment_access, load_cluster_access, readable_deployment
+from app.core.status_stream import event_stream
 from app.models.Role import RoleEnum
-from app.schemas.deployment import DeploymentCreate, DeploymentRead, DeploymentDeleteRequest
+from app.models.Deployment import DeploymentStatus
+from app.schemas.deployment import (
+    DeploymentCreate, DeploymentRead, DeploymentDeleteRequest, DeploymentBatchCreate, DeploymentBatchResult,
+    DeploymentFinishRequest
+)
 from app.crud.deployment import (
     create_deployment,
+    create_any_cluster_deployment,
+    create_deployments_batch,
     list_deployments,
-    get_deployment as get_deployment_crud,
+    precheck_capacity,
+    finish_deployment,
     delete_deployment as delete_deployment_crud,
 )
 from app.crud.cluster import get_cluster
-from app.models.UserOrganizations import UserOrganization
-from app.models.Deployment import Deployment
-from app.models.Cluster import Cluster
+from app.crud.org import get_membership_role
 
-async def get_async_db():
-    async with AsyncSessionLocal() as session:
-        yield session
+# get_async_db is shared with auth and the access dependencies, so a request
+# uses one session and the objects they loaded are not fetched again
 
 router = APIRouter()
 
@@ -39,21 +44,33 @@ async def create_deployment_endpoint(
     current_user=Depends(auth),
 ):
     cluster_id = data.cluster_id
-    cluster = await get_cluster(db, current_user, cluster_id)
-    org_id = cluster.organization_id
-    result = await db.execute(
-        select(UserOrganization).where(
-            and_(
-                UserOrganization.user_id == current_user.id,
-                UserOrganization.organization_id == org_id
-            )
-        )
-    )
-    membership = result.scalars().first()
-    if not membership or membership.role not in [RoleEnum.Developer, RoleEnum.Admin]:
+    if cluster_id is not None:
+        await precheck_capacity(current_user.id, cluster_id, data)
+        access = await load_cluster_access(db, current_user.id, cluster_id)
+        org_id, role = access.organization_id, access.role
+    elif data.organization_id is not None:
+        org_id = data.organization_id
+        role = await get_membership_role(db, current_user.id, org_id)
+    else:
+        raise HTTPException(status_code=400, detail="Either cluster_id or organization_id is required")
+    if role not in [RoleEnum.Developer, RoleEnum.Admin]:
         raise HTTPException(status_code=403, detail="Only Developers or Admins can create deployments in this organization")
+    if cluster_id is None:
+        return await create_any_cluster_deployment(db, current_user.id, org_id, data)
     return await create_deployment(db, current_user.id, org_id, cluster_id, data)
 
+@router.post("/batch", response_model=DeploymentBatchResult, name="create_deployments_batch")
+async def create_deployments_batch_endpoint(
+    data: DeploymentBatchCreate,
+    db: AsyncSession = Depends(get_async_db),
+    current_user=Depends(auth),
+):
+    results = await create_deployments_batch(db, current_user.id, data.deployments)
+    return {
+        "created": sum(r["status_code"] == status.HTTP_201_CREATED for r in results),
+        "results": results
+    }
+
 @router.get("", response_model=List[DeploymentRead], name="list_deployments")
 async def list_deployments_endpoint(
     cluster_id: int,
@@ -66,11 +83,23 @@ async def list_deployments_endpoint(
 
 @router.get("/{deployment_id}", response_model=DeploymentRead, name="get_deployment")
 async def get_deployment_endpoint(
-    deployment_id: int = Path(..., description="Deployment ID"),
+    access: DeploymentAccess = Depends(readable_deployment),
+):
+    return access.deployment
+
+@router.get("/{deployment_id}/events", name="stream_deployment_events")
+async def stream_deployment_events_endpoint(
+    request: Request,
+    access: DeploymentAccess = Depends(readable_deployment),
     db: AsyncSession = Depends(get_async_db),
-    current_user=Depends(auth),
+    last_event_id: Optional[str] = Header(None, alias="Last-Event-ID"),
 ):
-    return await get_deployment_crud(db, current_user.id, deployment_id)
+    await db.close()  # the stream can stay open for hours; don't hold a DB connection
+    return StreamingResponse(
+        event_stream(request, deployment_id=access.deployment.id, last_event_id=last_event_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 @router.post(
     "/{deployment_id}",
@@ -79,42 +108,27 @@ async def get_deployment_endpoint(
 )
 async def delete_deployment_endpoint(
     request_body: DeploymentDeleteRequest,
-    deployment_id: int = Path(..., description="Deployment ID"),
+    access: DeploymentAccess = Depends(deployment_access),
     db: AsyncSession = Depends(get_async_db),
-    current_user=Depends(auth),
 ):
-    cluster_id = request_body.cluster_id
-
-    result = await db.execute(
-        select(Deployment).where(Deployment.id == deployment_id)
-    )
-    dep = result.scalars().first()
-    if not dep:
-        raise HTTPException(status_code=404, detail="Deployment not found")
-
-    if dep.cluster_id != cluster_id:
+    dep = access.deployment
+    if dep.cluster_id != request_body.cluster_id:
         raise HTTPException(status_code=400, detail="Deployment does not belong to the specified cluster")
 
-    result = await db.execute(
-        select(Cluster).where(Cluster.id == cluster_id)
-    )
-    cluster = result.scalars().first()
-    if not cluster:
-        raise HTTPException(status_code=404, detail="Associated cluster not found")
-
-    org_id = cluster.organization_id
-
-    result = await db.execute(
-        select(UserOrganization).where(
-            and_(
-                UserOrganization.user_id == current_user.id,
-                UserOrganization.organization_id == org_id
-            )
-        )
-    )
-    membership = result.scalars().first()
-
-    if not (membership and membership.role in [RoleEnum.Developer, RoleEnum.Admin]) and dep.owner_id != current_user.id:
+    if not access.can_manage:
         raise HTTPException(status_code=403, detail="Not authorized to delete this deployment")
 
-    await delete_deployment_crud(db, deployment_id)
+    await delete_deployment_crud(db, dep.id)
+
+@router.post(
+    "/{deployment_id}/finish",
+    status_code=status.HTTP_202_ACCEPTED,
+    name="finish_deployment"
+)
+async def finish_deployment_endpoint(
+    request_body: DeploymentFinishRequest,
+    access: DeploymentAccess = Depends(deployment_access),
+):
+    if not access.can_manage:
+        raise HTTPException(status_code=403, detail="Not authorized to finish this deployment")
+    await finish_deployment(access.deployment, DeploymentStatus(request_body.status.value))
@@ -0,0 +1,134 @@
+# app/core/access.py
+
+from dataclasses import dataclass
+from typing import Optional
+
+from fastapi import Depends, HTTPException, Path
+from sqlalchemy import and_, case
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.core.archive import with_history
+from app.core.auth_cache import memberships
+from app.core.database import get_async_db
+from app.core.jwt import auth
+from app.models.Cluster import Cluster
+from app.models.Deployment import Deployment
+from app.models.Role import RoleEnum
+from app.models.UserOrganizations import UserOrganization
+
+MANAGER_ROLES = (RoleEnum.Developer, RoleEnum.Admin)
+
+
+@dataclass
+class ClusterAccess:
+    """A cluster owned by the user, and the user's role in its organization."""
+    cluster: Cluster
+    role: Optional[RoleEnum]
+
+    @property
+    def organization_id(self) -> int:
+        return self.cluster.organization_id
+
+
+@dataclass
+class DeploymentAccess:
+    """A deployment, the organization it belongs to and the user's role there."""
+    user_id: int
+    deployment: Deployment
+    organization_id: Optional[int]
+    role: Optional[RoleEnum]
+
+    @property
+    def is_owner(self) -> bool:
+        return self.deployment.owner_id == self.user_id
+
+    @property
+    def can_read(self) -> bool:
+        return self.is_owner or self.role is not None
+
+    @property
+    def can_manage(self) -> bool:
+        return self.is_owner or self.role in MANAGER_ROLES
+
+
+def _remember(user_id: int, org_id: Optional[int], role: Optional[RoleEnum]) -> None:
+    if org_id is not None and role is not None:
+        memberships.set((user_id, org_id), role)
+
+
+async def load_cluster_access(db: AsyncSession, user_id: int, cluster_id: int) -> ClusterAccess:
+    """Cluster and membership in one query; 404 unless the user owns the cluster."""
+    result = await db.execute(
+        select(Cluster, UserOrganization.role)
+        .outerjoin(
+            UserOrganization,
+            and_(
+                UserOrganization.user_id == user_id,
+                UserOrganization.organization_id == Cluster.organization_id
+            )
+        )
+        .where(Cluster.id == cluster_id, Cluster.owner_id == user_id)
+    )
+    row = result.first()
+    if row is None:
+        raise HTTPException(status_code=404, detail="Cluster not found or not accessible")
+    cluster, role = row
+    _remember(user_id, cluster.organization_id, role)
+    return ClusterAccess(cluster, role)
+
+
+async def load_deployment_access(
+    db: AsyncSession,
+    user_id: int,
+    deployment_id: int,
+    include_history: bool = False
+) -> DeploymentAccess:
+    """
+    Deployment, its cluster's (or, before placement, its own) organization and the
+    user's role there in one joined query. Archived deployments are only found with
+    include_history, since they can be read but not changed.
+    """
+    dep = with_history() if include_history else Deployment
+    org_id = case((dep.cluster_id.is_(None), dep.organization_id), else_=Cluster.organization_id)
+    result = await db.execute(
+        select(dep, org_id, UserOrganization.role)
+        .outerjoin(Cluster, Cluster.id == dep.cluster_id)
+        .outerjoin(
+            UserOrganization,
+            and_(
+                UserOrganization.user_id == user_id,
+                UserOrganization.organization_id == org_id
+            )
+        )
+        .where(dep.id == deployment_id)
+    )
+    row = result.first()
+    if row is None:
+        raise HTTPException(status_code=404, detail="Deployment not found")
+    deployment, org_id, role = row
+    if deployment.cluster_id is not None and org_id is None:
+        raise HTTPException(status_code=404, detail="Associated cluster not found")
+    _remember(user_id, org_id, role)
+    return DeploymentAccess(user_id, deployment, org_id, role)
+
+
+async def readable_deployment(
+    deployment_id: int = Path(..., description="Deployment ID"),
+    db: AsyncSession = Depends(get_async_db),
+    current_user=Depends(auth),
+) -> DeploymentAccess:
+    """Route dependency: a live or archived deployment the user owns or whose organization they belong to."""
+    access = await load_deployment_access(db, current_user.id, deployment_id, include_history=True)
+    if not access.can_read:
+        raise HTTPException(status_code=403, detail="Not authorized to access this deployment")
+    return access
+
+
+async def deployment_access(
+    deployment_id: int = Path(..., description="Deployment ID"),
+    db: AsyncSession = Depends(get_async_db),
+    current_user=Depends(auth),
+) -> DeploymentAccess:
+    """Route dependency: a live deployment and the user's access to it; the route decides what is allowed."""
+    return await load_deployment_access(db, current_user.id, deployment_id)
@@ -1,12 +1,63 @@
-import heapq
 from collections import deque
-from typing import List, Dict, Tuple
+from datetime import datetime
+from typing import List, Dict, Tuple, Optional
+
+from app.core.preemption import plan_preemption, job_preemption_cost
+from app.core.victim_index import PreemptionIndex, VictimIndex
+from app.core.packing import NodePacker, plan_node_preemption
+from app.core.fairshare import FairSharePolicy, usage_by_tenant
+from app.core.backfill import EasyBackfill
+from app.core.gang import group_gangs, members
+
+PREEMPTION_STRATEGIES = ("min-cost", "largest-first")
 
 def schedule_jobs(
     job_queue: List[Dict],
     running_jobs: List[Dict],
-    total_resources: Dict
+    total_resources: Dict,
+    available: Optional[Dict] = None,
+    preemption: str = "min-cost",
+    now: Optional[datetime] = None,
+    nodes: Optional[List[Dict]] = None,
+    packing: str = "best-fit",
+    fair_share: Optional[FairSharePolicy] = None,
+    tenant_usage: Optional[Dict] = None,
+    backfill: Optional[EasyBackfill] = None
 ) -> Tuple[List[Dict], List[Dict]]:
+    """
+    Schedule queued jobs on one cluster.
+
+    If the caller already tracks the cluster's free capacity it can pass it as
+    ``available``; ``running_jobs`` then only has to contain the preemptible
+    (LOW) running jobs.
+
+    ``preemption`` picks how victims are chosen when a HIGH job does not fit:
+    "min-cost" evicts the cheapest set (see app.core.preemption) and falls back
+    to "largest-first", which pops the largest LOW jobs until the job fits.
+
+    If the cluster is made of ``nodes`` (free capacity as ``cpu``/``ram``/``gpu``
+    plus ``total_*``), every job must also fit on a single node: it is placed
+    with ``packing`` (see app.core.packing) and returned with ``node_id`` set,
+    and preemption only evicts LOW jobs from the node that will host it.
+
+    With ``fair_share`` each priority class is served in Dominant Resource
+    Fairness order over organizations (and owners) instead of by score alone.
+    Shares start from ``tenant_usage`` (demand of all running jobs per
+    (organization_id, owner_id)); without it they are summed from
+    ``running_jobs``, which must then be the full running set.
+
+    With ``backfill`` (EASY backfilling) the first HIGH job that cannot start
+    even with preemption reserves the earliest time enough running jobs are
+    predicted to finish; later jobs only start if they are predicted to end
+    before then or fit in what the reserved job leaves over.
+
+    Jobs sharing a ``gang_id`` are scheduled as one unit: all ``gang_size``
+    members start together or none does (incomplete gangs are skipped), and a
+    running LOW gang is only ever preempted as a whole.
+    """
+    if preemption not in PREEMPTION_STRATEGIES:
+        raise ValueError(f"Unknown preemption strategy '{preemption}'")
+    now = now or datetime.utcnow()
 
     # 0. Normalize and filter out impossible jobs
     def normalize(j):
@@ -21,9 +72,18 @@ def schedule_jobs(
         and j['gpu'] <= total_resources['gpu']
     ]
 
-    running = [normalize(dict(j)) for j in running_jobs]
+    packer = NodePacker(nodes, packing) if nodes else None
+    if packer is not None:
+        # ...or more than the largest node
+        largest = packer.largest()
+        jobs = [j for j in jobs if fits(j, largest)]
+    # gangs become single units; a gang that lost a member above is dropped too
+    jobs = [j for j in group_gangs(jobs) if fits(j, total_resources)]
 
-    available = compute_available_resources(total_resources, running)
+    if available is None:
+        available = compute_available_resources(total_resources, running_jobs)
+    else:
+        available = dict(available)
     scheduled_jobs: List[Dict] = []
     preempted_jobs: List[Dict] = []
     
@@ -33,54 +93,121 @@ def schedule_jobs(
 
     for j in jobs:
         j['_score'] = compute_score(j)
-    for j in running:
-        j['_score'] = compute_score(j)
 
     # priority queues
-    high_queue = deque(sorted(
-        [j for j in jobs if j['priority'] == 'HIGH'],
-        key=lambda x: x['_score'],
-        reverse=True
-    ))
-    low_queue  = deque(sorted(
-        [j for j in jobs if j['priority'] == 'LOW'],
-        key=lambda x: x['_score'],
-        reverse=True
-    ))
-
-    # min‑heap of low‑priority running jobs by score (negative so largest _score comes out first)
-    low_running_heap = [(-j['_score'], j) for j in running if j['priority'] == 'LOW']
-    heapq.heapify(low_running_heap)
-    
-    preempted_job_ids = set()
+    high_jobs = [j for j in jobs if j['priority'] == 'HIGH']
+    low_jobs = [j for j in jobs if j['priority'] == 'LOW']
+    if fair_share is None:
+        high_queue = deque(sorted(high_jobs, key=lambda x: x['_score'], reverse=True))
+        low_queue = deque(sorted(low_jobs, key=lambda x: x['_score'], reverse=True))
+    else:
+        if tenant_usage is None:
+            tenant_usage = usage_by_tenant(running_jobs)
+        usage = {tenant: dict(used) for tenant, used in tenant_usage.items()}
+        high_queue = fair_share.queue(high_jobs, total_resources, usage)
+        low_queue = None  # built after the HIGH pass, from the shares it leaves
+
+    # index of low‑priority running jobs (largest score first, plus per-resource
+    # cost order for the min-cost planner), built on the first preemption attempt
+    # so cycles without one never touch the running set
+    victims = None
+
+    def build_victims():
+        low_running = group_gangs(
+            [normalize(dict(j)) for j in running_jobs if j['priority'].upper() == 'LOW'],
+            complete_only=False
+        )
+        for rj in low_running:
+            rj['_cost'] = sum(job_preemption_cost(m, now) for m in members(rj))
+        return PreemptionIndex(low_running)
+
+    # EASY backfilling: the first HIGH job that cannot start gets a reservation
+    reservation = None
+
+    def start(job, queue):
+        scheduled_jobs.extend(members(job))
+        if fair_share is not None:
+            queue.charge(job)
+        if backfill is not None:
+            for m in members(job):
+                backfill.started(m)
+            if reservation is not None:
+                reservation.account(job)
+
+    def stop(job, queue):
+        preempted_jobs.extend(members(job))
+        if fair_share is not None:
+            queue.refund(job)
+        if backfill is not None:
+            for m in members(job):
+                backfill.stopped(m)
+
+    def place(job, queue):
+        if not fits(job, available):
+            return False
+        if packer is not None and not pack_members(job, packer):
+            return False
+        allocate(job, available)
+        start(job, queue)
+        return True
+
+    def preempt_for(job):
+        nonlocal victims
+        if victims is None:
+            victims = build_victims()
+        if not victims.can_cover(job, available):
+            return False
+        if packer is not None:
+            if '_members' in job:
+                return False  # gangs on node-based clusters only start without preemption
+            plan = plan_node_preemption(job, packer, victims, preemption)
+            if plan is None or not fits_after(job, plan[1], available):
+                return False
+            node_id, to_preempt = plan
+            for pj in to_preempt:
+                packer.release(node_id, pj)
+            packer.allocate(node_id, job)
+            job['node_id'] = node_id
+        else:
+            success = False
+            if preemption == "min-cost":
+                to_preempt = plan_preemption(job, victims.candidates(job, available), available)
+                success = to_preempt is not None
+            if not success:
+                success, to_preempt = try_preempt_heap(job, victims.by_score, available)
+            if not success:
+                return False
+        for pj in to_preempt:
+            victims.remove(pj['id'])
+            deallocate(pj, available)
+            stop(pj, high_queue)
+        allocate(job, available)
+        start(job, high_queue)
+        return True
 
     # 1. Schedule HIGH priority
     while high_queue:
         job = high_queue.popleft()
-        if fits(job, available):
-            allocate(job, available)
-            scheduled_jobs.append(job)
-        else:
-            success, to_preempt = try_preempt_heap(job, low_running_heap, available, preempted_job_ids)
-            if success:
-                for pj in to_preempt:
-                    preempted_job_ids.add(id(pj))
-                    deallocate(pj, available)
-                    preempted_jobs.append(pj)
-                allocate(job, available)
-                scheduled_jobs.append(job)
-            # else: leave job un‐scheduled
+        if reservation is not None and not reservation.allows(job):
+            continue
+        if not place(job, high_queue) and not preempt_for(job):
+            # leave job un‐scheduled; the first one reserves its start time
+            if backfill is not None and reservation is None:
+                reservation = backfill.reserve(job, available)
 
     # 2. Fill in LOW priority (no preemption for low)
+    if low_queue is None:
+        low_queue = fair_share.queue(low_jobs, total_resources, usage)
     while low_queue:
         job = low_queue.popleft()
-        if fits(job, available):
-            allocate(job, available)
-            scheduled_jobs.append(job)
+        if reservation is None or reservation.allows(job):
+            place(job, low_queue)
 
     # 3. Clean up scores
-    for j in scheduled_jobs + preempted_jobs + running:
+    for j in scheduled_jobs + preempted_jobs:
         j.pop('_score', None)
+        j.pop('_cost', None)
+        j.pop('_ordinal', None)
 
     return scheduled_jobs, preempted_jobs
 
@@ -116,20 +243,47 @@ def deallocate(job: Dict, available: Dict):
     available['gpu'] += job['gpu']
 
 
+def pack_members(job: Dict, packer: NodePacker) -> bool:
+    """Place every member of ``job`` on a node, or none of them."""
+    placed = []
+    for m in members(job):
+        node_id = packer.place(m)
+        if node_id is None:
+            for pm, pn in placed:
+                packer.release(pn, pm)
+            return False
+        placed.append((m, node_id))
+    for m, node_id in placed:
+        m['node_id'] = node_id
+    return True
+
+
+def fits_after(job: Dict, to_preempt: List[Dict], available: Dict) -> bool:
+    """Whether ``job`` fits the cluster once ``to_preempt`` is evicted."""
+    freed = dict(available)
+    for pj in to_preempt:
+        deallocate(pj, freed)
+    return fits(job, freed)
+
+
 def try_preempt_heap(
     job: Dict,
-    low_running_heap: List[Tuple[int, Dict]],
-    available: Dict,
-    preempted_job_ids: set
+    low_running: VictimIndex,
+    available: Dict
 ) -> Tuple[bool, List[Dict]]:
+    """
+    Pop the largest low-priority running jobs until ``job`` fits.
+
+    On success the victims stay out of the index; otherwise they are restored.
+    Either way only the popped entries are touched (O(k log n)).
+    """
     to_remove = []
     freed_cpu = freed_ram = freed_gpu = 0
-    temp_heap = []
 
-    while low_running_heap:
-        score_neg, candidate = heapq.heappop(low_running_heap)
-        if id(candidate) in preempted_job_ids:
-            continue
+    while True:
+        candidate = low_running.pop()
+        if candidate is None:
+            break
 
         to_remove.append(candidate)
         freed_cpu += candidate['cpu']
@@ -141,11 +295,7 @@ def try_preempt_heap(
             'ram': available['ram'] + freed_ram,
             'gpu': available['gpu'] + freed_gpu,
         }):
-            for entry in low_running_heap:
-                heapq.heappush(temp_heap, entry)
-            low_running_heap[:] = temp_heap
-            heapq.heapify(low_running_heap)
             return True, to_remove
     for entry in to_remove:
-        heapq.heappush(low_running_heap, (-entry['_score'], entry))
+        low_running.restore(entry)
     return False, []
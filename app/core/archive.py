@@ -0,0 +1,85 @@
+# app/core/archive.py
+
+import asyncio
+import os
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, insert, literal, select, union_all
+from sqlalchemy.orm import aliased
+
+from app.core.database import AsyncSessionLocal
+from app.models.Deployment import Deployment, DeploymentStatus
+from app.models.DeploymentArchive import DeploymentArchive
+
+# Seconds after finishing that a COMPLETED/FAILED deployment moves to deployment_history
+ARCHIVE_AFTER = int(os.getenv("ARCHIVE_AFTER", 7 * 86400))
+# Rows moved per transaction
+ARCHIVE_BATCH_SIZE = int(os.getenv("ARCHIVE_BATCH_SIZE", 1000))
+# Seconds between archiving passes once nothing old enough is left
+ARCHIVE_INTERVAL = float(os.getenv("ARCHIVE_INTERVAL", 300))
+
+TERMINAL = (DeploymentStatus.COMPLETED, DeploymentStatus.FAILED)
+COLUMNS = [c.name for c in Deployment.__table__.columns]
+
+
+def with_history():
+    """
+    A Deployment entity over live and archived rows, for read-only queries:
+    ``select(d := with_history()).where(d.cluster_id == ...)`` returns Deployment
+    objects whichever table the rows are in.
+    """
+    history = DeploymentArchive.__table__.c
+    rows = union_all(
+        select(*Deployment.__table__.c),
+        select(*(history[name] for name in COLUMNS))
+    ).subquery("deployments_all")
+    return aliased(Deployment, rows)
+
+
+def archive_statement(older_than: int = ARCHIVE_AFTER, limit: int = ARCHIVE_BATCH_SIZE):
+    """
+    One statement that deletes up to ``limit`` old finished deployments and inserts
+    them into deployment_history. Rows are locked with SKIP LOCKED, so several
+    archivers (one per API worker) never move the same row.
+    """
+    now = datetime.utcnow()
+    batch = (
+        select(Deployment.id)
+        .where(
+            Deployment.status.in_(TERMINAL),
+            Deployment.finished_at < now - timedelta(seconds=older_than)
+        )
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+        .cte("batch")
+    )
+    moved = (
+        delete(Deployment)
+        .where(Deployment.id == batch.c.id)
+        .returning(*Deployment.__table__.c)
+        .cte("moved")
+    )
+    return insert(DeploymentArchive).from_select(
+        COLUMNS + ["archived_at"],
+        select(*(moved.c[name] for name in COLUMNS), literal(now).label("archived_at"))
+    )
+
+
+async def archive_batch(older_than: int = ARCHIVE_AFTER, limit: int = ARCHIVE_BATCH_SIZE) -> int:
+    """Move one batch to deployment_history; returns how many rows moved."""
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(archive_statement(older_than, limit))
+        await session.commit()
+    return result.rowcount
+
+
+async def run_archiver() -> None:
+    """Archive old finished deployments until cancelled, a bounded batch per transaction."""
+    while True:
+        try:
+            if await archive_batch() >= ARCHIVE_BATCH_SIZE:
+                await asyncio.sleep(0)
+                continue  # more rows are probably waiting
+        except Exception as e:
+            print(f"⚠️  Archiving failed: {e!r}")
+        await asyncio.sleep(ARCHIVE_INTERVAL)
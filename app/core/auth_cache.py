@@ -0,0 +1,83 @@
+# app/core/auth_cache.py
+
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Hashable
+
+# Seconds a resolved user or membership is served from memory
+AUTH_CACHE_TTL = float(os.getenv("AUTH_CACHE_TTL", 60))
+# Entries kept per cache; the least recently used ones are dropped first
+AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", 10000))
+
+
+class TTLCache:
+    """Least-recently-used mapping whose entries also expire ``ttl`` seconds after being set."""
+
+    def __init__(self, maxsize: int, ttl: float, clock: Callable[[], float] = time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self._entries: OrderedDict = OrderedDict()
+        self.hits = self.misses = self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires, value = entry
+            if expires > self.clock():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+            del self._entries[key]
+        self.misses += 1
+        return default
+
+    def set(self, key: Hashable, value: Any) -> None:
+        if self.ttl <= 0 or self.maxsize <= 0:
+            return
+        self._entries[key] = (self.clock() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, key: Hashable) -> None:
+        self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+@dataclass(frozen=True)
+class Principal:
+    """The authenticated user as routes see it (``current_user``)."""
+    id: int
+    username: str
+
+
+# username -> Principal
+principals = TTLCache(AUTH_CACHE_SIZE, AUTH_CACHE_TTL)
+# (user_id, organization_id) -> RoleEnum. Only existing memberships are cached,
+# so a user who just joined is never refused by a worker that looked them up before.
+memberships = TTLCache(AUTH_CACHE_SIZE, AUTH_CACHE_TTL)
+
+
+def cache_stats() -> dict:
+    return {"principals": principals.stats(), "memberships": memberships.stats()}
@@ -0,0 +1,151 @@
+# app/core/backfill.py
+
+import math
+import os
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Optional, Tuple
+
+from app.core.preemption import RESOURCES
+
+# Runtime assumed for jobs nobody has history for yet (seconds)
+DEFAULT_RUNTIME = float(os.getenv("BACKFILL_DEFAULT_RUNTIME", 3600))
+# Finished runs needed before an (image, owner) / image / owner estimate is trusted
+MIN_SAMPLES = int(os.getenv("BACKFILL_MIN_SAMPLES", 3))
+# Estimates are mean + SAFETY_STDDEVS standard deviations, so most runs finish earlier
+SAFETY_STDDEVS = float(os.getenv("BACKFILL_SAFETY_STDDEVS", 1.0))
+
+
+class _Stats:
+    __slots__ = ("count", "mean", "m2")
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def add(self, x: float) -> None:
+        # Welford's online mean/variance
+        self.count += 1
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (x - self.mean)
+
+    def estimate(self) -> float:
+        std = math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else 0.0
+        return self.mean + SAFETY_STDDEVS * std
+
+
+class RuntimeEstimator:
+    """
+    Predicts how long a deployment will run from the started_at/finished_at of
+    earlier runs. The most specific statistic with enough samples wins:
+    same image and owner, then same image, then same owner, then all runs.
+    """
+
+    def __init__(self, default: float = DEFAULT_RUNTIME, min_samples: int = MIN_SAMPLES):
+        self.default = default
+        self.min_samples = min_samples
+        self.by_image_owner: Dict[Tuple[str, int], _Stats] = {}
+        self.by_image: Dict[str, _Stats] = {}
+        self.by_owner: Dict[int, _Stats] = {}
+        self.overall = _Stats()
+
+    @classmethod
+    def from_history(cls, rows: Iterable[Dict], **kwargs) -> "RuntimeEstimator":
+        estimator = cls(**kwargs)
+        for row in rows:
+            seconds = (row['finished_at'] - row['started_at']).total_seconds()
+            if seconds >= 0:
+                estimator.observe(row['image'], row['owner_id'], seconds)
+        return estimator
+
+    def observe(self, image: str, owner_id: int, seconds: float) -> None:
+        for table, key in (
+            (self.by_image_owner, (image, owner_id)),
+            (self.by_image, image),
+            (self.by_owner, owner_id),
+        ):
+            stats = table.get(key)
+            if stats is None:
+                stats = table[key] = _Stats()
+            stats.add(seconds)
+        self.overall.add(seconds)
+
+    def estimate(self, job: Dict) -> float:
+        image, owner_id = job.get('image'), job.get('owner_id')
+        for stats in (
+            self.by_image_owner.get((image, owner_id)),
+            self.by_image.get(image),
+            self.by_owner.get(owner_id),
+            self.overall,
+        ):
+            if stats is not None and stats.count >= self.min_samples:
+                return stats.estimate()
+        return self.default
+
+
+class Reservation:
+    """
+    Start time guaranteed to the first blocked job (EASY backfilling).
+
+    A later job may start now only if it is predicted to finish before
+    ``shadow_time`` or fits in ``extra``, the capacity the blocked job will not
+    need even at its reserved start.
+    """
+
+    def __init__(self, job: Dict, shadow_time: datetime, extra: Dict, backfill: "EasyBackfill"):
+        self.job = job
+        self.shadow_time = shadow_time
+        self.extra = extra
+        self.backfill = backfill
+
+    def allows(self, job: Dict) -> bool:
+        if self.backfill.predicted_end(job) <= self.shadow_time:
+            return True
+        return all(job[r] <= self.extra[r] for r in RESOURCES)
+
+    def account(self, job: Dict) -> None:
+        if self.backfill.predicted_end(job) > self.shadow_time:
+            for r in RESOURCES:
+                self.extra[r] -= job[r]
+
+
+class EasyBackfill:
+    """
+    Runtime predictions for one scheduling pass over a cluster.
+
+    ``running`` must be every job running on the cluster (not only the
+    preemptible ones); jobs started or preempted during the pass are tracked
+    through ``started`` / ``stopped`` so a reservation sees them.
+    """
+
+    def __init__(self, estimator: RuntimeEstimator, running: Iterable[Dict], now: Optional[datetime] = None):
+        self.estimator = estimator
+        self.now = now or datetime.utcnow()
+        self.ends: Dict[int, Tuple[datetime, Dict]] = {}
+        for job in running:
+            started_at = job.get('started_at') or self.now
+            end = started_at + timedelta(seconds=estimator.estimate(job))
+            # a job that overran its estimate is expected to end any moment
+            self.ends[job['id']] = (max(end, self.now), job)
+
+    def predicted_end(self, job: Dict) -> datetime:
+        return self.now + timedelta(seconds=self.estimator.estimate(job))
+
+    def started(self, job: Dict) -> None:
+        self.ends[job['id']] = (self.predicted_end(job), job)
+
+    def stopped(self, job: Dict) -> None:
+        self.ends.pop(job['id'], None)
+
+    def reserve(self, job: Dict, available: Dict) -> Optional[Reservation]:
+        """Earliest time ``job`` fits as running jobs finish, and what is left over then."""
+        free = dict(available)
+        if all(job[r] <= free[r] for r in RESOURCES):
+            return Reservation(job, self.now, {r: free[r] - job[r] for r in RESOURCES}, self)
+        for end, running in sorted(self.ends.values(), key=lambda e: (e[0], e[1]['id'])):
+            for r in RESOURCES:
+                free[r] += running[r]
+            if all(job[r] <= free[r] for r in RESOURCES):
+                return Reservation(job, end, {r: free[r] - job[r] for r in RESOURCES}, self)
+        return None
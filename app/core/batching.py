@@ -0,0 +1,43 @@
+# app/core/batching.py
+
+
+class AdaptiveWindow:
+    """
+    How long the consumer keeps collecting jobs after the first one of a batch.
+
+    A batch that saw more jobs arrive during its window means submissions are
+    streaming in, so the next window doubles (larger batches, fewer scheduling
+    passes); a batch of one halves it again, so a lone submission on an idle
+    system waits only ``minimum`` seconds.
+    """
+
+    def __init__(self, minimum: float, maximum: float):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.seconds = minimum
+
+    def update(self, batch_size: int) -> None:
+        if batch_size > 1:
+            self.seconds = min(self.maximum, self.seconds * 2)
+        else:
+            self.seconds = max(self.minimum, self.seconds / 2)
+
+
+class IdleBackoff:
+    """
+    Blocking timeout while the queue is empty. Each timeout that returns nothing
+    doubles it up to ``maximum``; any job resets it. A timeout only bounds how
+    long housekeeping (events, reconcile, gang expiry) may wait, since a blocking
+    pop returns as soon as a job is pushed.
+    """
+
+    def __init__(self, minimum: float, maximum: float):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.seconds = minimum
+
+    def update(self, batch_size: int) -> None:
+        if batch_size:
+            self.seconds = self.minimum
+        else:
+            self.seconds = min(self.maximum, self.seconds * 2)
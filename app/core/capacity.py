@@ -0,0 +1,140 @@
+# app/core/capacity.py
+
+import os
+from typing import Dict, Iterable, Optional
+
+from app.core.ledger import RESOURCES, ClusterLedger
+from app.core.redis_client import init_redis
+from app.core.reliable_queue import QUEUE_PREFIX
+
+CAPACITY_KEY_PREFIX = "cluster_capacity"
+CAPACITY_VERSION_KEY = f"{CAPACITY_KEY_PREFIX}:version"
+# Scheduler: seconds between snapshots of every cluster (changed clusters are
+# published after each cycle), and seconds a snapshot is kept if not refreshed
+CAPACITY_SNAPSHOT_REFRESH = float(os.getenv("CAPACITY_SNAPSHOT_REFRESH", 5))
+CAPACITY_SNAPSHOT_TTL = int(os.getenv("CAPACITY_SNAPSHOT_TTL", 120))
+# API: snapshots older than this many seconds are ignored and the database is read instead
+CAPACITY_SNAPSHOT_MAX_AGE = float(os.getenv("CAPACITY_SNAPSHOT_MAX_AGE", 30))
+
+# Replaces a cluster's snapshot. The queued count and the publish time are read
+# inside Redis, so they are consistent with each other and readers can compute
+# the age against the same clock; versions come from one counter and only grow.
+# KEYS: snapshot, cluster queue, version counter   ARGV: ttl, field, value, ...
+PUBLISH_SCRIPT = """
+local now = redis.call('TIME')
+local version = redis.call('INCR', KEYS[3])
+redis.call('HSET', KEYS[1],
+    'version', version,
+    'published_at', now[1] .. '.' .. string.format('%06d', tonumber(now[2])),
+    'queued', redis.call('ZCARD', KEYS[2]),
+    unpack(ARGV, 2))
+redis.call('EXPIRE', KEYS[1], ARGV[1])
+return version
+"""
+
+
+def snapshot_key(cluster_id: int) -> str:
+    return f"{CAPACITY_KEY_PREFIX}:{cluster_id}"
+
+
+def snapshot_fields(cluster: ClusterLedger) -> Dict[str, str]:
+    """What the scheduler knows about a cluster, as flat hash fields."""
+    fields = {
+        "cluster_id": cluster.cluster_id,
+        "organization_id": cluster.organization_id,
+        "owner_id": cluster.owner_id,
+        "name": cluster.name,
+        "running": len(cluster.running),
+    }
+    for k in RESOURCES:
+        fields["total_" + k] = cluster.total[k]
+        fields["free_" + k] = cluster.free[k]
+    return {k: "" if v is None else str(v) for k, v in fields.items()}
+
+
+class SnapshotPublisher:
+    """Publishes capacity snapshots; the script is registered once per client, as in ReliableQueue."""
+
+    def __init__(self, r, ttl: int = CAPACITY_SNAPSHOT_TTL):
+        self.r = r
+        self.ttl = ttl
+        self._publish = r.register_script(PUBLISH_SCRIPT)
+
+    async def publish(self, clusters: Iterable[ClusterLedger]) -> int:
+        """Publish the snapshots of ``clusters`` in one pipelined round trip; returns how many."""
+        count = 0
+        async with self.r.pipeline(transaction=False) as pipe:
+            for cluster in clusters:
+                args = [self.ttl]
+                for field, value in snapshot_fields(cluster).items():
+                    args += [field, value]
+                keys = [snapshot_key(cluster.cluster_id), f"{QUEUE_PREFIX}:cluster:{cluster.cluster_id}", CAPACITY_VERSION_KEY]
+                await self._publish(keys=keys, args=args, client=pipe)
+                count += 1
+            if count:
+                await pipe.execute()
+        return count
+
+
+def decode_snapshot(fields: Dict[str, str], now: float, max_age: float = CAPACITY_SNAPSHOT_MAX_AGE) -> Optional[Dict]:
+    """A snapshot hash as served by the API, with its age at ``now`` (Redis time)."""
+    if not fields:
+        return None
+
+    def number(key, kind=float):
+        return kind(float(fields[key])) if fields.get(key) else None
+
+    published_at = float(fields["published_at"])
+    snapshot = {
+        "cluster_id": number("cluster_id", int),
+        "organization_id": number("organization_id", int),
+        "owner_id": number("owner_id", int),
+        "name": fields.get("name"),
+        "running": number("running", int),
+        "queued": number("queued", int),
+        "version": number("version", int),
+        "published_at": published_at,
+        "age_seconds": max(0.0, now - published_at),
+        "max_age_seconds": max_age,
+    }
+    for k in RESOURCES:
+        kind = float if k == "cpu" else int
+        snapshot["total_" + k] = number("total_" + k, kind)
+        snapshot["free_" + k] = number("free_" + k, kind)
+    snapshot["fresh"] = snapshot["age_seconds"] <= max_age
+    return snapshot
+
+
+async def get_snapshot(cluster_id: int) -> Optional[Dict]:
+    """
+    The latest capacity snapshot of a cluster, or None if there is none or Redis
+    cannot be reached (callers then read the database).
+    """
+    try:
+        client = await init_redis()
+        async with client.pipeline(transaction=False) as pipe:
+            pipe.hgetall(snapshot_key(cluster_id))
+            pipe.time()
+            fields, (seconds, micros) = await pipe.execute()
+        return decode_snapshot(fields, seconds + micros / 1e6)
+    except Exception as e:
+        print(f"⚠️  Reading the capacity snapshot of cluster {cluster_id} failed: {e!r}")
+        return None
+
+
+def snapshot_status(snapshot: Dict) -> Dict:
+    """
+    get_cluster_status's snapshot fields: free capacity (total minus running
+    deployments), running and queued counts, and the snapshot's version and age.
+    """
+    status = {"free_" + k: snapshot["free_" + k] for k in RESOURCES}
+    status.update(
+        running=snapshot["running"],
+        queued=snapshot["queued"],
+        snapshot={
+            "version": snapshot["version"],
+            "age_seconds": round(snapshot["age_seconds"], 3),
+            "max_age_seconds": snapshot["max_age_seconds"],
+        },
+    )
+    return status
@@ -7,6 +7,9 @@ from app.models.base import Base
 from app.models.user import User
 from app.models.Cluster import Cluster
 from app.models.Deployment import Deployment
+from app.models.Node import Node
+from app.models.DeploymentOutbox import DeploymentOutbox
+from app.models.DeploymentArchive import DeploymentArchive
 from app.models.Organization import Organization
 from app.models.UserOrganizations import UserOrganization
 
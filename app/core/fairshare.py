@@ -0,0 +1,183 @@
+# app/core/fairshare.py
+
+import heapq
+from collections import deque
+from typing import Dict, Hashable, Iterable, List, Optional, Tuple
+
+from app.core.preemption import RESOURCES, job_value
+
+Tenant = Tuple[Optional[int], Optional[int]]  # (organization_id, owner_id or None)
+
+
+def parse_weights(spec: str) -> Dict[int, float]:
+    """Parse ``"1:2,7:0.5"`` (id:weight pairs) as used by the FAIRSHARE_*_WEIGHTS settings."""
+    weights = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        key, weight = item.split(":")
+        weights[int(key)] = float(weight)
+    return weights
+
+
+def usage_by_tenant(jobs: Iterable[Dict]) -> Dict[Tenant, Dict]:
+    """Summed demand of ``jobs`` per (organization_id, owner_id)."""
+    usage: Dict[Tenant, Dict] = {}
+    for job in jobs:
+        tenant = tenant_of(job)
+        totals = usage.setdefault(tenant, {r: 0 for r in RESOURCES})
+        for r in RESOURCES:
+            totals[r] += job[r]
+    return usage
+
+
+def tenant_of(job: Dict, by_owner: bool = True) -> Tenant:
+    return (job.get('organization_id'), job.get('owner_id') if by_owner else None)
+
+
+class ShareHeap:
+    """
+    Tenants with pending jobs, smallest weighted dominant share first.
+
+    A tenant's dominant share is its largest per-resource fraction of the
+    cluster divided by its weight. Shares change by one job at a time, so
+    instead of re-sorting, ``push`` adds a fresh versioned entry and outdated
+    entries are dropped when they surface: every update is O(log tenants).
+    """
+
+    def __init__(self, total: Dict, weights: Dict[Hashable, float]):
+        self.total = total
+        self.weights = weights
+        self.usage: Dict[Hashable, Dict] = {}
+        self._live: Dict[Hashable, int] = {}
+        self._heap: List[tuple] = []
+        self._version = 0
+
+    def __bool__(self) -> bool:
+        return bool(self._live)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._live
+
+    def share(self, key: Hashable) -> float:
+        usage = self.usage.get(key)
+        if usage is None:
+            return 0.0
+        dominant = max((usage[r] / self.total[r] for r in RESOURCES if self.total[r] > 0), default=0.0)
+        return dominant / self.weights.get(key, 1.0)
+
+    def charge(self, key: Hashable, job: Dict, sign: int = 1) -> None:
+        usage = self.usage.setdefault(key, {r: 0 for r in RESOURCES})
+        for r in RESOURCES:
+            usage[r] += sign * job[r]
+        if key in self._live:
+            self.push(key)
+
+    def push(self, key: Hashable) -> None:
+        self._version += 1
+        self._live[key] = self._version
+        heapq.heappush(self._heap, (self.share(key), self._version, key))
+
+    def pop(self) -> Hashable:
+        while True:
+            _, version, key = heapq.heappop(self._heap)
+            if self._live.get(key) == version:
+                del self._live[key]
+                return key
+
+
+class FairShareQueue:
+    """
+    Jobs of one priority class in Dominant Resource Fairness order.
+
+    ``popleft`` serves the organization with the smallest dominant share, and
+    within it the owner with the smallest share (all owners of an organization
+    count as one tenant unless ``by_owner``); each tenant's own jobs keep the
+    usual largest score first order. ``charge``/``refund`` account a started or
+    preempted job so the next pick sees the new shares. ``usage`` (per
+    (organization_id, owner_id)) is updated in place, so a queue built later
+    in the same cycle starts from the current shares.
+    """
+
+    def __init__(
+        self,
+        jobs: List[Dict],
+        total: Dict,
+        usage: Dict[Tenant, Dict],
+        org_weights: Dict[int, float],
+        owner_weights: Dict[int, float],
+        by_owner: bool
+    ):
+        self.total = total
+        self.usage = usage
+        self.owner_weights = owner_weights
+        self.by_owner = by_owner
+        self.orgs = ShareHeap(total, org_weights)
+        self.owners: Dict[Optional[int], ShareHeap] = {}
+        self.pending: Dict[Tenant, deque] = {}
+        self._size = 0
+
+        for (org, owner), used in usage.items():
+            self.orgs.charge(org, used)
+            self._owner_heap(org).charge(owner if by_owner else None, used)
+
+        for job in sorted(jobs, key=job_value, reverse=True):
+            self.pending.setdefault(tenant_of(job, by_owner), deque()).append(job)
+            self._size += 1
+        for org, owner in self.pending:
+            owners = self._owner_heap(org)
+            if owner not in owners:
+                owners.push(owner)
+            if org not in self.orgs:
+                self.orgs.push(org)
+
+    def _owner_heap(self, org: Optional[int]) -> ShareHeap:
+        owners = self.owners.get(org)
+        if owners is None:
+            owners = self.owners[org] = ShareHeap(self.total, self.owner_weights)
+        return owners
+
+    def __bool__(self) -> bool:
+        return self._size > 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def popleft(self) -> Dict:
+        org = self.orgs.pop()
+        owners = self.owners[org]
+        owner = owners.pop()
+        queue = self.pending[(org, owner)]
+        job = queue.popleft()
+        self._size -= 1
+        if queue:
+            owners.push(owner)
+        if owners:
+            self.orgs.push(org)
+        return job
+
+    def charge(self, job: Dict, sign: int = 1) -> None:
+        org, owner = tenant_of(job)
+        used = self.usage.setdefault((org, owner), {r: 0 for r in RESOURCES})
+        for r in RESOURCES:
+            used[r] += sign * job[r]
+        self.orgs.charge(org, job, sign)
+        self._owner_heap(org).charge(owner if self.by_owner else None, job, sign)
+
+    def refund(self, job: Dict) -> None:
+        self.charge(job, -1)
+
+
+class FairSharePolicy:
+    """DRF settings for schedule_jobs: tenant weights and whether owners are tenants too."""
+
+    def __init__(
+        self,
+        org_weights: Optional[Dict[int, float]] = None,
+        owner_weights: Optional[Dict[int, float]] = None,
+        by_owner: bool = False
+    ):
+        self.org_weights = org_weights or {}
+        self.owner_weights = owner_weights or {}
+        self.by_owner = by_owner
+
+    def queue(self, jobs: List[Dict], total: Dict, usage: Dict[Tenant, Dict]) -> FairShareQueue:
+        return FairShareQueue(jobs, total, usage, self.org_weights, self.owner_weights, self.by_owner)
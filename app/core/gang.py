@@ -0,0 +1,102 @@
+# app/core/gang.py
+
+from typing import Dict, Iterable, List
+
+from app.core.preemption import RESOURCES
+
+
+def members(job: Dict) -> List[Dict]:
+    """The deployments a scheduling unit stands for: a gang's members, or the job itself."""
+    return job.get('_members') or [job]
+
+
+def gang_unit(jobs: List[Dict]) -> Dict:
+    """
+    One schedulable unit for the members of a gang: their summed demand, HIGH if
+    any member is, and the first member's tenant/image for fair share and
+    runtime estimates. The scheduler places, preempts and starts it as a whole.
+    """
+    first = jobs[0]
+    unit = {
+        'id': f"gang:{first['gang_id']}",
+        'priority': 'HIGH' if any(j['priority'].upper() == 'HIGH' for j in jobs) else 'LOW',
+        'organization_id': first.get('organization_id'),
+        'owner_id': first.get('owner_id'),
+        'image': first.get('image'),
+        'started_at': min((j['started_at'] for j in jobs if j.get('started_at')), default=None),
+        'retry_count': max((j.get('retry_count') or 0) for j in jobs),
+        '_members': jobs,
+    }
+    for r in RESOURCES:
+        unit[r] = sum(j[r] for j in jobs)
+    return unit
+
+
+def group_gangs(jobs: Iterable[Dict], complete_only: bool = True) -> List[Dict]:
+    """
+    Replace the members of each gang by one unit (at the position of its first
+    member). With ``complete_only`` a gang with fewer than ``gang_size`` members
+    present is dropped, since starting part of it would only hold resources.
+    """
+    units: List[Dict] = []
+    gangs: Dict[str, List[Dict]] = {}
+    for job in jobs:
+        gang_id = job.get('gang_id')
+        if gang_id is None:
+            units.append(job)
+            continue
+        if gang_id not in gangs:
+            gangs[gang_id] = []
+            units.append(gangs[gang_id])
+        gangs[gang_id].append(job)
+
+    grouped = []
+    for unit in units:
+        if isinstance(unit, dict):
+            grouped.append(unit)
+        elif not complete_only or len(unit) >= (unit[0].get('gang_size') or 1):
+            grouped.append(gang_unit(unit))
+    return grouped
+
+
+class GangBuffer:
+    """
+    Members of gangs that have not been fully submitted yet, held by the
+    scheduler between cycles. A gang still incomplete after ``timeout``
+    seconds is given up on; the scheduler marks its members FAILED.
+    """
+
+    def __init__(self, timeout: float):
+        self.timeout = timeout
+        self.waiting: Dict[str, Dict[int, Dict]] = {}
+        self.first_seen: Dict[str, float] = {}
+
+    def __len__(self) -> int:
+        return len(self.waiting)
+
+    def add(self, jobs: Iterable[Dict], now: float) -> List[Dict]:
+        """Jobs ready to schedule: non-gang jobs and every member of gangs now complete."""
+        ready = []
+        for job in jobs:
+            gang_id = job.get('gang_id')
+            if gang_id is None:
+                ready.append(job)
+                continue
+            self.waiting.setdefault(gang_id, {})[job['id']] = job
+            self.first_seen.setdefault(gang_id, now)
+        for gang_id in list(self.waiting):
+            gang = self.waiting[gang_id]
+            if len(gang) >= (next(iter(gang.values())).get('gang_size') or 1):
+                ready.extend(gang.values())
+                del self.waiting[gang_id]
+                del self.first_seen[gang_id]
+        return ready
+
+    def expire(self, now: float) -> Dict[str, List[Dict]]:
+        """Drop gangs waiting for ``timeout`` seconds or more; returns their members by gang id."""
+        expired = [g for g, seen in self.first_seen.items() if now - seen >= self.timeout]
+        given_up = {}
+        for gang_id in expired:
+            given_up[gang_id] = list(self.waiting.pop(gang_id).values())
+            del self.first_seen[gang_id]
+        return given_up
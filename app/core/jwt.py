@@ -5,6 +5,7 @@ from fastapi.security import OAuth2PasswordBearer
 from app.crud.user import get_user_by_username
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.core.database import get_async_db
+from app.core.auth_cache import Principal, principals
 
 ALGORITHM = "HS256"
 
@@ -35,11 +36,15 @@ async def auth(
             detail="Invalid token",
         )
     username = payload["sub"]
-    user = await get_user_by_username(db, username)
-    if user is None:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="User not found",
-        )
-    return user
+    principal = principals.get(username)
+    if principal is None:
+        user = await get_user_by_username(db, username)
+        if user is None:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="User not found",
+            )
+        principal = Principal(id=user.id, username=user.username)
+        principals.set(username, principal)
+    return principal
 
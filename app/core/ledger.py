@@ -0,0 +1,252 @@
+# app/core/ledger.py
+
+from typing import Dict, Iterable, List, Optional, Set, Union
+
+from app.core.fairshare import tenant_of
+
+RESOURCES = ('cpu', 'ram', 'gpu')
+
+
+class ClusterLedger:
+    """Free capacity and running set of one cluster, kept in scheduler memory.
+
+    ``free`` always equals ``total`` minus the demand of ``running``; every
+    event adjusts it by a single job so nothing is re-summed per cycle. Clusters
+    made of nodes additionally keep each node's free capacity the same way, and
+    ``usage`` holds the running demand per (organization_id, owner_id) for
+    fair-share scheduling.
+    """
+
+    def __init__(
+        self,
+        cluster_id: int,
+        total: Dict,
+        running: Iterable[Dict] = (),
+        nodes: Iterable[Dict] = (),
+        organization_id: Optional[int] = None,
+        owner_id: Optional[int] = None,
+        name: Optional[str] = None
+    ):
+        self.cluster_id = cluster_id
+        self.organization_id = organization_id
+        self.owner_id = owner_id
+        self.name = name
+        self.total = {k: total[k] for k in RESOURCES}
+        self.free = dict(self.total)
+        self.nodes: Dict[int, Dict] = {}
+        for node in nodes:
+            entry = {'id': node['id']}
+            for k in RESOURCES:
+                entry['total_' + k] = entry[k] = node['total_' + k]
+            self.nodes[node['id']] = entry
+        self.running: Dict[int, Dict] = {}
+        self.preemptible: Dict[int, Dict] = {}
+        self.usage: Dict[tuple, Dict] = {}
+        for job in running:
+            self.add(job)
+
+    def add(self, job: Dict) -> None:
+        if job['id'] in self.running:
+            return
+        self.running[job['id']] = job
+        if job['priority'].upper() == 'LOW':
+            self.preemptible[job['id']] = job
+        for k in RESOURCES:
+            self.free[k] -= job[k]
+        node = self.nodes.get(job.get('node_id'))
+        if node is not None:
+            for k in RESOURCES:
+                node[k] -= job[k]
+        used = self.usage.setdefault(tenant_of(job), {k: 0 for k in RESOURCES})
+        for k in RESOURCES:
+            used[k] += job[k]
+
+    def release(self, job_id: int) -> Optional[Dict]:
+        job = self.running.pop(job_id, None)
+        if job is None:
+            return None
+        self.preemptible.pop(job_id, None)
+        for k in RESOURCES:
+            self.free[k] += job[k]
+        node = self.nodes.get(job.get('node_id'))
+        if node is not None:
+            for k in RESOURCES:
+                node[k] += job[k]
+        tenant = tenant_of(job)
+        used = self.usage[tenant]
+        for k in RESOURCES:
+            used[k] -= job[k]
+        if not any(used.values()):
+            del self.usage[tenant]
+        return job
+
+    def available(self) -> Dict:
+        return dict(self.free)
+
+    def has_room(self) -> bool:
+        """Whether a new job could start without preemption (every job needs some cpu and ram)."""
+        return self.free['cpu'] > 0 and self.free['ram'] > 0
+
+    def preemptible_jobs(self) -> List[Dict]:
+        return list(self.preemptible.values())
+
+    def tenant_usage(self) -> Dict[tuple, Dict]:
+        return {tenant: dict(used) for tenant, used in self.usage.items()}
+
+    def node_capacity(self) -> List[Dict]:
+        """Per-node totals and free capacity, in the shape NodePacker expects."""
+        return [dict(node) for node in self.nodes.values()]
+
+    def capacity(self, pending: Iterable[Dict] = ()) -> Dict:
+        """
+        Free capacity for org-wide placement, net of ``pending`` jobs already
+        bound to this cluster. ``limit`` is the largest job the cluster can host
+        (its largest node on node-based clusters).
+        """
+        free = self.available()
+        for job in pending:
+            for k in RESOURCES:
+                free[k] -= job[k]
+        reclaimable = {k: sum(j[k] for j in self.preemptible.values()) for k in RESOURCES}
+        if self.nodes:
+            limit = {k: max(n['total_' + k] for n in self.nodes.values()) for k in RESOURCES}
+        else:
+            limit = dict(self.total)
+        return {
+            'cluster_id': self.cluster_id,
+            'organization_id': self.organization_id,
+            'total': dict(self.total),
+            'free': free,
+            'reclaimable': reclaimable,
+            'limit': limit,
+        }
+
+    def matches(self, total: Dict, running: Iterable[Dict], nodes: Iterable[Dict] = ()) -> bool:
+        """True if this ledger agrees with a freshly loaded DB view of the cluster."""
+        placements = {j['id']: j.get('node_id') for j in running}
+        return (
+            placements == {i: j.get('node_id') for i, j in self.running.items()}
+            and {n['id'] for n in nodes} == self.nodes.keys()
+            and all(self.total[k] == total[k] for k in RESOURCES)
+        )
+
+
+class ResourceLedger:
+    """Per-cluster ledgers for every cluster the scheduler has seen.
+
+    Bootstrapped once from the DB, then kept current from scheduling decisions
+    and deployment events. ``reconcile`` compares it against a full DB read and
+    rebuilds any cluster that drifted. Clusters whose capacity changed since the
+    last ``take_dirty`` are collected in ``dirty``.
+    """
+
+    def __init__(self):
+        self.clusters: Dict[int, ClusterLedger] = {}
+        self.job_cluster: Dict[int, int] = {}
+        self.dirty: Set[int] = set()
+
+    def __contains__(self, cluster_id: int) -> bool:
+        return cluster_id in self.clusters
+
+    def __getitem__(self, cluster_id: int) -> ClusterLedger:
+        return self.clusters[cluster_id]
+
+    def load_cluster(
+        self,
+        resources: Dict,
+        running: Iterable[Dict] = (),
+        nodes: Iterable[Dict] = ()
+    ) -> ClusterLedger:
+        cid = resources['cluster_id']
+        self.drop_cluster(cid)
+        ledger = ClusterLedger(
+            cid, _totals(resources), running, nodes,
+            resources.get('organization_id'), resources.get('owner_id'), resources.get('name')
+        )
+        self.clusters[cid] = ledger
+        self.dirty.add(cid)
+        for job_id in ledger.running:
+            self.job_cluster[job_id] = cid
+        return ledger
+
+    def drop_cluster(self, cluster_id: int) -> None:
+        ledger = self.clusters.pop(cluster_id, None)
+        if ledger is not None:
+            for job_id in ledger.running:
+                self.job_cluster.pop(job_id, None)
+
+    def load(
+        self,
+        resources: Dict[int, Dict],
+        running: Union[List[Dict], Dict[int, List[Dict]]],
+        nodes: Optional[Dict[int, List[Dict]]] = None
+    ) -> None:
+        by_cluster = _group(running)
+        nodes = nodes or {}
+        for cid, res in resources.items():
+            self.load_cluster(res, by_cluster.get(cid, []), nodes.get(cid, []))
+
+    def organization_clusters(self, org_ids: Iterable[int]) -> List[ClusterLedger]:
+        org_ids = set(org_ids)
+        return [c for c in self.clusters.values() if c.organization_id in org_ids]
+
+    def on_scheduled(self, cluster_id: int, jobs: Iterable[Dict]) -> None:
+        ledger = self.clusters[cluster_id]
+        for job in jobs:
+            ledger.add(job)
+            self.job_cluster[job['id']] = cluster_id
+        self.dirty.add(cluster_id)
+
+    def on_released(self, job_id: int) -> Optional[Dict]:
+        """A running job stopped (preempted, completed, failed or deleted)."""
+        cid = self.job_cluster.pop(job_id, None)
+        if cid is None or cid not in self.clusters:
+            return None
+        self.dirty.add(cid)
+        return self.clusters[cid].release(job_id)
+
+    def take_dirty(self) -> Set[int]:
+        """Clusters changed since the last call (that still exist)."""
+        dirty, self.dirty = self.dirty, set()
+        return dirty & self.clusters.keys()
+
+    def reconcile(
+        self,
+        resources: Dict[int, Dict],
+        running: Union[List[Dict], Dict[int, List[Dict]]],
+        nodes: Optional[Dict[int, List[Dict]]] = None
+    ) -> List[int]:
+        """Rebuild clusters whose ledger disagrees with the DB; returns their ids."""
+        by_cluster = _group(running)
+        nodes = nodes or {}
+        drifted = []
+        for cid in list(self.clusters):
+            if cid not in resources:
+                self.drop_cluster(cid)
+                drifted.append(cid)
+        for cid, res in resources.items():
+            actual = by_cluster.get(cid, [])
+            actual_nodes = nodes.get(cid, [])
+            ledger = self.clusters.get(cid)
+            if ledger is None or not ledger.matches(_totals(res), actual, actual_nodes):
+                if ledger is not None:
+                    drifted.append(cid)
+                self.load_cluster(res, actual, actual_nodes)
+        return drifted
+
+
+def _totals(resources: Dict) -> Dict:
+    return {
+        'cpu': resources['total_cpu'],
+        'ram': resources['total_ram'],
+        'gpu': resources['total_gpu'],
+    }
+
+
+def _group(running: Union[List[Dict], Dict[int, List[Dict]]]) -> Dict[int, List[Dict]]:
+    if isinstance(running, dict):
+        return running  # already grouped by cluster id, as the DB fetch returns it
+    by_cluster: Dict[int, List[Dict]] = {}
+    for job in running:
+        by_cluster.setdefault(job['cluster_id'], []).append(job)
+    return by_cluster
@@ -0,0 +1,86 @@
+# app/core/outbox.py
+
+import asyncio
+import os
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, select, update
+
+from app.core.database import AsyncSessionLocal
+from app.core.redis_client import push_deployments_to_queue
+from app.models.DeploymentOutbox import DeploymentOutbox
+
+# Rows relayed per transaction (one pipelined Redis push)
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", 1000))
+# Seconds between scans when no submission in this process signalled new rows
+# (rows written by other API workers, or left over after a Redis outage)
+OUTBOX_POLL_INTERVAL = float(os.getenv("OUTBOX_POLL_INTERVAL", 1.0))
+# Delivered rows are deleted after this many seconds
+OUTBOX_RETENTION = int(os.getenv("OUTBOX_RETENTION", 86400))
+
+_pending = asyncio.Event()
+
+
+def notify_outbox() -> None:
+    """Wake the relay after committing outbox rows."""
+    _pending.set()
+
+
+async def relay_batch(limit: int = OUTBOX_BATCH_SIZE) -> int:
+    """
+    Push up to ``limit`` undelivered messages to Redis and mark them delivered.
+    Rows are locked with SKIP LOCKED, so several relays (one per API worker)
+    never push the same batch. If the push fails the transaction rolls back and
+    the rows are retried; a push whose commit fails is repeated, which the
+    queue absorbs since a deployment is queued at most once.
+    """
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(
+            select(DeploymentOutbox.id, DeploymentOutbox.payload)
+            .where(DeploymentOutbox.delivered_at.is_(None))
+            .order_by(DeploymentOutbox.id)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        rows = result.all()
+        if not rows:
+            return 0
+        await push_deployments_to_queue(payload for _, payload in rows)
+        await session.execute(
+            update(DeploymentOutbox)
+            .where(DeploymentOutbox.id.in_([row_id for row_id, _ in rows]))
+            .values(delivered_at=datetime.utcnow())
+        )
+        await session.commit()
+    return len(rows)
+
+
+async def purge_delivered(older_than: int = OUTBOX_RETENTION) -> None:
+    async with AsyncSessionLocal() as session:
+        await session.execute(
+            delete(DeploymentOutbox).where(
+                DeploymentOutbox.delivered_at < datetime.utcnow() - timedelta(seconds=older_than)
+            )
+        )
+        await session.commit()
+
+
+async def run_outbox_relay() -> None:
+    """Relay outbox rows until cancelled: right after submissions, and every poll interval."""
+    last_purge = datetime.utcnow()
+    while True:
+        _pending.clear()
+        try:
+            sent = await relay_batch()
+            if sent >= OUTBOX_BATCH_SIZE:
+                continue  # more rows are probably waiting
+            if datetime.utcnow() - last_purge >= timedelta(seconds=OUTBOX_RETENTION / 24):
+                await purge_delivered()
+                last_purge = datetime.utcnow()
+        except Exception as e:
+            # Redis or the DB is unavailable: the rows stay undelivered
+            print(f"⚠️  Outbox relay failed: {e!r}")
+        try:
+            await asyncio.wait_for(_pending.wait(), OUTBOX_POLL_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
@@ -0,0 +1,162 @@
+# app/core/packing.py
+
+from bisect import bisect_left, insort
+from typing import Dict, List, Optional, Tuple
+
+from app.core.preemption import RESOURCES, plan_preemption
+from app.core.victim_index import PreemptionIndex
+
+PACKING_STRATEGIES = ("best-fit", "worst-fit")
+
+# Nodes whose victims are evaluated when a HIGH job needs node-local preemption
+NODE_PREEMPTION_CANDIDATES = 8
+
+
+class NodePacker:
+    """
+    Free-capacity index over the nodes of one cluster.
+
+    Nodes are grouped in buckets keyed by free GPUs (the scarcest resource and
+    always whole units); each bucket is a list of ``(free_cpu, free_ram, node_id)``
+    kept sorted. Best-fit walks the GPU levels upwards from the job's demand and
+    bisects each bucket on CPU, so it returns the tightest node after touching a
+    handful of entries even with thousands of nodes. Worst-fit walks from the
+    other end and spreads load instead. Jobs should be offered largest first
+    (the scheduler's score order), which makes this best-fit decreasing.
+    """
+
+    def __init__(self, nodes: List[Dict], strategy: str = "best-fit"):
+        if strategy not in PACKING_STRATEGIES:
+            raise ValueError(f"Unknown packing strategy '{strategy}'")
+        self.strategy = strategy
+        self.free: Dict[int, Dict] = {}
+        self.total: Dict[int, Dict] = {}
+        self.buckets: Dict[int, List[Tuple]] = {}
+        self.levels: List[int] = []
+        for node in nodes:
+            self.total[node['id']] = {r: node['total_' + r] for r in RESOURCES}
+            self.free[node['id']] = {r: node[r] for r in RESOURCES}
+            self._insert(node['id'])
+
+    def __len__(self) -> int:
+        return len(self.free)
+
+    def _entry(self, node_id: int) -> Tuple:
+        free = self.free[node_id]
+        return (free['cpu'], free['ram'], node_id)
+
+    def _insert(self, node_id: int) -> None:
+        level = self.free[node_id]['gpu']
+        bucket = self.buckets.get(level)
+        if bucket is None:
+            bucket = self.buckets[level] = []
+            insort(self.levels, level)
+        insort(bucket, self._entry(node_id))
+
+    def _remove(self, node_id: int) -> None:
+        level = self.free[node_id]['gpu']
+        bucket = self.buckets[level]
+        del bucket[bisect_left(bucket, self._entry(node_id))]
+        if not bucket:
+            del self.buckets[level]
+            del self.levels[bisect_left(self.levels, level)]
+
+    def largest(self) -> Dict:
+        """Per-resource maximum node size; a job larger than this can never be placed."""
+        return {r: max((t[r] for t in self.total.values()), default=0) for r in RESOURCES}
+
+    def find(self, job: Dict) -> Optional[int]:
+        start = bisect_left(self.levels, job['gpu'])
+        if self.strategy == "best-fit":
+            for level in self.levels[start:]:
+                bucket = self.buckets[level]
+                for cpu, ram, node_id in bucket[bisect_left(bucket, (job['cpu'],)):]:
+                    if ram >= job['ram']:
+                        return node_id
+        else:
+            for level in reversed(self.levels[start:]):
+                bucket = self.buckets[level]
+                for i in range(len(bucket) - 1, -1, -1):
+                    cpu, ram, node_id = bucket[i]
+                    if cpu < job['cpu']:
+                        break
+                    if ram >= job['ram']:
+                        return node_id
+        return None
+
+    def allocate(self, node_id: int, job: Dict) -> None:
+        self._remove(node_id)
+        for r in RESOURCES:
+            self.free[node_id][r] -= job[r]
+        self._insert(node_id)
+
+    def release(self, node_id: int, job: Dict) -> None:
+        if node_id not in self.free:
+            return
+        self._remove(node_id)
+        for r in RESOURCES:
+            self.free[node_id][r] += job[r]
+        self._insert(node_id)
+
+    def place(self, job: Dict) -> Optional[int]:
+        """Pick a node for ``job`` and reserve its resources there."""
+        node_id = self.find(job)
+        if node_id is not None:
+            self.allocate(node_id, job)
+        return node_id
+
+
+def plan_node_preemption(
+    job: Dict,
+    packer: NodePacker,
+    victims: PreemptionIndex,
+    preemption: str
+) -> Optional[Tuple[int, List[Dict]]]:
+    """
+    Free room for ``job`` on a single node by evicting LOW jobs running there.
+
+    Only nodes that could host the job once their LOW jobs are gone are
+    considered, smallest shortfall first and at most NODE_PREEMPTION_CANDIDATES
+    of them; the cheapest plan wins (fewest/largest-first victims with
+    ``preemption="largest-first"``). Returns ``(node_id, victims)`` or None.
+    """
+    ranked = []
+    for node_id, on_node in victims.by_node.items():
+        free = packer.free.get(node_id)
+        if free is None:
+            continue
+        held = {r: sum(v[r] for v in on_node.values()) for r in RESOURCES}
+        if any(job[r] > free[r] + held[r] for r in RESOURCES):
+            continue
+        shortfall = sum(max(0.0, job[r] - free[r]) / max(job[r], 1) for r in RESOURCES)
+        ranked.append((shortfall, node_id))
+    ranked.sort()
+
+    best = None
+    for _, node_id in ranked[:NODE_PREEMPTION_CANDIDATES]:
+        free = packer.free[node_id]
+        on_node = sorted(victims.by_node[node_id].values(), key=lambda v: v['_ordinal'])
+        if preemption == "min-cost":
+            plan = plan_preemption(job, on_node, free)
+        else:
+            plan = _largest_first(job, on_node, free)
+        if plan is None:
+            continue
+        cost = sum(v['_cost'] for v in plan)
+        if best is None or cost < best[0]:
+            best = (cost, node_id, plan)
+    if best is None:
+        return None
+    return best[1], best[2]
+
+
+def _largest_first(job: Dict, on_node: List[Dict], free: Dict) -> Optional[List[Dict]]:
+    freed = dict(free)
+    plan = []
+    for victim in sorted(on_node, key=lambda v: -(v['gpu'] * 100 + v['cpu'] * 10 + v['ram'])):
+        plan.append(victim)
+        for r in RESOURCES:
+            freed[r] += victim[r]
+        if all(job[r] <= freed[r] for r in RESOURCES):
+            return plan
+    return None
@@ -0,0 +1,108 @@
+# app/core/placement.py
+
+from bisect import bisect_left, insort
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from app.core.preemption import RESOURCES, job_value
+from app.core.gang import group_gangs, members
+
+PLACEMENT_POLICIES = ("spread", "pack")
+
+
+def headroom(free: Dict, total: Dict) -> float:
+    """Tightest free fraction over the resources a cluster has at all."""
+    fractions = [free[r] / total[r] for r in RESOURCES if total[r] > 0]
+    return min(fractions) if fractions else 0.0
+
+
+class OrgCapacityIndex:
+    """
+    Free capacity of every cluster, grouped by organization, for jobs that may
+    run on any cluster of their organization.
+
+    Each organization keeps its clusters in a list sorted by headroom. "spread"
+    takes the emptiest cluster the job fits on (balancing load), "pack" the
+    fullest one (keeping whole clusters free for large jobs). A placement
+    reserves the job's demand, so later jobs of the same cycle see it.
+    """
+
+    def __init__(self, clusters: Iterable[Dict], policy: str = "spread"):
+        if policy not in PLACEMENT_POLICIES:
+            raise ValueError(f"Unknown placement policy '{policy}'")
+        self.policy = policy
+        self.clusters: Dict[int, Dict] = {}
+        self.by_org: Dict[int, List[Tuple[float, int]]] = {}
+        for cluster in clusters:
+            cid = cluster['cluster_id']
+            self.clusters[cid] = {
+                'organization_id': cluster['organization_id'],
+                'total': dict(cluster['total']),
+                'free': dict(cluster['free']),
+                'reclaimable': dict(cluster.get('reclaimable') or {r: 0 for r in RESOURCES}),
+                'limit': dict(cluster.get('limit') or cluster['total']),
+            }
+            insort(self.by_org.setdefault(cluster['organization_id'], []), self._entry(cid))
+
+    def _entry(self, cluster_id: int) -> Tuple[float, int]:
+        c = self.clusters[cluster_id]
+        return (headroom(c['free'], c['total']), cluster_id)
+
+    def _ordered(self, org_id: int) -> List[Tuple[float, int]]:
+        entries = self.by_org.get(org_id, [])
+        return entries if self.policy == "pack" else entries[::-1]
+
+    def _admissible(self, job: Dict, cluster: Dict) -> bool:
+        return (
+            all(job[r] <= cluster['total'][r] for r in RESOURCES)
+            and all(m[r] <= cluster['limit'][r] for m in members(job) for r in RESOURCES)
+        )
+
+    def find(self, job: Dict) -> Optional[int]:
+        """Cluster with room for ``job`` now, or (HIGH only) once LOW jobs are preempted."""
+        fallback = None
+        for _, cid in self._ordered(job['organization_id']):
+            c = self.clusters[cid]
+            if not self._admissible(job, c):
+                continue
+            if all(job[r] <= c['free'][r] for r in RESOURCES):
+                return cid
+            if (fallback is None and job['priority'] == 'HIGH'
+                    and all(job[r] <= c['free'][r] + c['reclaimable'][r] for r in RESOURCES)):
+                fallback = cid
+        return fallback
+
+    def reserve(self, cluster_id: int, job: Dict) -> None:
+        c = self.clusters[cluster_id]
+        entries = self.by_org[c['organization_id']]
+        del entries[bisect_left(entries, self._entry(cluster_id))]
+        for r in RESOURCES:
+            short = max(0, job[r] - max(c['free'][r], 0))
+            c['reclaimable'][r] -= min(short, c['reclaimable'][r])
+            c['free'][r] -= job[r]
+        insort(entries, self._entry(cluster_id))
+
+    def place(self, job: Dict) -> Optional[int]:
+        cid = self.find(job)
+        if cid is not None:
+            self.reserve(cid, job)
+        return cid
+
+
+def assign_clusters(jobs: List[Dict], index: OrgCapacityIndex) -> Tuple[List[Dict], List[Dict]]:
+    """
+    Pick a cluster for each any-cluster job (HIGH first, largest first) and set
+    its ``cluster_id``; all members of a gang go to the same cluster.
+    Returns ``(assigned, unplaced)``.
+    """
+    units = group_gangs(jobs, complete_only=False)
+    ordered = sorted(units, key=lambda j: (j['priority'] != 'HIGH', -job_value(j)))
+    assigned, unplaced = [], []
+    for unit in ordered:
+        cid = index.place(unit)
+        if cid is None:
+            unplaced.extend(members(unit))
+        else:
+            for job in members(unit):
+                job['cluster_id'] = cid
+                assigned.append(job)
+    return assigned, unplaced
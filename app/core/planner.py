@@ -0,0 +1,74 @@
+# app/core/planner.py
+
+import asyncio
+from concurrent.futures import Executor
+from functools import partial
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from app.core.algorithm import schedule_jobs
+from app.core.backfill import EasyBackfill, RuntimeEstimator
+from app.core.fairshare import FairSharePolicy
+
+Decision = Tuple[List[Dict], List[Dict]]
+
+
+def plan_cluster(
+    schedule: Callable[..., Decision],
+    new_jobs: List[Dict],
+    preemptible: List[Dict],
+    total: Dict,
+    available: Dict,
+    preemption: str = "min-cost",
+    nodes: Optional[List[Dict]] = None,
+    packing: str = "best-fit",
+    fair_share: Optional[FairSharePolicy] = None,
+    tenant_usage: Optional[Dict] = None,
+    estimator: Optional[RuntimeEstimator] = None,
+    running: Iterable[Dict] = (),
+) -> Decision:
+    """
+    Scheduling decision for one cluster. Only takes plain data and module-level
+    callables, so it can run in a worker process.
+
+    Node packing, fair share and backfilling are only implemented by the python
+    engine, which is then used instead of ``schedule``.
+    """
+    if nodes or fair_share is not None or estimator is not None:
+        return schedule_jobs(
+            new_jobs,
+            preemptible,
+            total,
+            available,
+            preemption=preemption,
+            nodes=nodes or None,
+            packing=packing,
+            fair_share=fair_share,
+            tenant_usage=tenant_usage,
+            backfill=EasyBackfill(estimator, running) if estimator is not None else None,
+        )
+    return schedule(new_jobs, preemptible, total, available, preemption=preemption)
+
+
+async def plan_clusters(
+    plans: Dict[int, Dict],
+    executor: Optional[Executor] = None,
+    min_jobs: int = 0,
+) -> Dict[int, Decision]:
+    """
+    Run :func:`plan_cluster` for every cluster (``plans`` maps cluster id to its
+    keyword arguments). Clusters with at least ``min_jobs`` queued plus
+    preemptible jobs go to ``executor``; smaller ones are not worth pickling
+    and are planned inline while the workers run.
+    """
+    loop = asyncio.get_running_loop()
+    pending = {}
+    decisions: Dict[int, Decision] = {}
+    for cid, kwargs in plans.items():
+        if executor is not None and len(kwargs['new_jobs']) + len(kwargs['preemptible']) >= min_jobs:
+            pending[cid] = loop.run_in_executor(executor, partial(plan_cluster, **kwargs))
+    for cid, kwargs in plans.items():
+        if cid not in pending:
+            decisions[cid] = plan_cluster(**kwargs)
+    for cid, future in pending.items():
+        decisions[cid] = await future
+    return {cid: decisions[cid] for cid in plans}
@@ -0,0 +1,179 @@
+# app/core/preemption.py
+
+import os
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence
+
+RESOURCES = ('cpu', 'ram', 'gpu')
+
+# Cost model for evicting a running job. The base cost is the job's size score
+# (same weights as scheduling: GPU-heavy jobs are the most expensive to stop);
+# it grows with the work that would be lost and with how often the job has
+# already been preempted, so the same jobs are not evicted over and over.
+RUNTIME_WEIGHT = float(os.getenv("PREEMPTION_RUNTIME_WEIGHT", 0.5))   # per hour already run
+RETRY_WEIGHT = float(os.getenv("PREEMPTION_RETRY_WEIGHT", 1.0))       # per previous retry
+VICTIM_PENALTY = float(os.getenv("PREEMPTION_VICTIM_PENALTY", 10.0))  # flat cost per evicted job
+
+# Search limits: only the MAX_CANDIDATES most cost-effective victims are
+# considered and at most SEARCH_BUDGET branch-and-bound nodes are expanded,
+# which keeps one planning call around a millisecond whatever the cluster size.
+MAX_CANDIDATES = int(os.getenv("PREEMPTION_MAX_CANDIDATES", 16))
+SEARCH_BUDGET = int(os.getenv("PREEMPTION_SEARCH_BUDGET", 1000))
+
+
+def job_value(job: Dict) -> float:
+    return job['gpu'] * 100 + job['cpu'] * 10 + job['ram']
+
+
+def runtime_hours(job: Dict, now: datetime) -> float:
+    started_at = job.get('started_at')
+    if started_at is None:
+        return 0.0
+    return max(0.0, (now - started_at).total_seconds() / 3600.0)
+
+
+def preemption_cost(value: float, hours: float, retries: int) -> float:
+    """Cost of evicting one job of size ``value`` that has run ``hours`` and been retried ``retries`` times."""
+    return value * (1.0 + RUNTIME_WEIGHT * hours) * (1.0 + RETRY_WEIGHT * retries) + VICTIM_PENALTY
+
+
+def job_preemption_cost(job: Dict, now: datetime) -> float:
+    return preemption_cost(job_value(job), runtime_hours(job, now), job.get('retry_count') or 0)
+
+
+def coverage(freed: Sequence[float], need: Sequence[float]) -> float:
+    """Fraction of each short resource a victim frees, summed over the short resources."""
+    total = 0.0
+    for d in range(3):
+        if need[d] > 0:
+            total += min(freed[d], need[d]) / need[d]
+    return total
+
+
+def rank_candidates(
+    need: Sequence[float],
+    freed: Sequence[Sequence[float]],
+    costs: Sequence[float],
+    limit: int = MAX_CANDIDATES
+) -> List[int]:
+    """Indices of the ``limit`` victims with the lowest cost per unit of coverage."""
+    ranked = []
+    for i in range(len(freed)):
+        cov = coverage(freed[i], need)
+        if cov > 0:
+            ranked.append((costs[i] / cov, i))
+    ranked.sort()
+    return [i for _, i in ranked[:limit]]
+
+
+def cheapest_cover(
+    need: Sequence[float],
+    freed: Sequence[Sequence[float]],
+    costs: Sequence[float],
+    budget: int = SEARCH_BUDGET
+) -> Optional[List[int]]:
+    """
+    Cheapest subset of victims whose freed resources cover ``need`` in every dimension.
+
+    ``freed``/``costs`` describe the (already ranked) candidates. A greedy
+    solution seeds the upper bound, then a depth-first branch and bound improves
+    it until ``budget`` nodes have been expanded; the best set found by then is
+    returned, in candidate order. Returns None if all candidates together
+    cannot cover ``need``.
+    """
+    n = len(freed)
+    need = [max(0.0, x) for x in need]
+    if any(sum(f[d] for f in freed) < need[d] for d in range(3)):
+        return None
+
+    best = _greedy_cover(need, freed, costs)
+    best_cost = sum(costs[i] for i in best)
+
+    # suffix_unit[d][k]: cheapest cost per unit of resource d among candidates k.., for the lower bound
+    inf = float('inf')
+    suffix_unit = [[inf] * (n + 1) for _ in range(3)]
+    for k in range(n - 1, -1, -1):
+        for d in range(3):
+            unit = costs[k] / freed[k][d] if freed[k][d] > 0 else inf
+            suffix_unit[d][k] = min(unit, suffix_unit[d][k + 1])
+    unit_cpu, unit_ram, unit_gpu = suffix_unit
+
+    nodes = 0
+    chosen: List[int] = []
+
+    def search(k: int, r_cpu: float, r_ram: float, r_gpu: float, cost: float):
+        nonlocal best, best_cost, nodes
+        if nodes >= budget:
+            return
+        nodes += 1
+        if r_cpu <= 0 and r_ram <= 0 and r_gpu <= 0:
+            if cost < best_cost:
+                best, best_cost = list(chosen), cost
+            return
+        if k == n:
+            return
+        bound = 0.0
+        if r_cpu > 0:
+            bound = r_cpu * unit_cpu[k]
+        if r_ram > 0:
+            bound = max(bound, r_ram * unit_ram[k])
+        if r_gpu > 0:
+            bound = max(bound, r_gpu * unit_gpu[k])
+        if cost + bound >= best_cost:
+            return
+        f_cpu, f_ram, f_gpu = freed[k]
+        if (f_cpu > 0 and r_cpu > 0) or (f_ram > 0 and r_ram > 0) or (f_gpu > 0 and r_gpu > 0):
+            chosen.append(k)
+            search(k + 1, r_cpu - f_cpu, r_ram - f_ram, r_gpu - f_gpu, cost + costs[k])
+            chosen.pop()
+        search(k + 1, r_cpu, r_ram, r_gpu, cost)
+
+    search(0, need[0], need[1], need[2], 0.0)
+    return sorted(best)
+
+
+def _greedy_cover(need: List[float], freed, costs) -> List[int]:
+    remaining = list(need)
+    picked: List[int] = []
+    left = set(range(len(freed)))
+    while any(r > 0 for r in remaining):
+        best_i, best_ratio = None, None
+        for i in left:
+            cov = coverage(freed[i], remaining)
+            if cov <= 0:
+                continue
+            ratio = costs[i] / cov
+            if best_ratio is None or (ratio, i) < (best_ratio, best_i):
+                best_i, best_ratio = i, ratio
+        picked.append(best_i)
+        left.discard(best_i)
+        remaining = [remaining[d] - freed[best_i][d] for d in range(3)]
+
+    # drop victims that turned out to be unnecessary, most expensive first
+    for i in sorted(picked, key=lambda i: -costs[i]):
+        rest = [j for j in picked if j != i]
+        if all(sum(freed[j][d] for j in rest) >= need[d] for d in range(3)):
+            picked = rest
+    return picked
+
+
+def plan_preemption(
+    job: Dict,
+    candidates: List[Dict],
+    available: Dict
+) -> Optional[List[Dict]]:
+    """
+    Choose the cheapest running jobs to evict so that ``job`` fits.
+
+    ``candidates`` need a precomputed ``_cost``. Returns the victims, or None if
+    the most cost-effective candidates cannot make room (the caller then falls
+    back to largest-first preemption over every candidate).
+    """
+    need = [job[k] - available[k] for k in RESOURCES]
+    freed = [(c['cpu'], c['ram'], c['gpu']) for c in candidates]
+    costs = [c['_cost'] for c in candidates]
+    ranked = rank_candidates(need, freed, costs)
+    picked = cheapest_cover(need, [freed[i] for i in ranked], [costs[i] for i in ranked])
+    if picked is None:
+        return None
+    return [candidates[ranked[i]] for i in picked]
@@ -1,9 +1,64 @@
-import redis
 import json
-import os
+from typing import Iterable, Optional
 
-r = redis.Redis(host="localhost", port=6379, db=0, decode_responses=True)
+import redis.asyncio as redis
 
-def push_deployment_to_queue(deployment: dict):
-    """Push deployment to Redis queue"""
-    r.rpush("deployment_queue", json.dumps(deployment))
+from app.config import REDIS_DB, REDIS_HOST, REDIS_MAX_CONNECTIONS, REDIS_PORT
+from app.core.reliable_queue import DISCARD_SCRIPT, INFLIGHT_KEY, JOBS_KEY, PUSH_SCRIPT, WAKE_KEY, WHERE_KEY, push_args
+
+# One pooled client per process, opened and closed by the FastAPI lifespan
+# (init_redis / close_redis) and created on first use elsewhere.
+_client: Optional[redis.Redis] = None
+_push = None
+_discard = None
+
+async def init_redis() -> redis.Redis:
+    """Create the connection pool and register the queue scripts"""
+    global _client, _push, _discard
+    if _client is None:
+        pool = redis.ConnectionPool(
+            host=REDIS_HOST,
+            port=REDIS_PORT,
+            db=REDIS_DB,
+            max_connections=REDIS_MAX_CONNECTIONS,
+            decode_responses=True
+        )
+        _client = redis.Redis(connection_pool=pool)
+        _push = _client.register_script(PUSH_SCRIPT)
+        _discard = _client.register_script(DISCARD_SCRIPT)
+    return _client
+
+async def close_redis():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        await _client.connection_pool.disconnect()
+        _client = None
+
+async def push_deployment_to_queue(deployment: dict):
+    """Queue a deployment on its cluster's (or organization's) sorted set, scored by priority and enqueue time"""
+    await init_redis()
+    keys, args = push_args(deployment)
+    await _push(keys=keys, args=args)
+
+async def push_deployments_to_queue(deployments: Iterable[dict]):
+    """Queue many deployments in one pipelined round trip"""
+    client = await init_redis()
+    async with client.pipeline(transaction=False) as pipe:
+        for deployment in deployments:
+            keys, args = push_args(deployment)
+            await _push(keys=keys, args=args, client=pipe)
+        await pipe.execute()
+
+async def remove_deployment_from_queue(deployment_id: int):
+    """Drop a deployment that is still queued (e.g. deleted before it ran)"""
+    await init_redis()
+    await _discard(keys=[INFLIGHT_KEY, WHERE_KEY, JOBS_KEY], args=[deployment_id])
+
+async def push_deployment_event(event: dict):
+    """Push a deployment lifecycle event (completed/failed/deleted) for the scheduler and wake it"""
+    client = await init_redis()
+    async with client.pipeline(transaction=False) as pipe:
+        pipe.rpush("deployment_events", json.dumps(event))
+        pipe.rpush(WAKE_KEY, 1)
+        await pipe.execute()
@@ -0,0 +1,274 @@
+# app/core/reliable_queue.py
+
+import json
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+QUEUE_PREFIX = "deployment_queue"
+JOBS_KEY = f"{QUEUE_PREFIX}:jobs"            # deployment id -> queue message
+WHERE_KEY = f"{QUEUE_PREFIX}:where"          # deployment id -> "<score> <queue key>"
+PENDING_KEY = f"{QUEUE_PREFIX}:pending"      # queue keys that may hold deployments
+INFLIGHT_KEY = f"{QUEUE_PREFIX}:inflight"    # claimed deployment id -> claim time
+WAKE_KEY = f"{QUEUE_PREFIX}:wake"            # one entry per push, wakes the consumer
+WAKE_MAX = 10000
+
+# A score is the priority band plus the enqueue time, so each queue yields HIGH
+# jobs first and each band in submission order, and "HIGH only" is a score bound.
+PRIORITY_BANDS = {'HIGH': 0, 'LOW': 1}
+BAND_WIDTH = 1e10
+
+# KEYS: jobs, where, queue, pending, wake; ARGV: id, message, score, wake max.
+# A deployment is queued at most once: pushing it again moves it.
+PUSH_SCRIPT = """
+local old = redis.call('HGET', KEYS[2], ARGV[1])
+if old then
+    local old_key = string.sub(old, string.find(old, ' ', 1, true) + 1)
+    if old_key ~= KEYS[3] then
+        redis.call('ZREM', old_key, ARGV[1])
+    end
+end
+redis.call('HSET', KEYS[1], ARGV[1], ARGV[2])
+redis.call('HSET', KEYS[2], ARGV[1], ARGV[3] .. ' ' .. KEYS[3])
+redis.call('ZADD', KEYS[3], ARGV[3], ARGV[1])
+redis.call('SADD', KEYS[4], KEYS[3])
+redis.call('RPUSH', KEYS[5], 1)
+redis.call('LTRIM', KEYS[5], -tonumber(ARGV[4]), -1)
+return 1
+"""
+
+# KEYS: queue, pending, inflight, jobs; ARGV: exclusive max score, limit, now.
+# Returns id1, message1, id2, message2, ...
+_CLAIM = """
+local ids = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', '(' .. ARGV[1], 'LIMIT', 0, tonumber(ARGV[2]))
+local out = {}
+for _, id in ipairs(ids) do
+    redis.call('ZREM', KEYS[1], id)
+    redis.call('ZADD', KEYS[3], ARGV[3], id)
+    table.insert(out, id)
+    table.insert(out, redis.call('HGET', KEYS[4], id))
+end
+if redis.call('ZCARD', KEYS[1]) == 0 then
+    redis.call('SREM', KEYS[2], KEYS[1])
+end
+return out
+"""
+
+# Splits a "where" entry into score and queue key.
+_WHERE = """
+local function where(id)
+    local w = redis.call('HGET', KEYS[2], id)
+    if not w then
+        return nil, nil
+    end
+    local sp = string.find(w, ' ', 1, true)
+    return string.sub(w, 1, sp - 1), string.sub(w, sp + 1)
+end
+"""
+
+# KEYS: inflight, where, pending, jobs; ARGV: now, ids. Claims the given
+# deployments from whichever queue holds them (claimed ones are skipped).
+# Returns id1, message1, id2, message2, ...
+_CLAIM_IDS = _WHERE + """
+local out = {}
+for i = 2, #ARGV do
+    local id = ARGV[i]
+    local _, key = where(id)
+    if key and redis.call('ZREM', key, id) == 1 then
+        redis.call('ZADD', KEYS[1], ARGV[1], id)
+        table.insert(out, id)
+        table.insert(out, redis.call('HGET', KEYS[4], id))
+        if redis.call('ZCARD', key) == 0 then
+            redis.call('SREM', KEYS[3], key)
+        end
+    end
+end
+return out
+"""
+
+# KEYS: inflight, where, jobs; ARGV: ids. Forgets a deployment unless it was
+# pushed again while in flight.
+_ACK = _WHERE + """
+for _, id in ipairs(ARGV) do
+    redis.call('ZREM', KEYS[1], id)
+    local _, key = where(id)
+    if not key or not redis.call('ZSCORE', key, id) then
+        redis.call('HDEL', KEYS[2], id)
+        redis.call('HDEL', KEYS[3], id)
+    end
+end
+return #ARGV
+"""
+
+# KEYS: inflight, where, pending; ARGV: ids. Puts claimed deployments back in
+# their queue at their original position.
+_RELEASE = _WHERE + """
+local n = 0
+for _, id in ipairs(ARGV) do
+    if redis.call('ZREM', KEYS[1], id) == 1 then
+        local score, key = where(id)
+        if key then
+            redis.call('ZADD', key, score, id)
+            redis.call('SADD', KEYS[3], key)
+            n = n + 1
+        end
+    end
+end
+return n
+"""
+
+# KEYS: inflight, where, pending, wake; ARGV: claim cutoff. Releases claims
+# older than the cutoff and wakes the consumer if there were any.
+_RECOVER = _WHERE + """
+local ids = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1])
+for _, id in ipairs(ids) do
+    redis.call('ZREM', KEYS[1], id)
+    local score, key = where(id)
+    if key then
+        redis.call('ZADD', key, score, id)
+        redis.call('SADD', KEYS[3], key)
+    end
+end
+if #ids > 0 then
+    redis.call('RPUSH', KEYS[4], 1)
+end
+return #ids
+"""
+
+# KEYS: inflight, where, jobs; ARGV: ids. Removes deployments wherever they are.
+DISCARD_SCRIPT = _WHERE + """
+for _, id in ipairs(ARGV) do
+    local _, key = where(id)
+    if key then
+        redis.call('ZREM', key, id)
+    end
+    redis.call('ZREM', KEYS[1], id)
+    redis.call('HDEL', KEYS[2], id)
+    redis.call('HDEL', KEYS[3], id)
+end
+return #ARGV
+"""
+
+
+def queue_key(msg: Dict) -> str:
+    """Queue of a message: its cluster's, or its organization's for any-cluster deployments."""
+    if msg.get('cluster_id') is not None:
+        return f"{QUEUE_PREFIX}:cluster:{msg['cluster_id']}"
+    return f"{QUEUE_PREFIX}:org:{msg['organization_id']}"
+
+
+def parse_queue_key(key: str) -> Tuple[str, int]:
+    """``("cluster", id)`` or ``("org", id)``."""
+    kind, ident = key[len(QUEUE_PREFIX) + 1:].split(":")
+    return kind, int(ident)
+
+
+def queue_score(priority: str, enqueued_at: Optional[float] = None) -> float:
+    band = PRIORITY_BANDS[priority.upper()]
+    return band * BAND_WIDTH + (time.time() if enqueued_at is None else enqueued_at)
+
+
+def push_args(msg: Dict, enqueued_at: Optional[float] = None) -> Tuple[List[str], List]:
+    """KEYS and ARGV of PUSH_SCRIPT for one queue message."""
+    key = queue_key(msg)
+    score = queue_score(msg['priority'], enqueued_at)
+    return (
+        [JOBS_KEY, WHERE_KEY, key, PENDING_KEY, WAKE_KEY],
+        [msg['deployment_id'], json.dumps(msg), repr(score), WAKE_MAX],
+    )
+
+
+class ReliableQueue:
+    """
+    Queued deployments in one Redis sorted set per cluster (and one per
+    organization for any-cluster deployments), consumed at least once.
+
+    Producers run PUSH_SCRIPT. The consumer waits on the wake list, claims the
+    top candidates of the queues worth looking at, and then either acks a
+    claimed deployment once its outcome is committed or releases it back to its
+    original position. Claims that are neither (a crash, a lost commit) are
+    released by :meth:`recover`.
+    """
+
+    def __init__(self, r):
+        self.r = r
+        self._push = r.register_script(PUSH_SCRIPT)
+        self._claim = r.register_script(_CLAIM)
+        self._claim_ids = r.register_script(_CLAIM_IDS)
+        self._ack = r.register_script(_ACK)
+        self._release = r.register_script(_RELEASE)
+        self._recover = r.register_script(_RECOVER)
+        self._discard = r.register_script(DISCARD_SCRIPT)
+
+    async def wait(self, timeout: float) -> bool:
+        """Block up to ``timeout`` seconds for a push."""
+        return await self.r.blpop([WAKE_KEY], timeout=timeout) is not None
+
+    async def clear_signals(self) -> int:
+        """Consume every pending wake-up; returns how many there were."""
+        async with self.r.pipeline(transaction=True) as pipe:
+            count, _ = await pipe.llen(WAKE_KEY).delete(WAKE_KEY).execute()
+        return count
+
+    async def pending(self) -> List[str]:
+        return sorted(await self.r.smembers(PENDING_KEY))
+
+    async def push(self, msg: Dict) -> None:
+        keys, args = push_args(msg)
+        await self._push(keys=keys, args=args)
+
+    async def claim(self, key: str, limit: int, high_only: bool = False) -> List[Tuple[int, Optional[str]]]:
+        """Claim up to ``limit`` deployments from the head of queue ``key``: ``(id, message)`` pairs."""
+        bound = repr(BAND_WIDTH) if high_only else "+inf"
+        out = await self._claim(keys=[key, PENDING_KEY, INFLIGHT_KEY, JOBS_KEY], args=[bound, limit, time.time()])
+        return [(int(out[i]), out[i + 1]) for i in range(0, len(out), 2)]
+
+    async def claim_ids(self, ids: Iterable[int]) -> List[Tuple[int, Optional[str]]]:
+        """Claim the given deployments wherever they are queued: ``(id, message)`` pairs."""
+        ids = list(ids)
+        if not ids:
+            return []
+        out = await self._claim_ids(keys=[INFLIGHT_KEY, WHERE_KEY, PENDING_KEY, JOBS_KEY], args=[time.time(), *ids])
+        return [(int(out[i]), out[i + 1]) for i in range(0, len(out), 2)]
+
+    async def ack(self, ids: Iterable[int]) -> None:
+        ids = list(ids)
+        if ids:
+            await self._ack(keys=[INFLIGHT_KEY, WHERE_KEY, JOBS_KEY], args=ids)
+
+    async def release(self, ids: Iterable[int]) -> int:
+        ids = list(ids)
+        if not ids:
+            return 0
+        return await self._release(keys=[INFLIGHT_KEY, WHERE_KEY, PENDING_KEY], args=ids)
+
+    async def touch(self, ids: Iterable[int]) -> None:
+        """Renew the claim on deployments still held on purpose (e.g. waiting gang members)."""
+        now = time.time()
+        mapping = {dep_id: now for dep_id in ids}
+        if mapping:
+            await self.r.zadd(INFLIGHT_KEY, mapping, xx=True)
+
+    async def recover(self, older_than: float) -> int:
+        """Release claims taken more than ``older_than`` seconds ago; returns how many."""
+        return await self._recover(
+            keys=[INFLIGHT_KEY, WHERE_KEY, PENDING_KEY, WAKE_KEY], args=[time.time() - older_than]
+        )
+
+    async def discard(self, ids: Iterable[int]) -> None:
+        ids = list(ids)
+        if ids:
+            await self._discard(keys=[INFLIGHT_KEY, WHERE_KEY, JOBS_KEY], args=ids)
+
+    async def adopt_list(self, key: str) -> int:
+        """Move messages left in a plain list queue (the previous format) into the sorted sets."""
+        moved = 0
+        while True:
+            msgs = await self.r.lpop(key, 1000)
+            if not msgs:
+                return moved
+            for msg in msgs:
+                try:
+                    await self.push(json.loads(msg))
+                    moved += 1
+                except (json.JSONDecodeError, KeyError) as e:
+                    print(f"⚠️  Dropping invalid legacy queue message: {msg} ({e})")
@@ -1,106 +1,584 @@
 # run_deployment.py
 
 import os
+import time
 import asyncio
 import json
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Iterable, Optional
 
 import redis.asyncio as redis
 
+from app.config import REDIS_DB, REDIS_HOST, REDIS_PORT
 from app.core.algorithm import schedule_jobs as schedule_jobs_on_single_cluster
+from app.core.vectorized import schedule_jobs_vectorized
+from app.core.ledger import ClusterLedger, ResourceLedger
+from app.core.placement import OrgCapacityIndex, assign_clusters
+from app.core.fairshare import FairSharePolicy, parse_weights
+from app.core.backfill import RuntimeEstimator
+from app.core.gang import GangBuffer
+from app.core.batching import AdaptiveWindow, IdleBackoff
+from app.core.reliable_queue import QUEUE_PREFIX, ReliableQueue, parse_queue_key
+from app.core.planner import plan_clusters
+from app.core.status_stream import publish_transitions, transition
+from app.core.capacity import CAPACITY_SNAPSHOT_REFRESH, SnapshotPublisher
 from app.core.scheduler_db import (
     fetch_running_deployments_from_db,
     fetch_all_cluster_resources_from_db,
-    mark_jobs_running,
-    requeue_jobs
+    fetch_cluster_nodes_from_db,
+    fetch_runtime_history,
+    apply_decisions,
+    fail_queued_jobs,
+    fetch_queued_gang_members,
+    mark_jobs_finished
 )
+from app.models.Deployment import DeploymentStatus
 
 
 
-REDIS_QUEUE_KEY="deployment_queue"
-REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
-REDIS_PORT = int(os.getenv("REDIS_PORT", 6379))
+REDIS_QUEUE_KEY=QUEUE_PREFIX
+LEGACY_QUEUE_KEYS = (f"{QUEUE_PREFIX}:processing", QUEUE_PREFIX)
+REDIS_EVENTS_KEY="deployment_events"
+EVENT_BATCH_SIZE = 1000
+
+# Scheduling engines share the (scheduled, preempted) contract of schedule_jobs.
+# "numpy" keeps the per-cluster queue in arrays and is the better fit for
+# clusters with tens of thousands of queued jobs.
+SCHEDULING_ENGINES = {
+    "python": schedule_jobs_on_single_cluster,
+    "numpy": schedule_jobs_vectorized,
+}
+SCHEDULER_ENGINE = os.getenv("SCHEDULER_ENGINE", "python")
+# "min-cost" (cheapest victim set) or "largest-first" (original greedy)
+SCHEDULER_PREEMPTION = os.getenv("SCHEDULER_PREEMPTION", "min-cost")
+# Node placement on clusters made of nodes: "best-fit" (pack) or "worst-fit" (spread).
+# Node-based clusters are always scheduled by the python engine.
+SCHEDULER_PACKING = os.getenv("SCHEDULER_PACKING", "best-fit")
+# Cluster choice for any-cluster deployments: "spread" (emptiest cluster) or "pack" (fullest that fits)
+SCHEDULER_PLACEMENT = os.getenv("SCHEDULER_PLACEMENT", "spread")
+
+# Job order within each priority class: "score" (largest first) or "drf"
+# (Dominant Resource Fairness over organizations, and owners if FAIRSHARE_BY_OWNER).
+# Weights are "id:weight" lists, e.g. FAIRSHARE_ORG_WEIGHTS="1:2,4:0.5".
+SCHEDULER_ORDERING = os.getenv("SCHEDULER_ORDERING", "score")
+FAIRSHARE_BY_OWNER = os.getenv("FAIRSHARE_BY_OWNER", "false").lower() == "true"
+FAIRSHARE_ORG_WEIGHTS = parse_weights(os.getenv("FAIRSHARE_ORG_WEIGHTS", ""))
+FAIRSHARE_OWNER_WEIGHTS = parse_weights(os.getenv("FAIRSHARE_OWNER_WEIGHTS", ""))
+
+# "easy" reserves a start time for the first HIGH job that cannot start and only
+# backfills jobs predicted (from past runs of the same image/owner) to finish
+# before it; "off" keeps plain greedy filling.
+SCHEDULER_BACKFILL = os.getenv("SCHEDULER_BACKFILL", "off")
+BACKFILL_HISTORY_LIMIT = int(os.getenv("BACKFILL_HISTORY_LIMIT", 10000))
+BACKFILL_HISTORY_REFRESH = int(os.getenv("BACKFILL_HISTORY_REFRESH", 600))
+
+# Seconds to wait for the remaining members of a gang before giving up on it
+GANG_TIMEOUT = int(os.getenv("SCHEDULER_GANG_TIMEOUT", 600))
+
+# The consumer blocks until a job is pushed (or an event arrives) and starts a
+# cycle right away, after collecting further pushes for a micro-batch window that
+# adapts between SCHEDULER_BATCH_WINDOW_MIN and _MAX seconds (or until
+# SCHEDULER_BATCH_MAX pushes). While idle it still wakes every 1s..SCHEDULER_IDLE_TIMEOUT s.
+BATCH_WINDOW_MIN = float(os.getenv("SCHEDULER_BATCH_WINDOW_MIN", 0.005))
+BATCH_WINDOW_MAX = float(os.getenv("SCHEDULER_BATCH_WINDOW_MAX", 0.5))
+BATCH_MAX = int(os.getenv("SCHEDULER_BATCH_MAX", 5000))
+IDLE_TIMEOUT = float(os.getenv("SCHEDULER_IDLE_TIMEOUT", 10))
+
+# Queued jobs live in one sorted set per cluster (and per organization for
+# any-cluster jobs), HIGH first, then by enqueue time. Each cycle claims at most
+# SCHEDULER_CLAIM_LIMIT jobs from the head of each queue, and only from queues
+# whose clusters have free capacity (or, for HIGH jobs, preemptible LOW jobs).
+CLAIM_LIMIT = int(os.getenv("SCHEDULER_CLAIM_LIMIT", 1000))
+# Claimed jobs are acked once committed or released back to their queue; claims
+# older than this (a crash, a lost commit) are released by a sweep. A restarted
+# consumer releases all of them at once.
+INFLIGHT_TIMEOUT = int(os.getenv("SCHEDULER_INFLIGHT_TIMEOUT", 300))
+
+# Worker processes for the per-cluster scheduling calls (default 0: everything is
+# scheduled in the consumer process; set it to the CPU count for large fleets).
+# Clusters with fewer than SCHEDULER_POOL_MIN_JOBS queued plus preemptible jobs
+# are scheduled inline anyway, where pickling would cost more than it saves.
+SCHEDULER_WORKERS = int(os.getenv("SCHEDULER_WORKERS", 0))
+SCHEDULER_POOL_MIN_JOBS = int(os.getenv("SCHEDULER_POOL_MIN_JOBS", 2000))
+# A cycle's decisions are committed in one transaction per shard of up to
+# SCHEDULER_COMMIT_SHARD clusters, SCHEDULER_DB_CONCURRENCY shards at a time
+SCHEDULER_COMMIT_SHARD = int(os.getenv("SCHEDULER_COMMIT_SHARD", 100))
+SCHEDULER_DB_CONCURRENCY = int(os.getenv("SCHEDULER_DB_CONCURRENCY", 5))
+
+# How often (seconds) the in-memory ledger is checked against the DB for drift
+RECONCILE_INTERVAL = int(os.getenv("SCHEDULER_RECONCILE_INTERVAL", 300))
+
+FINISHED_EVENTS = {
+    "completed": DeploymentStatus.COMPLETED,
+    "failed": DeploymentStatus.FAILED,
+}
 
 async def get_redis_client():
     """Connects to Redis."""
     try:
-        r = redis.Redis(host=REDIS_HOST, port=REDIS_PORT, decode_responses=True)
+        r = redis.Redis(host=REDIS_HOST, port=REDIS_PORT, db=REDIS_DB, decode_responses=True)
         await r.ping()
         print("Connected to Redis")
         return r
     except redis.asyncio.ConnectionError as e:
         print(f"Could not connect to Redis: {e}")
         return None
-    
 
-async def run_scheduler_consumer():
-    """Poll Redis queue, normalize jobs, group by cluster, and schedule them."""
+
+async def apply_deployment_events(r, ledger: ResourceLedger):
+    """Drain lifecycle events and release finished/deleted jobs from the ledger."""
+    raw_events = await r.lpop(REDIS_EVENTS_KEY, EVENT_BATCH_SIZE) or []
+    finished: dict[tuple[int, DeploymentStatus], list[int]] = defaultdict(list)
+    for msg in raw_events:
+        try:
+            event = json.loads(msg)
+            kind = event["event"]
+            dep_id = event["deployment_id"]
+            if kind in FINISHED_EVENTS:
+                finished[(event["cluster_id"], FINISHED_EVENTS[kind])].append(dep_id)
+            elif kind != "deleted":
+                raise KeyError(kind)
+            ledger.on_released(dep_id)
+        except (json.JSONDecodeError, KeyError) as e:
+            print(f"⚠️  Skipping invalid event: {msg} ({e})")
+
+    transitions = []
+    now = datetime.utcnow()
+    for (cid, status), ids in finished.items():
+        try:
+            changed = await mark_jobs_finished(cid, ids, status)
+        except RuntimeError as e:
+            print(f"⚠️  {e}")
+            continue
+        transitions += [transition(dep_id, cid, status, DeploymentStatus.RUNNING, now) for dep_id in changed]
+    await publish_status(r, transitions)
+    return len(raw_events)
+
+
+async def publish_status(r, transitions: list) -> None:
+    """Publish committed transitions for the API's event streams; clients can still poll if this fails."""
+    try:
+        await publish_transitions(r, transitions)
+    except Exception as e:
+        print(f"⚠️  Publishing {len(transitions)} status transitions failed: {e!r}")
+
+
+async def fail_expired_gangs(r, expired: dict) -> list:
+    """
+    Mark the members of gangs that timed out FAILED, so they are not left QUEUED
+    with nothing to schedule them; returns the ids that could not be marked,
+    which go back to their queue instead.
+    """
+    ids = [j["id"] for gang in expired.values() for j in gang]
+    print(f"⚠️  Gang(s) {list(expired)} incomplete after {GANG_TIMEOUT}s; failing {ids}")
+    try:
+        failed = await fail_queued_jobs(ids)
+    except Exception as e:
+        print(f"❌ Failing expired gang members failed: {e!r}; releasing them to their queue")
+        return ids
+    now = datetime.utcnow()
+    await publish_status(r, [
+        transition(dep_id, cid, DeploymentStatus.FAILED, DeploymentStatus.QUEUED, now, reason="gang incomplete")
+        for dep_id, cid in failed
+    ])
+    return []
+
+
+def normalize_messages(raw_msgs) -> list:
+    """Claimed ``(id, message)`` pairs as scheduler jobs; invalid messages are skipped."""
+    jobs = []
+    for _, msg in raw_msgs:
+        try:
+            job = json.loads(msg)
+            jobs.append({
+                "id":         job["deployment_id"],
+                "priority":   job["priority"].upper(),
+                "cpu":        job["required_cpu"],
+                "ram":        job["required_ram"],
+                "gpu":        job["required_gpu"],
+                "cluster_id": job.get("cluster_id"),
+                "organization_id": job.get("organization_id"),
+                "owner_id":   job.get("owner_id"),
+                "image":      job.get("image"),
+                "gang_id":    job.get("gang_id"),
+                "gang_size":  job.get("gang_size"),
+                "any_cluster": job.get("any_cluster", job.get("cluster_id") is None),
+            })
+        except (TypeError, json.JSONDecodeError, KeyError) as e:
+            print(f"⚠️  Skipping invalid queue message: {msg} ({e})")
+    return jobs
+
+
+async def claim_gang_members(queue: ReliableQueue, gang_ids: list, claimed: set) -> list:
+    """Claim the queued members of ``gang_ids`` not claimed yet: ``(id, message)`` pairs."""
+    try:
+        ids = await fetch_queued_gang_members(gang_ids)
+    except Exception as e:
+        print(f"⚠️  Looking up the members of gang(s) {gang_ids} failed: {e!r}")
+        return []
+    return await queue.claim_ids(i for i in ids if i not in claimed)
+
+
+async def load_ledger(ledger: ResourceLedger, cluster_ids=None):
+    """Load (or reload) clusters and their running jobs from the DB into the ledger."""
+    resources = await fetch_all_cluster_resources_from_db(cluster_ids)
+    running = await fetch_running_deployments_from_db(cluster_ids)
+    nodes = await fetch_cluster_nodes_from_db(cluster_ids)
+    ledger.load(resources, running, nodes)
+    return resources, running
+
+
+async def wait_for_work(queue: ReliableQueue, window: AdaptiveWindow, idle: IdleBackoff) -> int:
+    """Block until something is pushed, then keep collecting pushes for the batch window; returns how many arrived."""
+    if not await queue.wait(idle.seconds):
+        idle.update(0)
+        return 0
+    arrived = 1
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + window.seconds
+    while arrived < BATCH_MAX:
+        arrived += await queue.clear_signals()
+        remaining = deadline - loop.time()
+        if arrived >= BATCH_MAX or remaining <= 0:
+            break
+        if not await queue.wait(remaining):
+            break
+        arrived += 1
+    window.update(arrived)
+    idle.update(arrived)
+    return arrived
+
+
+def claim_scope(clusters: Iterable[ClusterLedger]) -> Optional[str]:
+    """
+    What is worth claiming from a queue served by ``clusters``: "all" if one of
+    them has free capacity, "high" if one only has LOW jobs that HIGH jobs
+    could preempt, None if nothing could start.
+    """
+    scope = None
+    for cluster in clusters:
+        if cluster.has_room():
+            return "all"
+        if cluster.preemptible:
+            scope = "high"
+    return scope
+
+
+def requeue_message(job: dict) -> dict:
+    """Queue message for a preempted job, in the shape enqueue_deployment pushes."""
+    return {
+        "deployment_id": job["id"],
+        "priority": job["priority"],
+        "required_cpu": job["cpu"],
+        "required_ram": job["ram"],
+        "required_gpu": job["gpu"],
+        "cluster_id": None if job.get("any_cluster") else job["cluster_id"],
+        "organization_id": job.get("organization_id"),
+        "owner_id": job.get("owner_id"),
+        "image": job.get("image"),
+        "gang_id": job.get("gang_id"),
+        "gang_size": job.get("gang_size"),
+        "any_cluster": job.get("any_cluster", False),
+    }
+
+
+class StageTimer:
+    """Wall-clock time spent in each stage of one scheduler cycle."""
+
+    def __init__(self):
+        self.stages: dict[str, float] = {}
+        self.start = self.mark = time.perf_counter()
+
+    def lap(self, stage: str) -> None:
+        now = time.perf_counter()
+        self.stages[stage] = self.stages.get(stage, 0.0) + now - self.mark
+        self.mark = now
+
+    def report(self) -> str:
+        stages = ", ".join(f"{name} {seconds:.3f}s" for name, seconds in self.stages.items())
+        return f"{self.mark - self.start:.3f}s ({stages})"
+
+
+async def commit_decisions(
+    queue: ReliableQueue,
+    ledger: ResourceLedger,
+    decisions: dict,
+    db_slots: asyncio.Semaphore
+) -> set:
+    """
+    Write the decisions of a shard of clusters to the DB in one transaction, then
+    apply what was committed to the ledger. Returns the scheduled deployments whose
+    claim is settled: those the DB actually started, and those that were no longer
+    QUEUED (a redelivered message). Anything else the planner scheduled (a gang the
+    DB refused, a cluster that is gone) is still QUEUED and must be released.
+    Preempted deployments are requeued through the outbox, in the same transaction.
+    """
+    for cid, (scheduled, preempted) in decisions.items():
+        if preempted:
+            print(f"⚠️  Preempted on cluster {cid}: {[j['id'] for j in preempted]}")
+        if scheduled:
+            print(f"✅ Scheduled on cluster {cid}: {[j['id'] for j in scheduled]}")
+    async with db_slots:
+        applied = await apply_decisions({
+            cid: (
+                [j['id'] for j in scheduled],
+                {j['id']: requeue_message(j) for j in preempted},
+                {j['id']: j['node_id'] for j in scheduled if 'node_id' in j}
+            )
+            for cid, (scheduled, preempted) in decisions.items()
+        })
+    now = datetime.utcnow()
+    settled = set()
+    transitions = []
+    for cid, (scheduled, preempted) in decisions.items():
+        if cid not in applied:
+            print(f"⚠️  Cluster {cid} not found in DB")
+            continue
+        started, requeued, stale = map(set, applied[cid])
+        settled |= started | stale
+        refused = {j['id'] for j in scheduled} - started - stale
+        if refused:
+            print(f"⚠️  Not started on cluster {cid} (incomplete gang in DB): {sorted(refused)}")
+        for j in preempted:
+            ledger.on_released(j['id'])
+            if j['id'] in requeued:
+                transitions.append(transition(
+                    j['id'], cid, DeploymentStatus.QUEUED, DeploymentStatus.RUNNING, now, reason="preempted"
+                ))
+        for j in scheduled:
+            j['started_at'] = now
+        ledger.on_scheduled(cid, [j for j in scheduled if j['id'] in started])
+        transitions += [
+            transition(dep_id, cid, DeploymentStatus.RUNNING, DeploymentStatus.QUEUED, now)
+            for dep_id in applied[cid][0]
+        ]
+    await publish_status(queue.r, transitions)
+    return settled
+
+
+def unsettled(decisions: dict, jobs_by_cluster: dict, settled: set) -> list:
+    """Claimed jobs of the scheduled clusters that the DB neither started nor found finished."""
+    return [j["id"] for cid in decisions for j in jobs_by_cluster[cid] if j["id"] not in settled]
+
+
+async def run_scheduler_consumer(engine: str = SCHEDULER_ENGINE):
+    """Claim queued jobs for clusters that can take them, and schedule them cluster by cluster."""
+    if engine not in SCHEDULING_ENGINES:
+        raise ValueError(f"Unknown scheduler engine '{engine}', expected one of {sorted(SCHEDULING_ENGINES)}")
+    schedule = SCHEDULING_ENGINES[engine]
+    if SCHEDULER_ORDERING not in ("score", "drf"):
+        raise ValueError(f"Unknown scheduler ordering '{SCHEDULER_ORDERING}'")
+    fair_share = None
+    if SCHEDULER_ORDERING == "drf":
+        fair_share = FairSharePolicy(FAIRSHARE_ORG_WEIGHTS, FAIRSHARE_OWNER_WEIGHTS, FAIRSHARE_BY_OWNER)
+    if SCHEDULER_BACKFILL not in ("off", "easy"):
+        raise ValueError(f"Unknown backfill mode '{SCHEDULER_BACKFILL}'")
+    estimator = None
+    last_history = 0.0
+
     r = await get_redis_client()
     if not r:
         print("❌ Failed to connect to Redis; exiting.")
         return
 
-    print(f"🔄 Polling Redis queue '{REDIS_QUEUE_KEY}' every 10s")
-    while True:
-        # 1) Fetch all queue messages
-        raw_msgs = await r.lrange(REDIS_QUEUE_KEY, 0, -1)
-        if raw_msgs:
-            # Clear queue immediately to avoid duplicates
-            await r.delete(REDIS_QUEUE_KEY)
-            print(f"📥 Retrieved {len(raw_msgs)} new job(s) from queue")
-        else:
-            raw_msgs = []
-
-        # 2) Deserialize and normalize keys
-        normalized_jobs = []
-        for msg in raw_msgs:
-            try:
-                job = json.loads(msg)
-                normalized_jobs.append({
-                    "id":         job["deployment_id"],
-                    "priority":   job["priority"].upper(),
-                    "cpu":        job["required_cpu"],
-                    "ram":        job["required_ram"],
-                    "gpu":        job["required_gpu"],
-                    "cluster_id": job["cluster_id"],
-                })
-            except (json.JSONDecodeError, KeyError) as e:
-                print(f"⚠️  Skipping invalid queue message: {msg} ({e})")
-
-        # 3) Group new jobs by cluster_id
-        jobs_by_cluster: dict[int, list[dict]] = defaultdict(list)
-        for job in normalized_jobs:
-            jobs_by_cluster[job["cluster_id"]].append(job)
-
-        # 4) Fetch current state from DB
-        running = await fetch_running_deployments_from_db()
-        resources = await fetch_all_cluster_resources_from_db()
-        print(f"ℹ️  {len(running)} running job(s), {len(resources)} cluster(s) in system")
-
-        # 5) For each cluster, schedule
-        for cid, res in resources.items():
-            new_jobs = jobs_by_cluster.get(cid, [])
-            active   = [j for j in running if j["cluster_id"] == cid]
-            if not new_jobs and not active:
-                continue
-
-            print(f"🔧 Scheduling cluster {cid}: {len(new_jobs)} new, {len(active)} running")
-            scheduled, preempted = schedule_jobs_on_single_cluster(
-                new_jobs,
-                active,
-                {"cpu": res["total_cpu"], "ram": res["total_ram"], "gpu": res["total_gpu"]}
-            )
+    queue = ReliableQueue(r)
+    snapshots = SnapshotPublisher(r)
+    # messages left in the list-based queue of earlier versions
+    adopted = 0
+    for key in LEGACY_QUEUE_KEYS:
+        adopted += await queue.adopt_list(key)
+    if adopted:
+        print(f"ℹ️  Moved {adopted} message(s) from the legacy queue list")
+    await r.delete(f"{QUEUE_PREFIX}:claims")
+    recovered = await queue.recover(0)
+    if recovered:
+        print(f"ℹ️  Requeued {recovered} job(s) left in flight by a previous run")
+    last_sweep = time.monotonic()
+    # deployment ids claimed from the queues and not yet acked or released
+    claimed: set[int] = set()
 
-            if scheduled:
-                print(f"✅ Scheduled on cluster {cid}: {[j['id'] for j in scheduled]}")
-                await mark_jobs_running(cid, [j['id'] for j in scheduled])
-            if preempted:
-                print(f"⚠️  Preempted on cluster {cid}: {[j['id'] for j in preempted]}")
-                await requeue_jobs(cid, [j['id'] for j in preempted])
+    ledger = ResourceLedger()
+    gangs = GangBuffer(GANG_TIMEOUT)
+    resources, running = await load_ledger(ledger)
+    last_reconcile = time.monotonic()
+    last_snapshot = 0.0
+    print(f"ℹ️  Ledger loaded: {sum(map(len, running.values()))} running job(s), {len(resources)} cluster(s)")
 
-        # 6) Sleep until next cycle
-        await asyncio.sleep(10)
+    pool = ProcessPoolExecutor(SCHEDULER_WORKERS) if SCHEDULER_WORKERS > 0 else None
+    db_slots = asyncio.Semaphore(SCHEDULER_DB_CONCURRENCY)
+    window = AdaptiveWindow(BATCH_WINDOW_MIN, BATCH_WINDOW_MAX)
+    idle = IdleBackoff(min(1.0, IDLE_TIMEOUT), IDLE_TIMEOUT)
 
+    print(f"🔄 Consuming per-cluster Redis queues '{REDIS_QUEUE_KEY}:*' (engine: {engine})")
+    try:
+        while True:
+            timer = StageTimer()
+            # 1) Wait for submissions or lifecycle events and micro-batch them
+            await wait_for_work(queue, window, idle)
+            timer.lap("wait")
+
+            # 2) Bring the ledger up to date: lifecycle events, periodic drift check,
+            #    and clusters with queued jobs that have not been seen before
+            await apply_deployment_events(r, ledger)
+            if time.monotonic() - last_reconcile >= RECONCILE_INTERVAL:
+                drifted = ledger.reconcile(
+                    await fetch_all_cluster_resources_from_db(),
+                    await fetch_running_deployments_from_db(),
+                    await fetch_cluster_nodes_from_db()
+                )
+                if drifted:
+                    print(f"⚠️  Ledger drift on cluster(s) {drifted}; rebuilt from DB")
+                last_reconcile = time.monotonic()
+            queues = {key: parse_queue_key(key) for key in await queue.pending()}
+            unknown = [ident for kind, ident in queues.values() if kind == "cluster" and ident not in ledger]
+            if unknown:
+                await load_ledger(ledger, unknown)
+
+            if SCHEDULER_BACKFILL == "easy" and time.monotonic() - last_history >= BACKFILL_HISTORY_REFRESH:
+                estimator = RuntimeEstimator.from_history(await fetch_runtime_history(BACKFILL_HISTORY_LIMIT))
+                last_history = time.monotonic()
+            timer.lap("ledger")
+
+            # 3) Claim the head of every queue whose clusters could start something;
+            #    the backlog of full clusters is not even read
+            scopes = {}
+            for key, (kind, ident) in queues.items():
+                if kind == "org":
+                    scope = claim_scope(ledger.organization_clusters([ident]))
+                elif ident in ledger:
+                    scope = claim_scope([ledger[ident]])
+                else:
+                    scope = "all"  # claimed only to be dropped in step 7
+                if scope is not None:
+                    scopes[key] = scope
+            batches = await asyncio.gather(*(
+                queue.claim(key, CLAIM_LIMIT, high_only=(scope == "high")) for key, scope in scopes.items()
+            ))
+            raw_msgs = [pair for batch in batches for pair in batch]
+            if raw_msgs:
+                print(f"📥 Claimed {len(raw_msgs)} job(s) from {len(scopes)} queue(s)")
+            timer.lap("claim")
+
+            # 4) Deserialize and normalize keys
+            claimed.update(dep_id for dep_id, _ in raw_msgs)
+            normalized_jobs = normalize_messages(raw_msgs)
+
+            # Gang members wait until the whole gang has been submitted. Members
+            # of a waiting gang that are already queued are claimed right away,
+            # whatever their queue's claim scope or CLAIM_LIMIT, so a gang split
+            # across queues or cycles does not sit out its timeout
+            normalized_jobs = gangs.add(normalized_jobs, time.monotonic())
+            if gangs.waiting:
+                rest = await claim_gang_members(queue, list(gangs.waiting), claimed)
+                claimed.update(dep_id for dep_id, _ in rest)
+                normalized_jobs += gangs.add(normalize_messages(rest), time.monotonic())
+            expired = gangs.expire(time.monotonic())
+            unfailed = await fail_expired_gangs(r, expired) if expired else []
+
+            # Group new jobs by cluster_id; any-cluster jobs are placed in step 5
+            jobs_by_cluster: dict[int, list[dict]] = defaultdict(list)
+            org_jobs = []
+            for job in normalized_jobs:
+                if job["cluster_id"] is None:
+                    org_jobs.append(job)
+                else:
+                    jobs_by_cluster[job["cluster_id"]].append(job)
+            timer.lap("normalize")
+
+            # 5) Bind any-cluster jobs to a cluster of their organization, net of
+            #    the pinned jobs already headed for each cluster this cycle
+            release: list[int] = list(unfailed)
+            if org_jobs:
+                clusters = ledger.organization_clusters(j["organization_id"] for j in org_jobs)
+                index = OrgCapacityIndex(
+                    (c.capacity(jobs_by_cluster.get(c.cluster_id, ())) for c in clusters),
+                    SCHEDULER_PLACEMENT
+                )
+                assigned, unplaced = assign_clusters(org_jobs, index)
+                for job in assigned:
+                    jobs_by_cluster[job["cluster_id"]].append(job)
+                if unplaced:
+                    print(f"⚠️  No cluster with room for any-cluster job(s) {[j['id'] for j in unplaced]}")
+                    release.extend(j["id"] for j in unplaced)
+            timer.lap("place")
+
+            # 6) Schedule every cluster with new work against its ledger; the
+            #    decisions are independent, so large clusters run in parallel
+            plans = {}
+            for cid, new_jobs in jobs_by_cluster.items():
+                if cid not in ledger:
+                    print(f"⚠️  Skipping {len(new_jobs)} job(s) for unknown cluster {cid}")
+                    continue
+                cluster = ledger[cid]
+                print(f"🔧 Scheduling cluster {cid}: {len(new_jobs)} new, {len(cluster.running)} running")
+                plans[cid] = dict(
+                    schedule=schedule,
+                    new_jobs=new_jobs,
+                    preemptible=cluster.preemptible_jobs(),
+                    total=cluster.total,
+                    available=cluster.available(),
+                    preemption=SCHEDULER_PREEMPTION,
+                    nodes=cluster.node_capacity(),
+                    packing=SCHEDULER_PACKING,
+                    fair_share=fair_share,
+                    tenant_usage=cluster.tenant_usage(),
+                    estimator=estimator,
+                    running=list(cluster.running.values()) if estimator is not None else (),
+                )
+            decisions = await plan_clusters(plans, pool, SCHEDULER_POOL_MIN_JOBS)
+            timer.lap("schedule")
+
+            # 7) Commit the decisions, one transaction per shard of clusters
+            committing = [cid for cid, (scheduled, preempted) in decisions.items() if scheduled or preempted]
+            shard_size = max(1, SCHEDULER_COMMIT_SHARD)
+            shards = [committing[i:i + shard_size] for i in range(0, len(committing), shard_size)]
+            results = await asyncio.gather(
+                *(commit_decisions(queue, ledger, {cid: decisions[cid] for cid in shard}, db_slots) for shard in shards),
+                return_exceptions=True
+            )
+            settled = set()
+            for shard, result in zip(shards, results):
+                if isinstance(result, Exception):
+                    print(f"❌ Commit failed on cluster(s) {shard}: {result!r}; their jobs stay queued")
+                else:
+                    settled |= result
+            timer.lap("commit")
+
+            # 8) Jobs the DB did not start go back to their queue position; the rest
+            #    (started, no longer queued, invalid, unknown cluster, failed gangs)
+            #    are acknowledged. Waiting gang members keep their claim fresh.
+            release.extend(unsettled(decisions, jobs_by_cluster, settled))
+            held = {dep_id for gang in gangs.waiting.values() for dep_id in gang}
+            await queue.release(release)
+            await queue.ack(claimed - held - set(release))
+            claimed &= held
+            await queue.touch(held)
+            if time.monotonic() - last_sweep >= INFLIGHT_TIMEOUT:
+                recovered = await queue.recover(INFLIGHT_TIMEOUT)
+                if recovered:
+                    print(f"⚠️  Requeued {recovered} stale in-flight job(s)")
+                last_sweep = time.monotonic()
+            timer.lap("ack")
+
+            # 9) Publish capacity snapshots for the API: clusters whose running set
+            #    or queue changed, and every cluster each CAPACITY_SNAPSHOT_REFRESH s
+            changed = ledger.take_dirty()
+            changed.update(ident for kind, ident in queues.values() if kind == "cluster" and ident in ledger)
+            if time.monotonic() - last_snapshot >= CAPACITY_SNAPSHOT_REFRESH:
+                changed = set(ledger.clusters)
+                last_snapshot = time.monotonic()
+            try:
+                await snapshots.publish(ledger[cid] for cid in changed)
+            except Exception as e:
+                print(f"⚠️  Publishing capacity snapshots failed: {e!r}")
+            timer.lap("snapshot")
+            if raw_msgs:
+                print(f"⏱️  Cycle {timer.report()}")
+    finally:
+        if pool is not None:
+            pool.shutdown()
 
 if __name__ == "__main__":
     asyncio.run(run_scheduler_consumer())
@@ -2,82 +2,352 @@
 
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
+from sqlalchemy import ARRAY, Float, Integer, String, any_, case, func, insert, literal, update
 from app.models.Deployment import Deployment
 from app.models.Cluster import Cluster
+from app.models.Node import Node
+from app.models.DeploymentOutbox import DeploymentOutbox
 from app.models.Deployment import DeploymentStatus
 from app.core.database import AsyncSessionLocal
-from typing import List, Dict
+from app.core.archive import with_history
+from collections import Counter
+from datetime import datetime
+from typing import List, Dict, Optional, Iterable, Tuple
 
-async def fetch_running_deployments_from_db():
-    """Fetches all currently running deployments."""
-    running_jobs = []
-    async with AsyncSessionLocal() as session: 
+# Columns the scheduler keeps per running job, under the keys it uses for them
+RUNNING_COLUMNS = {
+    'id': Deployment.id,
+    'priority': Deployment.priority,
+    'cpu': Deployment.required_cpu,
+    'ram': Deployment.required_ram,
+    'gpu': Deployment.required_gpu,
+    'cluster_id': Deployment.cluster_id,
+    'organization_id': Deployment.organization_id,
+    'owner_id': Deployment.owner_id,
+    'image': Deployment.image,
+    'gang_id': Deployment.gang_id,
+    'gang_size': Deployment.gang_size,
+    'any_cluster': Deployment.any_cluster,
+    'node_id': Deployment.node_id,
+    'started_at': Deployment.started_at,
+    'retry_count': Deployment.retry_count,
+}
+CLUSTER_COLUMNS = {
+    'cluster_id': Cluster.id,
+    'organization_id': Cluster.organization_id,
+    'owner_id': Cluster.owner_id,
+    'name': Cluster.name,
+    'total_cpu': Cluster.total_cpu,
+    'total_ram': Cluster.total_ram,
+    'total_gpu': Cluster.total_gpu,
+    'available_cpu': Cluster.available_cpu,
+    'available_ram': Cluster.available_ram,
+    'available_gpu': Cluster.available_gpu,
+}
+NODE_COLUMNS = {
+    'cluster_id': Node.cluster_id,
+    'id': Node.id,
+    'total_cpu': Node.total_cpu,
+    'total_ram': Node.total_ram,
+    'total_gpu': Node.total_gpu,
+    'available_cpu': Node.available_cpu,
+    'available_ram': Node.available_ram,
+    'available_gpu': Node.available_gpu,
+}
+
+
+async def fetch_running_deployments_from_db(cluster_ids: Optional[Iterable[int]] = None) -> Dict[int, List[Dict]]:
+    """
+    Fetches all currently running deployments, optionally only for some clusters
+    (e.g. those with queued work), grouped by cluster id.
+    Only the scheduler's columns are selected, as plain rows rather than ORM objects.
+    """
+    keys = list(RUNNING_COLUMNS)
+    priority = keys.index('priority')
+    cluster = keys.index('cluster_id')
+    query = select(*RUNNING_COLUMNS.values()).where(Deployment.status == DeploymentStatus.RUNNING)
+    if cluster_ids is not None:
+        query = query.where(Deployment.cluster_id.in_(list(cluster_ids)))
+    running_by_cluster: Dict[int, List[Dict]] = {}
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(query)
+        for row in result.tuples():
+            job = dict(zip(keys, row))
+            job['priority'] = row[priority].value
+            running_by_cluster.setdefault(row[cluster], []).append(job)
+    return running_by_cluster
+
+async def fetch_all_cluster_resources_from_db(cluster_ids: Optional[Iterable[int]] = None) -> Dict[int, Dict]:
+    """Fetches resources for all clusters, optionally only for some clusters."""
+    keys = list(CLUSTER_COLUMNS)
+    query = select(*CLUSTER_COLUMNS.values())
+    if cluster_ids is not None:
+        query = query.where(Cluster.id.in_(list(cluster_ids)))
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(query)
+        return {row[0]: dict(zip(keys, row)) for row in result.tuples()}
+
+
+async def fetch_cluster_nodes_from_db(cluster_ids: Optional[Iterable[int]] = None) -> Dict[int, List[Dict]]:
+    """Fetches the nodes of every node-based cluster, grouped by cluster id."""
+    keys = list(NODE_COLUMNS)[1:]
+    query = select(*NODE_COLUMNS.values())
+    if cluster_ids is not None:
+        query = query.where(Node.cluster_id.in_(list(cluster_ids)))
+    nodes_by_cluster: Dict[int, List[Dict]] = {}
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(query)
+        for cluster_id, *row in result.tuples():
+            nodes_by_cluster.setdefault(cluster_id, []).append(dict(zip(keys, row)))
+    return nodes_by_cluster
+
+
+async def fetch_runtime_history(limit: int) -> List[Dict]:
+    """Image, owner and run times of the most recently completed deployments, archived ones included."""
+    dep = with_history()
+    async with AsyncSessionLocal() as session:
         result = await session.execute(
-            select(Deployment).where(Deployment.status == DeploymentStatus.RUNNING)
+            select(
+                dep.image,
+                dep.owner_id,
+                dep.started_at,
+                dep.finished_at
+            )
+            .where(
+                dep.status == DeploymentStatus.COMPLETED,
+                dep.started_at.is_not(None),
+                dep.finished_at.is_not(None)
+            )
+            .order_by(dep.finished_at.desc())
+            .limit(limit)
         )
-        deployments = result.scalars().all()
+        return [dict(row._mapping) for row in result]
 
-        for dep in deployments:
-            running_jobs.append({
-                'id': dep.id,
-                'priority': dep.priority.value,
-                'cpu': dep.required_cpu,
-                'ram': dep.required_ram,
-                'gpu': dep.required_gpu,
-                'cluster_id': dep.cluster_id
-            })
-    return running_jobs
-
-async def fetch_all_cluster_resources_from_db():
-    """Fetches resources for all clusters."""
-    cluster_resources = {}
-    async with AsyncSessionLocal() as session:
-        result = await session.execute(select(Cluster))
-        clusters = result.scalars().all()
-        for cluster in clusters:
-             cluster_resources[cluster.id] = {
-                'cluster_id': cluster.id,
-                'total_cpu': cluster.total_cpu,
-                'total_ram': cluster.total_ram,
-                'total_gpu': cluster.total_gpu,
-                'available_cpu': cluster.available_cpu,
-                'available_ram': cluster.available_ram,
-                'available_gpu': cluster.available_gpu
-            }
-    return cluster_resources 
-
-
-async def mark_jobs_running(cluster_id: int, job_ids: List[int]) -> None:
+
+async def _lock_nodes(session: AsyncSession, node_ids: Iterable[Optional[int]]) -> Dict[int, Node]:
+    node_ids = sorted({n for n in node_ids if n is not None})
+    if not node_ids:
+        return {}
+    result = await session.execute(
+        select(Node).where(Node.id.in_(node_ids)).order_by(Node.id).with_for_update()
+    )
+    return {node.id: node for node in result.scalars().all()}
+
+
+def _release_node(nodes: Dict[int, Node], dep: Deployment) -> None:
+    node = nodes.get(dep.node_id)
+    if node is not None:
+        node.available_cpu += dep.required_cpu
+        node.available_ram += dep.required_ram
+        node.available_gpu += dep.required_gpu
+    dep.node_id = None
+
+
+def _array(values: Iterable, type_=Integer):
+    return literal(list(values), ARRAY(type_))
+
+
+def _any(column, values: Iterable, type_=Integer):
+    """``column = ANY(:array)``: a single bound array whatever the number of ids."""
+    return column == any_(_array(values, type_))
+
+
+def _unnest(name: str, **columns):
+    """Parallel (values, type) arrays as a derived table with one row per index."""
+    return select(*(
+        func.unnest(_array(values, type_)).label(column)
+        for column, (values, type_) in columns.items()
+    )).subquery(name)
+
+
+def _add_delta(deltas: Dict[int, List], key: Optional[int], sign: int, cpu, ram, gpu) -> None:
+    if key is None:
+        return
+    delta = deltas.setdefault(key, [0.0, 0, 0])
+    delta[0] += sign * cpu
+    delta[1] += sign * ram
+    delta[2] += sign * gpu
+
+
+async def _apply_capacity(session: AsyncSession, model, deltas: Dict[int, List]) -> None:
+    """Add the aggregated deltas to available_* of all rows in one UPDATE."""
+    if not deltas:
+        return
+    ids = list(deltas)
+    d = _unnest(
+        "d",
+        id=(ids, Integer),
+        cpu=([deltas[i][0] for i in ids], Float),
+        ram=([deltas[i][1] for i in ids], Integer),
+        gpu=([deltas[i][2] for i in ids], Integer),
+    )
+    await session.execute(
+        update(model)
+        .where(model.id == d.c.id)
+        .values(
+            available_cpu=model.available_cpu + d.c.cpu,
+            available_ram=model.available_ram + d.c.ram,
+            available_gpu=model.available_gpu + d.c.gpu,
+        )
+    )
+
+
+async def apply_decisions(
+    decisions: Dict[int, Tuple[List[int], Dict[int, dict], Dict[int, int]]]
+) -> Dict[int, Tuple[List[int], List[int], List[int]]]:
     """
-    For each deployment ID in job_ids:
-    - set status=RUNNING
-    - subtract its resources from the cluster's available_* fields
+    Commit the decisions of a scheduling cycle for many clusters in one transaction.
+    ``decisions`` maps a cluster id to (scheduled ids, preempted id -> queue
+    message, placements job id -> node id); returns cluster id -> (started ids,
+    requeued ids, stale ids), where stale ids are scheduled deployments that were
+    no longer QUEUED.
+    - preempted deployments that are still RUNNING go back to QUEUED with their
+      retry counted and their node cleared (any-cluster ones are unbound again),
+      and their queue message goes to the outbox for the relay to push
+    - scheduled deployments that are still QUEUED become RUNNING on their cluster
+      (and placed node) with started_at stamped; gangs are all-or-nothing, so a
+      member only starts if all gang_size members scheduled on the cluster can
+    - the freed and used capacity is summed per cluster and per node and applied
+      with one UPDATE each
+    Status changes are set-based UPDATE ... RETURNING statements, so the number
+    of round trips does not depend on the number of clusters or jobs. Clusters
+    are locked in id order (nodes only change under their cluster's lock), so
+    concurrent transactions cannot deadlock. Clusters missing from the DB are
+    left out of the result.
     """
+    now = datetime.utcnow()
     async with AsyncSessionLocal() as session:
-        cluster = await session.get(Cluster, cluster_id, with_for_update=True)
-        if not cluster:
-            raise RuntimeError(f"Cluster {cluster_id} not found in DB")
+        result = await session.execute(
+            select(Cluster.id).where(_any(Cluster.id, decisions)).order_by(Cluster.id).with_for_update()
+        )
+        locked = result.scalars().all()
+        applied = {cid: ([], [], []) for cid in locked}
+        cluster_deltas: Dict[int, List] = {}
+        node_deltas: Dict[int, List] = {}
+
+        preempted = [job_id for cid in locked for job_id in decisions[cid][1]]
+        if preempted:
+            old = (
+                select(Deployment.id, Deployment.cluster_id, Deployment.node_id)
+                .where(
+                    _any(Deployment.id, preempted),
+                    _any(Deployment.cluster_id, locked),
+                    Deployment.status == DeploymentStatus.RUNNING
+                )
+                .with_for_update()
+                .cte("old")
+            )
+            result = await session.execute(
+                update(Deployment)
+                .where(Deployment.id == old.c.id)
+                .values(
+                    status=DeploymentStatus.QUEUED,
+                    retry_count=Deployment.retry_count + 1,
+                    node_id=None,
+                    cluster_id=case((Deployment.any_cluster, None), else_=Deployment.cluster_id)
+                )
+                .returning(
+                    Deployment.id, old.c.cluster_id, old.c.node_id,
+                    Deployment.required_cpu, Deployment.required_ram, Deployment.required_gpu
+                )
+            )
+            for dep_id, cid, node_id, *demand in result.tuples():
+                applied[cid][1].append(dep_id)
+                _add_delta(cluster_deltas, cid, 1, *demand)
+                _add_delta(node_deltas, node_id, 1, *demand)
+            outbox = [
+                {"deployment_id": dep_id, "payload": decisions[cid][1][dep_id]}
+                for cid in locked for dep_id in applied[cid][1]
+            ]
+            if outbox:
+                await session.execute(insert(DeploymentOutbox), outbox)
+
+        scheduled = {job_id: cid for cid in locked for job_id in decisions[cid][0]}
+        if scheduled:
+            # only QUEUED ones: a redelivered queue message must not restart a finished job
+            result = await session.execute(
+                select(Deployment.id, Deployment.gang_id, Deployment.gang_size)
+                .where(_any(Deployment.id, scheduled), Deployment.status == DeploymentStatus.QUEUED)
+                .order_by(Deployment.id)
+                .with_for_update()
+            )
+            queued = result.all()
+            still_queued = {d.id for d in queued}
+            for job_id, cid in scheduled.items():
+                if job_id not in still_queued:
+                    applied[cid][2].append(job_id)
+            gang_members = Counter((scheduled[d.id], d.gang_id) for d in queued if d.gang_id is not None)
+            starting = [
+                d.id for d in queued
+                if d.gang_id is None or gang_members[(scheduled[d.id], d.gang_id)] >= d.gang_size
+            ]
+            if starting:
+                v = _unnest(
+                    "v",
+                    id=(starting, Integer),
+                    cluster_id=([scheduled[i] for i in starting], Integer),
+                    node_id=([decisions[scheduled[i]][2].get(i) for i in starting], Integer),
+                )
+                result = await session.execute(
+                    update(Deployment)
+                    .where(Deployment.id == v.c.id)
+                    .values(
+                        status=DeploymentStatus.RUNNING,
+                        started_at=now,
+                        cluster_id=v.c.cluster_id,  # any-cluster deployments are bound here
+                        node_id=v.c.node_id
+                    )
+                    .returning(
+                        Deployment.id, v.c.cluster_id, v.c.node_id,
+                        Deployment.required_cpu, Deployment.required_ram, Deployment.required_gpu
+                    )
+                )
+                for dep_id, cid, node_id, *demand in result.tuples():
+                    applied[cid][0].append(dep_id)
+                    _add_delta(cluster_deltas, cid, -1, *demand)
+                    _add_delta(node_deltas, node_id, -1, *demand)
 
+        await _apply_capacity(session, Cluster, cluster_deltas)
+        await _apply_capacity(session, Node, node_deltas)
+        await session.commit()
+    return applied
+
+
+async def fetch_queued_gang_members(gang_ids: List[str]) -> List[int]:
+    """IDs of the QUEUED deployments of the given gangs."""
+    async with AsyncSessionLocal() as session:
         result = await session.execute(
-            select(Deployment).where(Deployment.id.in_(job_ids))
+            select(Deployment.id)
+            .where(_any(Deployment.gang_id, gang_ids, String), Deployment.status == DeploymentStatus.QUEUED)
         )
-        deployments = result.scalars().all()
+        return list(result.scalars())
 
-        for dep in deployments:
-            if dep.status != DeploymentStatus.RUNNING:
-                cluster.available_cpu -= dep.required_cpu
-                cluster.available_ram -= dep.required_ram
-                cluster.available_gpu -= dep.required_gpu
-                dep.status = DeploymentStatus.RUNNING
 
+async def fail_queued_jobs(job_ids: List[int]) -> List[Tuple[int, Optional[int]]]:
+    """
+    Mark the deployments in job_ids that are still QUEUED as FAILED (e.g. the
+    members of a gang that was never fully submitted) and stamp finished_at.
+    They never started, so no capacity is given back. Returns (id, cluster_id)
+    of the deployments that changed state.
+    """
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(
+            update(Deployment)
+            .where(_any(Deployment.id, job_ids), Deployment.status == DeploymentStatus.QUEUED)
+            .values(status=DeploymentStatus.FAILED, finished_at=datetime.utcnow())
+            .returning(Deployment.id, Deployment.cluster_id)
+        )
+        failed = list(result.tuples())
         await session.commit()
+    return failed
 
 
-async def requeue_jobs(cluster_id: int, job_ids: List[int]) -> None:
+async def mark_jobs_finished(cluster_id: int, job_ids: List[int], status: DeploymentStatus) -> List[int]:
     """
-    For each deployment ID in job_ids that was previously RUNNING:
-    - set status=QUEUED
-    - add its resources back to the cluster's available_* fields
+    For each deployment ID in job_ids that is still RUNNING:
+    - set status to COMPLETED/FAILED and stamp finished_at
+    - add its resources back to the cluster's (and its node's) available_* fields
+    Returns the IDs that actually changed state.
     """
     async with AsyncSessionLocal() as session:
         cluster = await session.get(Cluster, cluster_id, with_for_update=True)
@@ -88,12 +358,19 @@ async def requeue_jobs(cluster_id: int, job_ids: List[int]) -> None:
             select(Deployment).where(Deployment.id.in_(job_ids))
         )
         deployments = result.scalars().all()
+        nodes = await _lock_nodes(session, [d.node_id for d in deployments])
 
+        changed = []
+        now = datetime.utcnow()
         for dep in deployments:
             if dep.status == DeploymentStatus.RUNNING:
                 cluster.available_cpu += dep.required_cpu
                 cluster.available_ram += dep.required_ram
                 cluster.available_gpu += dep.required_gpu
-                dep.status = DeploymentStatus.QUEUED
+                _release_node(nodes, dep)
+                dep.status = status
+                dep.finished_at = now
+                changed.append(dep.id)
 
-        await session.commit()
\ No newline at end of file
+        await session.commit()
+    return changed
\ No newline at end of file
@@ -1,10 +1,72 @@
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 from passlib.context import CryptContext
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+# Threads that run bcrypt (it releases the GIL, so they hash in parallel);
+# further hashing requests wait for a free thread without blocking the event loop
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", min(4, os.cpu_count() or 1)))
+
+_executor = ThreadPoolExecutor(max(1, PASSWORD_HASH_WORKERS), thread_name_prefix="password-hash")
+_slots = asyncio.Semaphore(max(1, PASSWORD_HASH_WORKERS))
+
+
+class HashingStats:
+    """How long hashing requests waited for a free thread."""
+
+    def __init__(self):
+        self.calls = 0
+        self.waiting = 0
+        self.queue_seconds_total = 0.0
+        self.queue_seconds_max = 0.0
+
+    def record(self, queued: float) -> None:
+        self.calls += 1
+        self.queue_seconds_total += queued
+        self.queue_seconds_max = max(self.queue_seconds_max, queued)
+
+    def stats(self) -> dict:
+        return {
+            "workers": max(1, PASSWORD_HASH_WORKERS),
+            "calls": self.calls,
+            "waiting": self.waiting,
+            "queue_seconds_avg": self.queue_seconds_total / self.calls if self.calls else 0.0,
+            "queue_seconds_max": self.queue_seconds_max,
+        }
+
+
+hashing_stats = HashingStats()
+
 
 def verify_password(plain_password, hashed_password):
     return pwd_context.verify(plain_password, hashed_password)
 
 def get_password_hash(password):
     return pwd_context.hash(password)
+
+
+async def _in_pool(fn, *args):
+    queued = time.perf_counter()
+    hashing_stats.waiting += 1
+    try:
+        await _slots.acquire()
+    finally:
+        hashing_stats.waiting -= 1
+    try:
+        hashing_stats.record(time.perf_counter() - queued)
+        return await asyncio.get_running_loop().run_in_executor(_executor, fn, *args)
+    finally:
+        _slots.release()
+
+
+async def verify_password_async(plain_password, hashed_password) -> bool:
+    """verify_password on the hashing thread pool, for async handlers."""
+    return await _in_pool(verify_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password) -> str:
+    """get_password_hash on the hashing thread pool, for async handlers."""
+    return await _in_pool(get_password_hash, password)
@@ -0,0 +1,248 @@
+# app/core/status_stream.py
+
+import asyncio
+import json
+import os
+from collections import defaultdict
+from contextlib import suppress
+from datetime import datetime
+from typing import Iterable, List, Optional
+
+from app.core.redis_client import init_redis
+
+# Redis stream the scheduler appends deployment status transitions to
+STATUS_STREAM_KEY = "deployment_status"
+# Entries kept in the stream (approximately); reconnecting clients can resume within them
+STATUS_STREAM_MAXLEN = int(os.getenv("STATUS_STREAM_MAXLEN", 100000))
+# Events replayed at most to a client reconnecting with Last-Event-ID
+STATUS_STREAM_REPLAY = int(os.getenv("STATUS_STREAM_REPLAY", 1000))
+# Events buffered per connected client; a client that falls further behind is disconnected
+STATUS_STREAM_BUFFER = int(os.getenv("STATUS_STREAM_BUFFER", 1000))
+# Seconds between keep-alive comments on an idle event stream
+STATUS_STREAM_HEARTBEAT = float(os.getenv("STATUS_STREAM_HEARTBEAT", 15))
+
+_READ_BLOCK_MS = 5000
+_READ_COUNT = 1000
+
+
+def transition(deployment_id: int, cluster_id: Optional[int], status, previous, at: datetime, reason: str = "") -> dict:
+    """A status transition as stored in the stream (flat string fields)."""
+    return {
+        "deployment_id": str(deployment_id),
+        "cluster_id": "" if cluster_id is None else str(cluster_id),
+        "status": getattr(status, "value", status),
+        "previous": getattr(previous, "value", previous),
+        "reason": reason,
+        "at": at.isoformat(),
+    }
+
+
+async def publish_transitions(r, transitions: Iterable[dict]) -> int:
+    """Append transitions to the status stream in one pipelined round trip; returns how many."""
+    count = 0
+    async with r.pipeline(transaction=False) as pipe:
+        for fields in transitions:
+            pipe.xadd(STATUS_STREAM_KEY, fields, maxlen=STATUS_STREAM_MAXLEN, approximate=True)
+            count += 1
+        if count:
+            await pipe.execute()
+    return count
+
+
+def stream_id(entry_id: str) -> tuple:
+    """Stream entry IDs ("<ms>-<seq>") as comparable tuples."""
+    ms, _, seq = entry_id.partition("-")
+    return int(ms), int(seq or 0)
+
+
+def decode(entry_id: str, fields: dict) -> dict:
+    return {
+        "id": entry_id,
+        "deployment_id": int(fields["deployment_id"]),
+        "cluster_id": int(fields["cluster_id"]) if fields.get("cluster_id") else None,
+        "status": fields["status"],
+        "previous": fields.get("previous") or None,
+        "reason": fields.get("reason") or None,
+        "at": fields["at"],
+    }
+
+
+def format_sse(event: dict) -> str:
+    """One Server-Sent Events message; the stream entry ID lets clients resume with Last-Event-ID."""
+    data = {k: v for k, v in event.items() if k != "id"}
+    return f"id: {event['id']}\nevent: status\ndata: {json.dumps(data)}\n\n"
+
+
+# Sent instead of the replay when a client missed more than STATUS_STREAM_REPLAY
+# events: it should reload the deployments' state; live events follow.
+RESET_SSE = f"event: reset\ndata: {json.dumps({'reason': 'replay limit exceeded'})}\n\n"
+
+
+class Subscription:
+    """Events for one deployment or one cluster, buffered for one client."""
+
+    def __init__(self, cluster_id: Optional[int] = None, deployment_id: Optional[int] = None):
+        self.cluster_id = cluster_id
+        self.deployment_id = deployment_id
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.overflowed = False
+
+    def matches(self, event: dict) -> bool:
+        if self.deployment_id is not None:
+            return event["deployment_id"] == self.deployment_id
+        return event["cluster_id"] == self.cluster_id
+
+    def put(self, event: dict) -> bool:
+        """Buffer an event; once the buffer is full, end the stream instead (None)."""
+        if self.overflowed:
+            return False
+        if self.queue.qsize() >= STATUS_STREAM_BUFFER:
+            self.overflowed = True
+            self.queue.put_nowait(None)
+            return False
+        self.queue.put_nowait(event)
+        return True
+
+
+class StatusHub:
+    """
+    Fans the status stream out to the clients connected to this API worker.
+    One task per worker reads the stream (only while someone is subscribed)
+    and hands each event to the subscriptions for its deployment and cluster,
+    so connected clients cost no Redis connections of their own.
+    """
+
+    def __init__(self):
+        self._by_deployment = defaultdict(set)
+        self._by_cluster = defaultdict(set)
+        self._reader: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return sum(map(len, self._by_deployment.values())) + sum(map(len, self._by_cluster.values()))
+
+    def subscribe(self, cluster_id: Optional[int] = None, deployment_id: Optional[int] = None) -> Subscription:
+        sub = Subscription(cluster_id, deployment_id)
+        if deployment_id is not None:
+            self._by_deployment[deployment_id].add(sub)
+        else:
+            self._by_cluster[cluster_id].add(sub)
+        if self._reader is None or self._reader.done():
+            self._reader = asyncio.create_task(self._read())
+        return sub
+
+    def unsubscribe(self, sub: Subscription) -> None:
+        index, key = (
+            (self._by_deployment, sub.deployment_id) if sub.deployment_id is not None
+            else (self._by_cluster, sub.cluster_id)
+        )
+        subs = index.get(key)
+        if subs is not None:
+            subs.discard(sub)
+            if not subs:
+                del index[key]
+        if not self and self._reader is not None:
+            self._reader.cancel()
+            self._reader = None
+
+    def dispatch(self, events: Iterable[dict]) -> None:
+        """Hand events to matching subscriptions; a full one gets None and is dropped."""
+        for event in events:
+            subs = self._by_deployment.get(event["deployment_id"], set()) | self._by_cluster.get(event["cluster_id"], set())
+            for sub in subs:
+                if not sub.put(event):
+                    self.unsubscribe(sub)
+
+    async def _read(self) -> None:
+        client = await init_redis()
+        last = "$"
+        while True:
+            try:
+                response = await client.xread({STATUS_STREAM_KEY: last}, count=_READ_COUNT, block=_READ_BLOCK_MS)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"⚠️  Reading {STATUS_STREAM_KEY} failed: {e!r}")
+                await asyncio.sleep(1)
+                continue
+            for _, entries in response or []:
+                if entries:
+                    last = entries[-1][0]
+                self.dispatch(decode(entry_id, fields) for entry_id, fields in entries)
+
+    async def replay(
+        self,
+        after: str,
+        cluster_id: Optional[int] = None,
+        deployment_id: Optional[int] = None
+    ) -> Optional[List[dict]]:
+        """
+        Events after stream ID ``after`` still in the stream, for a reconnecting
+        client. The stream holds every deployment's events, so it is read a page
+        at a time until the end; None if more than STATUS_STREAM_REPLAY match.
+        """
+        client = await init_redis()
+        sub = Subscription(cluster_id, deployment_id)
+        events, start = [], f"({after}"
+        while True:
+            entries = await client.xrange(STATUS_STREAM_KEY, min=start, count=_READ_COUNT)
+            for entry_id, fields in entries:
+                event = decode(entry_id, fields)
+                if not sub.matches(event):
+                    continue
+                if len(events) >= STATUS_STREAM_REPLAY:
+                    return None
+                events.append(event)
+            if len(entries) < _READ_COUNT:
+                return events
+            start = f"({entries[-1][0]}"
+
+    async def close(self) -> None:
+        if self._reader is not None:
+            self._reader.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._reader
+            self._reader = None
+
+
+status_hub = StatusHub()
+
+
+async def event_stream(
+    request,
+    cluster_id: Optional[int] = None,
+    deployment_id: Optional[int] = None,
+    last_event_id: Optional[str] = None,
+    hub: StatusHub = status_hub
+):
+    """
+    Server-Sent Events for a deployment or a cluster: events since ``last_event_id``
+    (if the client is resuming), then live ones until the client disconnects.
+    """
+    sub = hub.subscribe(cluster_id, deployment_id)
+    try:
+        last = None
+        if last_event_id:
+            try:
+                stream_id(last_event_id)
+            except ValueError:
+                last_event_id = None
+        if last_event_id:
+            missed = await hub.replay(last_event_id, cluster_id, deployment_id)
+            if missed is None:
+                yield RESET_SSE
+            for event in missed or []:
+                last = event["id"]
+                yield format_sse(event)
+        while not await request.is_disconnected():
+            try:
+                event = await asyncio.wait_for(sub.queue.get(), STATUS_STREAM_HEARTBEAT)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+            if event is None:
+                break  # fell behind; the client reconnects with Last-Event-ID
+            if last is not None and stream_id(event["id"]) <= stream_id(last):
+                continue  # already replayed
+            yield format_sse(event)
+    finally:
+        hub.unsubscribe(sub)
@@ -0,0 +1,274 @@
+# app/core/vectorized.py
+
+import itertools
+
+import numpy as np
+from datetime import datetime
+from typing import List, Dict, Tuple, Callable, Optional
+
+from app.core.preemption import MAX_CANDIDATES, cheapest_cover, job_preemption_cost
+from app.core.victim_index import POOL_PER_RESOURCE
+from app.core.algorithm import schedule_jobs
+
+# Column order of every (n, 3) demand/availability array in this module.
+RESOURCE_KEYS = ('cpu', 'ram', 'gpu')
+
+# Same weights as compute_score in app.core.algorithm: gpu*100 + cpu*10 + ram
+SCORE_WEIGHTS = np.array([10.0, 1.0, 100.0])
+
+PRIORITY_CODES = {'HIGH': 0, 'LOW': 1}
+HIGH, LOW = PRIORITY_CODES['HIGH'], PRIORITY_CODES['LOW']
+
+# First block size used when walking an ordered queue; doubled after every
+# block that fits completely and reset after a misfit.
+MIN_BLOCK = 64
+
+
+class JobArrays:
+    """Struct-of-arrays view over a list of job dicts.
+
+    Row ``i`` of every array describes ``jobs[i]``; the dicts themselves are
+    only touched again when building the result lists.
+    """
+
+    def __init__(self, jobs: List[Dict]):
+        n = len(jobs)
+        self.jobs = jobs
+        self.demand = np.fromiter(
+            (j[k] for j in jobs for k in RESOURCE_KEYS), dtype=np.float64, count=3 * n
+        ).reshape(n, 3)
+        self.priority = np.fromiter(
+            (PRIORITY_CODES.get(j['priority'].upper(), -1) for j in jobs), dtype=np.int8, count=n
+        )
+        self.score = self.demand @ SCORE_WEIGHTS
+
+    def __len__(self):
+        return len(self.jobs)
+
+    def ordered(self, mask: np.ndarray) -> np.ndarray:
+        """Indices selected by ``mask``, largest score first (ties keep queue order)."""
+        idx = np.flatnonzero(mask)
+        return idx[np.argsort(-self.score[idx], kind='stable')]
+
+    def export(self, indices) -> List[Dict]:
+        return [_normalized(self.jobs[i]) for i in indices]
+
+
+def _normalized(job: Dict) -> Dict:
+    out = dict(job)
+    out['priority'] = out['priority'].upper()
+    return out
+
+
+def greedy_pass(
+    demand: np.ndarray,
+    available: np.ndarray,
+    on_misfit: Optional[Callable[[int, np.ndarray], Optional[np.ndarray]]] = None,
+    reclaimable: Callable[[], np.ndarray] = lambda: 0.0
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Vectorized equivalent of ``for job in queue: if fits: allocate``.
+
+    ``demand`` rows must already be in scheduling order. Rows are consumed in
+    growing blocks: a cumulative sum tells how long a prefix of the block fits,
+    so the Python-level loop only runs once per misfit instead of once per job.
+
+    A row that does not fit is skipped, unless ``on_misfit`` is given: the
+    callback then gets the row index and the availability at that point and
+    returns the availability after placing the row (e.g. via preemption), or
+    ``None`` to skip it. ``reclaimable`` reports what ``on_misfit`` could still
+    free at most; rows larger than ``available + reclaimable()`` are skipped
+    without calling it.
+    """
+    n = len(demand)
+    accepted = np.zeros(n, dtype=bool)
+    pos, block = 0, MIN_BLOCK
+    while pos < n:
+        rows = demand[pos:pos + block]
+        # available + reclaimable only shrinks during a pass, so a row that
+        # exceeds it now can never be placed later and is skipped outright
+        cand = (rows <= available + reclaimable()).all(axis=1)
+        used = np.cumsum(np.where(cand[:, None], rows, 0.0), axis=0)
+        fail = cand & (used > available).any(axis=1)
+        if not fail.any():
+            accepted[pos:pos + len(rows)] = cand
+            available = available - used[-1]
+            pos += len(rows)
+            block *= 2
+            continue
+
+        r = int(np.argmax(fail))
+        accepted[pos:pos + r] = cand[:r]
+        if r:
+            available = available - used[r - 1]
+        i = pos + r
+        if on_misfit is not None:
+            after = on_misfit(i, available)
+            if after is not None:
+                accepted[i] = True
+                available = after
+        pos, block = i + 1, MIN_BLOCK
+    return accepted, available
+
+
+class VictimOrder:
+    """LOW-priority running jobs that HIGH jobs may preempt.
+
+    While victims are only taken largest-first the taken set is a prefix of
+    ``order`` and a prefix sum over it answers "how many victims until the job
+    fits" with one ``searchsorted`` per resource. Min-cost picks break that
+    property; largest-first then works on the untaken remainder.
+    """
+
+    def __init__(self, running: JobArrays, now: datetime):
+        self.running = running
+        self.now = now
+        self.order = running.ordered(running.priority == LOW)
+        self.freed = np.cumsum(running.demand[self.order], axis=0)
+        self.left = self.freed[-1].copy() if len(self.order) else np.zeros(3)
+        self.taken = np.zeros(len(running), dtype=bool)
+        self.head = 0
+        self.prefix = True
+        self._costs = None
+
+    def remaining(self) -> np.ndarray:
+        """Resources held by victims that have not been taken yet."""
+        return self.left
+
+    def _mark(self, victims: np.ndarray) -> None:
+        self.taken[victims] = True
+        self.left = self.left - self.running.demand[victims].sum(axis=0)
+
+    def take_largest(self, need: np.ndarray, available: np.ndarray) -> Optional[np.ndarray]:
+        """Pop the fewest top-scoring victims that make ``need`` fit.
+
+        Returns the victim indices, or ``None`` (leaving the order untouched)
+        if even every remaining victim is not enough.
+        """
+        if self.prefix:
+            order, freed, head = self.order, self.freed, self.head
+        else:
+            order = self.order[~self.taken[self.order]]
+            freed, head = np.cumsum(self.running.demand[order], axis=0), 0
+        if head >= len(order):
+            return None
+        base = freed[head - 1] if head else np.zeros(3)
+        threshold = need - available + base
+        stop = head
+        for dim in range(3):
+            t = int(np.searchsorted(freed[:, dim], threshold[dim], side='left'))
+            stop = max(stop, t)
+        if stop >= len(order):
+            return None
+        victims = order[head:stop + 1]
+        if self.prefix:
+            self.head = stop + 1
+        self._mark(victims)
+        return victims
+
+    def _init_costs(self) -> None:
+        self._costs = np.array(
+            [job_preemption_cost(self.running.jobs[i], self.now) for i in range(len(self.running))]
+        )
+        demand = self.running.demand
+        self._unit_order = []
+        for d in range(3):
+            holders = np.flatnonzero((self.running.priority == LOW) & (demand[:, d] > 0))
+            unit = self._costs[holders] / demand[holders, d]
+            self._unit_order.append(holders[np.lexsort((holders, unit))])
+        self._unit_start = [0, 0, 0]
+
+    def _cheapest_holders(self, d: int, count: int) -> np.ndarray:
+        """First ``count`` untaken jobs in resource ``d``'s unit-cost order."""
+        order = self._unit_order[d]
+        pos = self._unit_start[d]
+        while pos < len(order) and self.taken[order[pos]]:
+            pos += 1
+        self._unit_start[d] = pos
+        width = 2 * count
+        while True:
+            window = order[pos:pos + width]
+            free = window[~self.taken[window]]
+            if len(free) >= count or pos + width >= len(order):
+                return free[:count]
+            width *= 2
+
+    def take_cheapest(self, need: np.ndarray, available: np.ndarray) -> Optional[np.ndarray]:
+        """Evict the cheapest victim set (see app.core.preemption), largest-first as fallback."""
+        if self._costs is None:
+            self._init_costs()
+        short = need - available
+        demand = self.running.demand
+        # same bounded pool as PreemptionIndex.candidates: the cheapest holders
+        # per unit of each short resource
+        pools = [self._cheapest_holders(d, POOL_PER_RESOURCE) for d in range(3) if short[d] > 0]
+        pool = np.unique(np.concatenate(pools))
+        cov = np.zeros(len(pool))
+        for d in range(3):
+            if short[d] > 0:
+                cov = cov + np.minimum(demand[pool, d], short[d]) / short[d]
+        useful = cov > 0
+        pool, cov = pool[useful], cov[useful]
+        ratio = self._costs[pool] / cov
+        ranked = pool[np.lexsort((pool, ratio))[:MAX_CANDIDATES]]
+
+        picked = cheapest_cover(short.tolist(), demand[ranked].tolist(), self._costs[ranked].tolist())
+        if picked is None:
+            return self.take_largest(need, available)
+        victims = ranked[picked]
+        self.prefix = False
+        self._mark(victims)
+        return victims
+
+
+def schedule_jobs_vectorized(
+    job_queue: List[Dict],
+    running_jobs: List[Dict],
+    total_resources: Dict,
+    available: Optional[Dict] = None,
+    preemption: str = "min-cost",
+    now: Optional[datetime] = None
+) -> Tuple[List[Dict], List[Dict]]:
+    """Drop-in replacement for :func:`app.core.algorithm.schedule_jobs`.
+
+    Same ``(scheduled, preempted)`` contract and the same decisions (HIGH first
+    with preemption of LOW running jobs, then LOW without preemption),
+    computed over NumPy arrays instead of per-job dict lookups. Gangs are not
+    vectorized: if any queued or running job belongs to one, the call is
+    handed to the reference implementation.
+    """
+    if preemption not in ("min-cost", "largest-first"):
+        raise ValueError(f"Unknown preemption strategy '{preemption}'")
+    if any(j.get('gang_id') is not None for j in itertools.chain(job_queue, running_jobs)):
+        return schedule_jobs(job_queue, running_jobs, total_resources, available, preemption, now)
+    total = np.array([total_resources[k] for k in RESOURCE_KEYS], dtype=np.float64)
+    jobs = JobArrays(job_queue)
+
+    feasible = (jobs.demand <= total).all(axis=1)
+    high_order = jobs.ordered(feasible & (jobs.priority == HIGH))
+    low_order = jobs.ordered(feasible & (jobs.priority == LOW))
+
+    if available is None:
+        running = JobArrays(running_jobs)
+        available = total - running.demand.sum(axis=0)
+    else:
+        # only HIGH jobs preempt, so the running set is not needed without them
+        running = JobArrays(running_jobs if len(high_order) else [])
+        available = np.array([available[k] for k in RESOURCE_KEYS], dtype=np.float64)
+
+    victims = VictimOrder(running, now or datetime.utcnow())
+    take = victims.take_cheapest if preemption == "min-cost" else victims.take_largest
+    preempted: List[int] = []
+    high_demand = jobs.demand[high_order]
+
+    def preempt_for(i, avail):
+        idx = take(high_demand[i], avail)
+        if idx is None:
+            return None
+        preempted.extend(idx.tolist())
+        return avail + running.demand[idx].sum(axis=0) - high_demand[i]
+
+    high_ok, available = greedy_pass(high_demand, available, preempt_for, victims.remaining)
+    low_ok, available = greedy_pass(jobs.demand[low_order], available)
+
+    scheduled = jobs.export(high_order[high_ok]) + jobs.export(low_order[low_ok])
+    return scheduled, running.export(preempted)
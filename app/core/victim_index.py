@@ -0,0 +1,129 @@
+# app/core/victim_index.py
+
+import heapq
+from typing import Callable, Dict, Iterable, List, Optional
+
+from app.core.preemption import RESOURCES, MAX_CANDIDATES, job_value
+
+# How many of the cheapest victims per short resource are handed to the
+# min-cost planner (which keeps the best MAX_CANDIDATES of their union).
+POOL_PER_RESOURCE = 2 * MAX_CANDIDATES
+
+
+class VictimIndex:
+    """
+    Heap of running jobs ordered by ``key`` (smallest first) with lazy deletion.
+
+    Every entry carries the job's ordinal, so ties break by position in the
+    running list, and a version number: ``remove`` only forgets the live version
+    (a tombstone) and stale entries are skipped when they reach the top. pop,
+    restore and remove are all O(log n); the heap is compacted once tombstones
+    outnumber live entries.
+    """
+
+    def __init__(self, key: Callable[[Dict], float], jobs: Iterable[Dict] = ()):
+        self.key = key
+        self._live: Dict[int, int] = {}
+        self._jobs: Dict[int, Dict] = {}
+        self._version = 0
+        self._heap = [self._entry(job) for job in jobs]
+        heapq.heapify(self._heap)
+
+    def __len__(self) -> int:
+        return len(self._live)
+
+    def __contains__(self, job_id: int) -> bool:
+        return job_id in self._live
+
+    def _entry(self, job: Dict) -> tuple:
+        self._version += 1
+        self._live[job['id']] = self._version
+        self._jobs[job['id']] = job
+        return (self.key(job), job['_ordinal'], self._version, job['id'])
+
+    def push(self, job: Dict) -> None:
+        heapq.heappush(self._heap, self._entry(job))
+
+    # A popped job goes back exactly like a new one.
+    restore = push
+
+    def pop(self) -> Optional[Dict]:
+        while self._heap:
+            _, _, version, job_id = heapq.heappop(self._heap)
+            if self._live.get(job_id) == version:
+                del self._live[job_id]
+                return self._jobs.pop(job_id)
+        return None
+
+    def remove(self, job_id: int) -> None:
+        if self._live.pop(job_id, None) is None:
+            return
+        self._jobs.pop(job_id, None)
+        if len(self._heap) > 2 * len(self._live) + 64:
+            self._heap = [e for e in self._heap if self._live.get(e[3]) == e[2]]
+            heapq.heapify(self._heap)
+
+
+class PreemptionIndex:
+    """
+    Preemptible (LOW) running jobs of one cluster, indexed for both strategies.
+
+    ``by_score`` serves largest-first preemption; ``by_unit_cost[r]`` orders the
+    jobs that hold resource ``r`` by preemption cost per unit of ``r`` and feeds
+    the min-cost planner a bounded candidate pool. ``by_node`` groups the jobs
+    placed on nodes for node-local preemption. Jobs need ``_cost`` set.
+    """
+
+    def __init__(self, jobs: List[Dict]):
+        self.jobs: Dict[int, Dict] = {}
+        self.held = {r: 0 for r in RESOURCES}
+        self.by_node: Dict[int, Dict[int, Dict]] = {}
+        for ordinal, job in enumerate(jobs):
+            job['_ordinal'] = ordinal
+            self.jobs[job['id']] = job
+            if job.get('node_id') is not None:
+                self.by_node.setdefault(job['node_id'], {})[job['id']] = job
+            for r in RESOURCES:
+                self.held[r] += job[r]
+        self.by_score = VictimIndex(lambda j: -job_value(j), jobs)
+        self.by_unit_cost = {
+            r: VictimIndex(lambda j, r=r: j['_cost'] / j[r], [j for j in jobs if j[r] > 0])
+            for r in RESOURCES
+        }
+
+    def remove(self, job_id: int) -> None:
+        job = self.jobs.pop(job_id, None)
+        if job is None:
+            return
+        for r in RESOURCES:
+            self.held[r] -= job[r]
+        on_node = self.by_node.get(job.get('node_id'))
+        if on_node is not None:
+            on_node.pop(job_id, None)
+            if not on_node:
+                del self.by_node[job['node_id']]
+        self.by_score.remove(job_id)
+        for index in self.by_unit_cost.values():
+            index.remove(job_id)
+
+    def can_cover(self, job: Dict, available: Dict) -> bool:
+        """Whether evicting every remaining job would make room for ``job``."""
+        return all(job[r] <= available[r] + self.held[r] for r in RESOURCES)
+
+    def candidates(self, job: Dict, available: Dict, per_resource: int = POOL_PER_RESOURCE) -> List[Dict]:
+        """The cheapest victims for each resource ``job`` is short of, in running-list order."""
+        pool: Dict[int, Dict] = {}
+        for r in RESOURCES:
+            if job[r] <= available[r]:
+                continue
+            index = self.by_unit_cost[r]
+            popped = []
+            while len(popped) < per_resource:
+                victim = index.pop()
+                if victim is None:
+                    break
+                popped.append(victim)
+            for victim in popped:
+                index.restore(victim)
+                pool[victim['id']] = victim
+        return sorted(pool.values(), key=lambda v: v['_ordinal'])
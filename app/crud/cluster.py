@@ -2,7 +2,11 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from fastapi import HTTPException
 from app.models.Cluster import Cluster
-from app.models.Deployment import Deployment
+from app.models.Node import Node
+from app.models.Deployment import Deployment, DeploymentStatus
+from sqlalchemy import func
+from app.core.archive import with_history
+from app.core.capacity import get_snapshot, snapshot_status
 
 async def create_cluster(db: AsyncSession, user_id: int, org_id: int, data):
     cluster = Cluster(
@@ -45,12 +49,76 @@ async def delete_cluster(db: AsyncSession, current_user, cluster_id: int):
     await db.commit()
 
 async def get_cluster_status(db: AsyncSession, current_user, cluster_id: int):
+    # available_* always comes from the cluster row; free capacity and the counts
+    # from the scheduler's snapshot if it is recent enough, otherwise free capacity
+    # is summed from the running deployments and the counts are unknown
     cluster = await get_cluster(db, current_user, cluster_id)
-    return {"id": cluster.id, "name": cluster.name, "available_cpu": cluster.available_cpu, "available_ram": cluster.available_ram, "available_gpu": cluster.available_gpu}
+    status = {
+        "id": cluster.id,
+        "name": cluster.name,
+        "available_cpu": cluster.available_cpu,
+        "available_ram": cluster.available_ram,
+        "available_gpu": cluster.available_gpu,
+    }
+    snapshot = await get_snapshot(cluster_id)
+    if snapshot is not None and snapshot["fresh"]:
+        status.update(snapshot_status(snapshot))
+        return status
+    result = await db.execute(
+        select(
+            func.coalesce(func.sum(Deployment.required_cpu), 0),
+            func.coalesce(func.sum(Deployment.required_ram), 0),
+            func.coalesce(func.sum(Deployment.required_gpu), 0),
+        ).where(Deployment.cluster_id == cluster_id, Deployment.status == DeploymentStatus.RUNNING)
+    )
+    used_cpu, used_ram, used_gpu = result.one()
+    status.update(
+        free_cpu=cluster.total_cpu - used_cpu,
+        free_ram=cluster.total_ram - used_ram,
+        free_gpu=cluster.total_gpu - used_gpu,
+        running=None,
+        queued=None,
+        snapshot=None,
+    )
+    return status
 
 async def list_cluster_deployments(db: AsyncSession, current_user, cluster_id: int):
     cluster = await get_cluster(db, current_user, cluster_id) 
+    dep = with_history()
     result = await db.execute(
-        select(Deployment).where(Deployment.cluster_id == cluster_id)
+        select(dep).where(dep.cluster_id == cluster_id)
+    )
+    return result.scalars().all()
+
+async def add_node(db: AsyncSession, cluster: Cluster, data):
+    result = await db.execute(
+        select(
+            func.coalesce(func.sum(Node.total_cpu), 0),
+            func.coalesce(func.sum(Node.total_ram), 0),
+            func.coalesce(func.sum(Node.total_gpu), 0),
+        ).where(Node.cluster_id == cluster.id)
+    )
+    used_cpu, used_ram, used_gpu = result.one()
+    if (used_cpu + data.total_cpu > cluster.total_cpu or
+        used_ram + data.total_ram > cluster.total_ram or
+        used_gpu + data.total_gpu > cluster.total_gpu):
+        raise HTTPException(status_code=400, detail="Node capacity would exceed the cluster's total capacity")
+    node = Node(
+        cluster_id=cluster.id,
+        name=data.name,
+        total_cpu=data.total_cpu,
+        total_ram=data.total_ram,
+        total_gpu=data.total_gpu,
+        available_cpu=data.total_cpu,
+        available_ram=data.total_ram,
+        available_gpu=data.total_gpu,
     )
-    return result.scalars().all() 
\ No newline at end of file
+    db.add(node)
+    await db.commit()
+    await db.refresh(node)
+    return node
+
+async def list_nodes(db: AsyncSession, current_user, cluster_id: int):
+    await get_cluster(db, current_user, cluster_id)
+    result = await db.execute(select(Node).where(Node.cluster_id == cluster_id))
+    return result.scalars().all()
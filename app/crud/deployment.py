@@ -1,5 +1,7 @@
 # app/crud/deployment.py
 
+import os
+from collections import defaultdict
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from fastapi import HTTPException, status
@@ -8,9 +10,44 @@ from app.models.Deployment import Deployment
 from app.schemas.deployment import DeploymentCreate
 from datetime import datetime
 from app.models.UserOrganizations import UserOrganization
-from sqlalchemy import and_
-from app.core.redis_client import push_deployment_to_queue
+from sqlalchemy import and_, insert
+from app.core.redis_client import push_deployment_event, remove_deployment_from_queue
+from app.core.outbox import notify_outbox
+from app.core.archive import with_history
+from app.core.access import MANAGER_ROLES, load_deployment_access
+from app.core.auth_cache import memberships
+from app.core.capacity import get_snapshot
+from app.models.DeploymentOutbox import DeploymentOutbox
 from app.models.Deployment import DeploymentStatus
+from app.models.Role import RoleEnum
+
+# Largest number of deployments accepted by one batch submission
+DEPLOYMENT_BATCH_MAX = int(os.getenv("DEPLOYMENT_BATCH_MAX", 5000))
+
+async def precheck_capacity(user_id: int, cluster_id: int, data: DeploymentCreate) -> None:
+    """
+    Reject a deployment that cannot fit from the scheduler's capacity snapshot,
+    without a database round trip. Only decides for the cluster's owner with a
+    cached Developer/Admin membership (anyone else gets the database's answer,
+    404 or 403) and only from a fresh snapshot; everything it lets through is
+    still checked against the cluster row. Free capacity in the snapshot is
+    total minus running, never below what the row reports, so the pre-check
+    only rejects what the database would, up to capacity freed within the
+    snapshot's age.
+    """
+    snapshot = await get_snapshot(cluster_id)
+    if snapshot is None or not snapshot["fresh"] or snapshot["owner_id"] != user_id:
+        return
+    if memberships.get((user_id, snapshot["organization_id"])) not in MANAGER_ROLES:
+        return
+    detail = capacity_error(
+        data,
+        (snapshot["free_cpu"], snapshot["free_ram"], snapshot["free_gpu"]),
+        (snapshot["total_cpu"], snapshot["total_ram"], snapshot["total_gpu"]),
+        note=f" (capacity snapshot version {snapshot['version']}, {snapshot['age_seconds']:.1f}s old, max age {snapshot['max_age_seconds']:g}s)"
+    )
+    if detail:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=detail)
 
 async def create_deployment(
     db: AsyncSession,
@@ -24,13 +61,11 @@ async def create_deployment(
     if not cluster or cluster.organization_id != org_id:
         raise HTTPException(status_code=404, detail="Cluster not found or not in this organization")
 
-    if (cluster.available_cpu < data.required_cpu or
-        cluster.available_ram < data.required_ram or
-        cluster.available_gpu < data.required_gpu):
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Insufficient cluster resources. Required: CPU={data.required_cpu}, RAM={data.required_ram}, GPU={data.required_gpu}. Available: CPU={cluster.available_cpu}/{cluster.total_cpu}, RAM={cluster.available_ram}/{cluster.total_ram}, GPU={cluster.available_gpu}/{cluster.total_gpu}."
-        )
+    detail = cluster_capacity_error(data, cluster)
+    if detail:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=detail)
+
+    await validate_gang(db, data, cluster_id, org_id)
 
     cluster.available_cpu -= data.required_cpu
     cluster.available_ram -= data.required_ram
@@ -39,6 +74,9 @@ async def create_deployment(
     dep = Deployment(
         owner_id=user_id,
         cluster_id=cluster_id,
+        organization_id=org_id,
+        gang_id=data.gang_id,
+        gang_size=data.gang_size,
         image=data.image,
         required_cpu=data.required_cpu,
         required_ram=data.required_ram,
@@ -47,18 +85,316 @@ async def create_deployment(
         status="QUEUED",  
         created_at=datetime.utcnow()
     )
-    db.add(dep)
+    await add_queued_deployment(db, dep)
+    await db.commit()
+    await db.refresh(dep)
+    notify_outbox()
+    return dep
+
+async def create_any_cluster_deployment(
+    db: AsyncSession,
+    user_id: int,
+    org_id: int,
+    data: DeploymentCreate
+) -> Deployment:
+    """
+    Queue a deployment that the scheduler may place on any cluster of the organization.
+
+    Unlike create_deployment, no cluster's available_* is reserved here: the
+    cluster is only chosen when the scheduler starts the deployment (and again
+    after every preemption), so a reservation made now would sit on a cluster
+    the job may never run on, and deleting the job could not know where to give
+    it back. Capacity is taken when the scheduler binds and starts the job
+    against its ledger, which only places it where it fits; until then it
+    counts in the queued figures, not in any cluster's free capacity.
+    """
+    result = await db.execute(
+        select(Cluster).where(Cluster.organization_id == org_id)
+    )
+    clusters = result.scalars().all()
+    if not clusters:
+        raise HTTPException(status_code=404, detail="Organization has no clusters")
+
+    if not any(
+        c.total_cpu >= data.required_cpu and
+        c.total_ram >= data.required_ram and
+        c.total_gpu >= data.required_gpu
+        for c in clusters
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"No cluster in this organization is large enough. Required: CPU={data.required_cpu}, RAM={data.required_ram}, GPU={data.required_gpu}."
+        )
+
+    await validate_gang(db, data, None, org_id)
+
+    dep = Deployment(
+        owner_id=user_id,
+        cluster_id=None,
+        organization_id=org_id,
+        any_cluster=True,
+        gang_id=data.gang_id,
+        gang_size=data.gang_size,
+        image=data.image,
+        required_cpu=data.required_cpu,
+        required_ram=data.required_ram,
+        required_gpu=data.required_gpu,
+        priority=data.priority,
+        status="QUEUED",
+        created_at=datetime.utcnow()
+    )
+    await add_queued_deployment(db, dep)
     await db.commit()
     await db.refresh(dep)
-    push_deployment_to_queue({
+    notify_outbox()
+    return dep
+
+async def validate_gang(
+    db: AsyncSession,
+    data: DeploymentCreate,
+    cluster_id: int | None,
+    org_id: int
+):
+    """A gang member must agree with the members already submitted and not overfill the gang."""
+    if data.gang_id is None:
+        if data.gang_size is not None:
+            raise HTTPException(status_code=400, detail="gang_size requires gang_id")
+        return
+    if data.gang_size is None or data.gang_size < 1:
+        raise HTTPException(status_code=400, detail="gang_size must be a positive integer")
+
+    result = await db.execute(
+        select(Deployment).where(Deployment.gang_id == data.gang_id)
+    )
+    detail = gang_error(data, cluster_id, org_id, result.scalars().all())
+    if detail:
+        raise HTTPException(status_code=400, detail=detail)
+
+def capacity_error(data: DeploymentCreate, available: tuple, total: tuple, note: str = "") -> str | None:
+    """Why ``data`` does not fit in ``available`` (cpu, ram, gpu) out of ``total``, or None."""
+    cpu, ram, gpu = available
+    if cpu >= data.required_cpu and ram >= data.required_ram and gpu >= data.required_gpu:
+        return None
+    return (
+        f"Insufficient cluster resources. Required: CPU={data.required_cpu}, RAM={data.required_ram}, GPU={data.required_gpu}. "
+        f"Available: CPU={cpu}/{total[0]}, RAM={ram}/{total[1]}, GPU={gpu}/{total[2]}{note}."
+    )
+
+def cluster_capacity_error(data: DeploymentCreate, cluster: Cluster) -> str | None:
+    """capacity_error against a cluster row's available_* (reserved at submission)."""
+    return capacity_error(
+        data,
+        (cluster.available_cpu, cluster.available_ram, cluster.available_gpu),
+        (cluster.total_cpu, cluster.total_ram, cluster.total_gpu)
+    )
+
+def gang_error(data: DeploymentCreate, cluster_id: int | None, org_id: int, existing) -> str | None:
+    """Why a gang member conflicts with the gang's ``existing`` members, or None."""
+    if any(
+        d.organization_id != org_id or
+        d.any_cluster != (cluster_id is None) or
+        (cluster_id is not None and d.cluster_id != cluster_id) or
+        d.gang_size != data.gang_size
+        for d in existing
+    ):
+        return "gang_id is already used with a different cluster or gang_size"
+    # the scheduler claims and schedules a gang as one unit, at one priority
+    if any(getattr(d.priority, "value", d.priority) != data.priority.value for d in existing):
+        return f"Gang '{data.gang_id}' members must all have the same priority"
+    if len(existing) >= data.gang_size:
+        return f"Gang '{data.gang_id}' already has {data.gang_size} deployments"
+    return None
+
+def queue_message(dep: Deployment) -> dict:
+    return {
     "deployment_id": dep.id,
     "priority": dep.priority.value,
     "required_cpu": dep.required_cpu,
     "required_ram": dep.required_ram,
     "required_gpu": dep.required_gpu,
-    "cluster_id": dep.cluster_id
-    })
-    return dep
+    "cluster_id": dep.cluster_id,
+    "organization_id": dep.organization_id,
+    "owner_id": dep.owner_id,
+    "image": dep.image,
+    "gang_id": dep.gang_id,
+    "gang_size": dep.gang_size,
+    "any_cluster": bool(dep.any_cluster)
+    }
+
+async def add_queued_deployment(db: AsyncSession, dep: Deployment):
+    """Add a new deployment and, in the same transaction, its queue message to the outbox.
+    The caller commits and then calls notify_outbox() so the relay pushes it to Redis."""
+    db.add(dep)
+    await db.flush()
+    db.add(DeploymentOutbox(deployment_id=dep.id, payload=queue_message(dep)))
+
+async def create_deployments_batch(
+    db: AsyncSession,
+    user_id: int,
+    items: list[DeploymentCreate]
+) -> list[dict]:
+    """
+    Create many deployments in one transaction and return one result per item:
+    ``{"index", "status_code", "id"}`` when created, ``{"index", "status_code", "detail"}``
+    when rejected with the error the single endpoint would have raised.
+
+    Clusters and memberships are loaded once for the whole batch (clusters locked in
+    id order, so concurrent batches cannot deadlock), resources are reserved item by
+    item in submission order, and the accepted rows and their outbox messages are
+    written with one multi-row INSERT each.
+    """
+    if len(items) > DEPLOYMENT_BATCH_MAX:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"At most {DEPLOYMENT_BATCH_MAX} deployments per batch"
+        )
+    results: list[dict | None] = [None] * len(items)
+
+    def reject(i: int, code: int, detail: str):
+        results[i] = {"index": i, "status_code": code, "detail": detail}
+
+    cluster_ids = sorted({d.cluster_id for d in items if d.cluster_id is not None})
+    clusters = {}
+    if cluster_ids:
+        result = await db.execute(
+            select(Cluster)
+            .where(Cluster.id.in_(cluster_ids))
+            .order_by(Cluster.id)
+            .with_for_update()
+        )
+        clusters = {c.id: c for c in result.scalars().all()}
+
+    org_ids: list[int | None] = [None] * len(items)
+    for i, data in enumerate(items):
+        if data.cluster_id is not None:
+            cluster = clusters.get(data.cluster_id)
+            if not cluster or cluster.owner_id != user_id:
+                reject(i, 404, "Cluster not found or not accessible")
+            else:
+                org_ids[i] = cluster.organization_id
+        elif data.organization_id is not None:
+            org_ids[i] = data.organization_id
+        else:
+            reject(i, 400, "Either cluster_id or organization_id is required")
+
+    roles = {}
+    orgs = {org_id for org_id in org_ids if org_id is not None}
+    if orgs:
+        result = await db.execute(
+            select(UserOrganization.organization_id, UserOrganization.role).where(
+                and_(
+                    UserOrganization.user_id == user_id,
+                    UserOrganization.organization_id.in_(orgs)
+                )
+            )
+        )
+        roles = dict(result.all())
+
+    # Cluster sizes of the organizations that receive any-cluster deployments
+    org_clusters = defaultdict(list)
+    any_orgs = {org_ids[i] for i, d in enumerate(items) if d.cluster_id is None and org_ids[i] is not None}
+    if any_orgs:
+        result = await db.execute(
+            select(Cluster.organization_id, Cluster.total_cpu, Cluster.total_ram, Cluster.total_gpu)
+            .where(Cluster.organization_id.in_(any_orgs))
+        )
+        for row in result.all():
+            org_clusters[row.organization_id].append(row)
+
+    # Members already submitted for the gangs in this batch; accepted items join them
+    gangs = defaultdict(list)
+    gang_ids = {d.gang_id for d in items if d.gang_id is not None}
+    if gang_ids:
+        result = await db.execute(
+            select(
+                Deployment.gang_id, Deployment.organization_id, Deployment.any_cluster,
+                Deployment.cluster_id, Deployment.gang_size, Deployment.priority
+            ).where(Deployment.gang_id.in_(gang_ids))
+        )
+        for row in result.all():
+            gangs[row.gang_id].append(row)
+
+    accepted = []
+    now = datetime.utcnow()
+    for i, data in enumerate(items):
+        if results[i] is not None:
+            continue
+        org_id, cluster_id = org_ids[i], data.cluster_id
+        if roles.get(org_id) not in [RoleEnum.Developer, RoleEnum.Admin]:
+            reject(i, 403, "Only Developers or Admins can create deployments in this organization")
+            continue
+
+        if cluster_id is None:
+            if not org_clusters[org_id]:
+                reject(i, 404, "Organization has no clusters")
+                continue
+            if not any(
+                c.total_cpu >= data.required_cpu and
+                c.total_ram >= data.required_ram and
+                c.total_gpu >= data.required_gpu
+                for c in org_clusters[org_id]
+            ):
+                reject(i, 400, f"No cluster in this organization is large enough. Required: CPU={data.required_cpu}, RAM={data.required_ram}, GPU={data.required_gpu}.")
+                continue
+        else:
+            cluster = clusters[cluster_id]
+            detail = cluster_capacity_error(data, cluster)
+            if detail:
+                reject(i, 400, detail)
+                continue
+
+        if data.gang_id is None and data.gang_size is not None:
+            reject(i, 400, "gang_size requires gang_id")
+            continue
+        if data.gang_id is not None:
+            if data.gang_size is None or data.gang_size < 1:
+                reject(i, 400, "gang_size must be a positive integer")
+                continue
+            detail = gang_error(data, cluster_id, org_id, gangs[data.gang_id])
+            if detail:
+                reject(i, 400, detail)
+                continue
+
+        if cluster_id is not None:
+            cluster.available_cpu -= data.required_cpu
+            cluster.available_ram -= data.required_ram
+            cluster.available_gpu -= data.required_gpu
+
+        values = dict(
+            owner_id=user_id,
+            cluster_id=cluster_id,
+            organization_id=org_id,
+            any_cluster=cluster_id is None,
+            gang_id=data.gang_id,
+            gang_size=data.gang_size,
+            image=data.image,
+            required_cpu=data.required_cpu,
+            required_ram=data.required_ram,
+            required_gpu=data.required_gpu,
+            priority=data.priority,
+            status="QUEUED",
+            created_at=now
+        )
+        dep = Deployment(**values)  # transient, only used to build the queue message
+        if data.gang_id is not None:
+            gangs[data.gang_id].append(dep)
+        accepted.append((i, values, dep))
+
+    if accepted:
+        result = await db.execute(
+            insert(Deployment).returning(Deployment.id, sort_by_parameter_order=True),
+            [values for _, values, _ in accepted]
+        )
+        outbox = []
+        for (i, _, dep), dep_id in zip(accepted, result.scalars().all()):
+            dep.id = dep_id
+            outbox.append({"deployment_id": dep_id, "payload": queue_message(dep)})
+            results[i] = {"index": i, "status_code": 201, "id": dep_id}
+        await db.execute(insert(DeploymentOutbox), outbox)
+    await db.commit()
+    if accepted:
+        notify_outbox()
+    return results
 
 async def list_deployments(
     db: AsyncSession,
@@ -69,9 +405,10 @@ async def list_deployments(
     cluster = await db.get(Cluster, cluster_id)
     if not cluster or cluster.organization_id != org_id:
         raise HTTPException(status_code=404, detail="Cluster not found or not in this organization")
+    dep = with_history()
     result = await db.execute(
-        select(Deployment)
-        .where(Deployment.cluster_id == cluster_id)
+        select(dep)
+        .where(dep.cluster_id == cluster_id)
     )
     return result.scalars().all()
 
@@ -80,48 +417,45 @@ async def get_deployment(
     user_id: int,
     deployment_id: int
 ) -> Deployment:
-    result = await db.execute(
-        select(Deployment)
-        .where(Deployment.id == deployment_id)
-    )
-    dep = result.scalars().first()
-    if not dep:
-        raise HTTPException(status_code=404, detail="Deployment not found")
-
-    cluster = await db.get(Cluster, dep.cluster_id)
-    if not cluster:
-        raise HTTPException(status_code=404, detail="Associated cluster not found")
-
-    if dep.owner_id == user_id:
-        return dep
-
-    result = await db.execute(
-        select(UserOrganization).where(
-            and_(
-                UserOrganization.user_id == user_id,
-                UserOrganization.organization_id == cluster.organization_id
-            )
-        )
-    )
-    membership = result.scalars().first()
-    if not membership:
+    access = await load_deployment_access(db, user_id, deployment_id, include_history=True)
+    if not access.can_read:
         raise HTTPException(status_code=403, detail="Not authorized to access this deployment")
-
-    return dep
+    return access.deployment
 
 async def delete_deployment(
     db: AsyncSession,
     deployment_id: int
 ):
-    result = await db.execute(
-        select(Deployment).where(Deployment.id == deployment_id)
-    )
-    dep = result.scalars().first()
+    dep = await db.get(Deployment, deployment_id)  # usually already loaded by the access check
     if not dep:
         raise HTTPException(status_code=404, detail="Deployment not found")
 
+    was_running = dep.status == DeploymentStatus.RUNNING
     await db.delete(dep)
     await db.commit()
+    if was_running:
+        await push_deployment_event({
+        "event": "deleted",
+        "deployment_id": deployment_id,
+        "cluster_id": dep.cluster_id
+        })
+    else:
+        await remove_deployment_from_queue(deployment_id)
+
+async def finish_deployment(dep: Deployment, finished: DeploymentStatus) -> None:
+    """
+    Report that a running deployment completed or failed. The scheduler marks it
+    finished and frees its capacity when it drains the event.
+    """
+    if finished not in (DeploymentStatus.COMPLETED, DeploymentStatus.FAILED):
+        raise HTTPException(status_code=400, detail="A deployment can only finish as COMPLETED or FAILED")
+    if dep.status != DeploymentStatus.RUNNING:
+        raise HTTPException(status_code=409, detail="Only running deployments can finish")
+    await push_deployment_event({
+        "event": finished.value.lower(),
+        "deployment_id": dep.id,
+        "cluster_id": dep.cluster_id
+    })
 
 async def get_deployment_by_id_for_scheduling(
     db: AsyncSession,
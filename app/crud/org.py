@@ -6,6 +6,8 @@ from sqlalchemy import or_, and_
 import secrets
 from sqlalchemy.future import select
 from fastapi import HTTPException
+from typing import Optional
+from app.core.auth_cache import memberships
 
 async def create_organization(db: AsyncSession, name: str, current_user):
     result = await db.execute(select(Organization).where(Organization.name == name))
@@ -25,6 +27,7 @@ async def create_organization(db: AsyncSession, name: str, current_user):
     db.add(membership)
     await db.commit()
     await db.refresh(membership)
+    memberships.invalidate((current_user.id, org.id))
     return org
 
 async def join_organization(db: AsyncSession, user_id: int, invite_code: str):
@@ -63,6 +66,7 @@ async def join_organization(db: AsyncSession, user_id: int, invite_code: str):
     db.add(membership)
     await db.commit()
     await db.refresh(membership)
+    memberships.invalidate((user_id, org.id))
     return membership
 
 async def get_organization_by_name(db: AsyncSession, name: str):
@@ -80,15 +84,31 @@ async def get_user_org_membership(db: AsyncSession, user_id: int, org_id: int):
     )
     return result.scalars().first()
 
+async def get_membership_role(db: AsyncSession, user_id: int, org_id: int) -> Optional[RoleEnum]:
+    """The user's role in the organization, or None if not a member (cached, see app/core/auth_cache.py)."""
+    role = memberships.get((user_id, org_id))
+    if role is None:
+        result = await db.execute(
+            select(UserOrganization.role).where(
+                and_(
+                    UserOrganization.user_id == user_id,
+                    UserOrganization.organization_id == org_id
+                )
+            )
+        )
+        role = result.scalar_one_or_none()
+        if role is not None:
+            memberships.set((user_id, org_id), role)
+    return role
+
 async def get_all_organizations(db: AsyncSession):
     result = await db.execute(select(Organization))
     return result.scalars().all()
 
 async def get_user_organizations(db: AsyncSession, user_id: int):
-    result = await db.execute(select(UserOrganization).where(UserOrganization.user_id == user_id))
-    memberships = result.scalars().all()
-    org_ids = [m.organization_id for m in memberships]
-    if not org_ids:
-        return []
-    result = await db.execute(select(Organization).where(Organization.id.in_(org_ids)))
+    result = await db.execute(
+        select(Organization)
+        .join(UserOrganization, UserOrganization.organization_id == Organization.id)
+        .where(UserOrganization.user_id == user_id)
+    )
     return result.scalars().all()
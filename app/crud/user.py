@@ -1,10 +1,10 @@
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from app.models.user import User
-from app.core.security import get_password_hash
+from app.core.security import get_password_hash_async
 
 async def create_user(db: AsyncSession, username: str, password: str):
-    hashed_password = get_password_hash(password)
+    hashed_password = await get_password_hash_async(password)
     user = User(username=username, hashed_password=hashed_password)
     db.add(user)
     await db.commit()
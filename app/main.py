@@ -1,3 +1,6 @@
+import asyncio
+from contextlib import asynccontextmanager, suppress
+
 from fastapi import FastAPI
 from app.api.routes import user
 from app.core.database import engine
@@ -5,8 +8,28 @@ from sqlalchemy import text
 from app.api.routes import org
 from app.api.routes import cluster
 from app.api.routes import deployment
+from app.core.redis_client import init_redis, close_redis
+from app.core.outbox import run_outbox_relay
+from app.core.archive import run_archiver
+from app.core.auth_cache import cache_stats
+from app.core.security import hashing_stats
+from app.core.status_stream import status_hub
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await init_redis()
+    tasks = [asyncio.create_task(run_outbox_relay()), asyncio.create_task(run_archiver())]
+    yield
+    for task in tasks:
+        task.cancel()
+        with suppress(asyncio.CancelledError):
+            await task
+    await status_hub.close()
+    await close_redis()
 
-app = FastAPI()
+
+app = FastAPI(lifespan=lifespan)
 app.include_router(user.router, prefix="/api/users", tags=["Users"])
 app.include_router(org.router, prefix="/api/orgs", tags=["Orgs"])
 app.include_router(cluster.router, prefix="/api/clusters", tags=["Clusters"])
@@ -24,3 +47,11 @@ def check_db():
         return {"db": "connected"}
     except Exception as e:
         return {"db": "error", "details": str(e)}
+
+@app.get("/health/auth-cache")
+def check_auth_cache():
+    return cache_stats()
+
+@app.get("/health/password-hashing")
+def check_password_hashing():
+    return hashing_stats.stats()
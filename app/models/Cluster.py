@@ -24,6 +24,7 @@ class Cluster(Base):
     owner       = relationship("User", back_populates="clusters")
     organization = relationship("Organization", back_populates="clusters")
     deployments = relationship("Deployment", back_populates="cluster", cascade="all, delete-orphan")
+    nodes       = relationship("Node", back_populates="cluster", cascade="all, delete-orphan")
 
     __table_args__ = (
         CheckConstraint("available_cpu >= 0 AND available_cpu <= total_cpu", name="ck_cluster_cpu"),
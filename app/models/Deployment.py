@@ -1,7 +1,7 @@
 from datetime import datetime
 import enum
 from sqlalchemy import (
-    Column, Integer, String, Float, DateTime, 
+    Column, Integer, String, Float, DateTime, Boolean,
     ForeignKey, CheckConstraint, Enum as SAEnum, Index
 )
 from sqlalchemy.orm import relationship
@@ -21,7 +21,12 @@ class Deployment(Base):
     __tablename__ = "deployments"
     id            = Column(Integer, primary_key=True)
     owner_id      = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
-    cluster_id    = Column(Integer, ForeignKey("clusters.id", ondelete="CASCADE"), nullable=False)
+    cluster_id    = Column(Integer, ForeignKey("clusters.id", ondelete="CASCADE"), nullable=True)  # NULL until an any-cluster deployment is placed
+    organization_id = Column(Integer, ForeignKey("organizations.id", ondelete="CASCADE"), nullable=True)
+    any_cluster   = Column(Boolean, default=False, nullable=False)  # scheduler may place it on any cluster of the organization
+    gang_id       = Column(String(64), nullable=True)  # deployments sharing a gang_id only ever run together
+    gang_size     = Column(Integer, nullable=True)  # number of deployments in the gang
+    node_id       = Column(Integer, ForeignKey("nodes.id", ondelete="SET NULL"), nullable=True)  # set while RUNNING on a node-based cluster
     image         = Column(String(255), nullable=False)  # Docker image (path or reference)
     required_cpu  = Column(Float, nullable=False)
     required_ram  = Column(Integer, nullable=False)
@@ -36,12 +41,20 @@ class Deployment(Base):
     retry_count   = Column(Integer, default=0, nullable=False)  # for tracking retries
     owner   = relationship("User", back_populates="deployments")
     cluster = relationship("Cluster", back_populates="deployments")
+    node    = relationship("Node", back_populates="deployments")
 
     __table_args__ = (
         CheckConstraint("required_cpu >= 0", name="ck_req_cpu_nonneg"),
         CheckConstraint("required_ram >= 0", name="ck_req_ram_nonneg"),
         CheckConstraint("required_gpu >= 0", name="ck_req_gpu_nonneg"),
+        CheckConstraint("gang_size IS NULL OR gang_size >= 1", name="ck_gang_size_pos"),
         Index("ix_deploy_owner_id", "owner_id"),
-        Index("ix_deploy_cluster_id", "cluster_id"),
-        Index("ix_deploy_status", "status")
+        # listings by cluster, optionally by status (also serves plain cluster_id lookups)
+        Index("ix_deploy_cluster_status", "cluster_id", "status"),
+        Index("ix_deploy_organization_id", "organization_id"),
+        Index("ix_deploy_gang_id", "gang_id"),
+        Index("ix_deploy_status", "status"),
+        # the scheduler's running and queued sets stay small as finished rows pile up
+        Index("ix_deploy_running", "cluster_id", postgresql_where=status == DeploymentStatus.RUNNING),
+        Index("ix_deploy_queued", "cluster_id", postgresql_where=status == DeploymentStatus.QUEUED)
     )
@@ -0,0 +1,38 @@
+from datetime import datetime
+from sqlalchemy import (
+    Column, Integer, String, Float, DateTime, Boolean,
+    ForeignKey, Enum as SAEnum, Index
+)
+from .base import Base
+from .Deployment import PriorityLevel, DeploymentStatus
+
+class DeploymentArchive(Base):
+    """COMPLETED/FAILED deployments moved out of ``deployments`` once they are old (see app/core/archive.py)."""
+    __tablename__ = "deployment_history"
+    id            = Column(Integer, primary_key=True, autoincrement=False)  # the deployment's own id
+    owner_id      = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    cluster_id    = Column(Integer, ForeignKey("clusters.id", ondelete="CASCADE"), nullable=True)
+    organization_id = Column(Integer, ForeignKey("organizations.id", ondelete="CASCADE"), nullable=True)
+    any_cluster   = Column(Boolean, default=False, nullable=False)
+    gang_id       = Column(String(64), nullable=True)
+    gang_size     = Column(Integer, nullable=True)
+    node_id       = Column(Integer, ForeignKey("nodes.id", ondelete="SET NULL"), nullable=True)
+    image         = Column(String(255), nullable=False)
+    required_cpu  = Column(Float, nullable=False)
+    required_ram  = Column(Integer, nullable=False)
+    required_gpu  = Column(Integer, nullable=False)
+    priority      = Column(SAEnum(PriorityLevel, name="priority_level"), nullable=False)
+    status        = Column(SAEnum(DeploymentStatus, name="deployment_status"), nullable=False)
+    created_at    = Column(DateTime, nullable=False)
+    started_at    = Column(DateTime, nullable=True)
+    finished_at   = Column(DateTime, nullable=True)
+    retry_count   = Column(Integer, default=0, nullable=False)
+    archived_at   = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        Index("ix_history_owner_id", "owner_id"),
+        Index("ix_history_cluster_id", "cluster_id"),
+        Index("ix_history_organization_id", "organization_id"),
+        # runtime history for backfill estimates reads the most recently finished rows
+        Index("ix_history_finished_at", "finished_at"),
+    )
@@ -0,0 +1,18 @@
+from datetime import datetime
+from sqlalchemy import Column, Integer, DateTime, JSON, ForeignKey, Index
+from .base import Base
+
+class DeploymentOutbox(Base):
+    """Queue messages written in the same transaction as their deployment and relayed to Redis afterwards."""
+    __tablename__ = "deployment_outbox"
+    id            = Column(Integer, primary_key=True)
+    deployment_id = Column(Integer, ForeignKey("deployments.id", ondelete="CASCADE"), nullable=False)
+    payload       = Column(JSON, nullable=False)  # the message pushed to the deployment queue
+    created_at    = Column(DateTime, default=datetime.utcnow, nullable=False)
+    delivered_at  = Column(DateTime, nullable=True)  # NULL until pushed to Redis
+
+    __table_args__ = (
+        # the relay only ever scans undelivered rows, oldest first
+        Index("ix_outbox_pending", "id", postgresql_where=delivered_at.is_(None)),
+        Index("ix_outbox_deployment_id", "deployment_id"),
+    )
@@ -0,0 +1,30 @@
+from datetime import datetime
+from sqlalchemy import (
+    Column, Integer, String, Float, DateTime,
+    ForeignKey, CheckConstraint, Index, UniqueConstraint
+)
+from sqlalchemy.orm import relationship
+from .base import Base
+
+class Node(Base):
+    __tablename__ = "nodes"
+    id            = Column(Integer, primary_key=True)
+    cluster_id    = Column(Integer, ForeignKey("clusters.id", ondelete="CASCADE"), nullable=False)
+    name          = Column(String(100), nullable=False)
+    total_cpu     = Column(Float, nullable=False)  # CPU units on this machine
+    total_ram     = Column(Integer, nullable=False)  # RAM on this machine (MB)
+    total_gpu     = Column(Integer, nullable=False)  # GPUs on this machine
+    available_cpu = Column(Float, nullable=False)
+    available_ram = Column(Integer, nullable=False)
+    available_gpu = Column(Integer, nullable=False)
+    created_at    = Column(DateTime, default=datetime.utcnow, nullable=False)
+    cluster     = relationship("Cluster", back_populates="nodes")
+    deployments = relationship("Deployment", back_populates="node")
+
+    __table_args__ = (
+        CheckConstraint("available_cpu >= 0 AND available_cpu <= total_cpu", name="ck_node_cpu"),
+        CheckConstraint("available_ram >= 0 AND available_ram <= total_ram", name="ck_node_ram"),
+        CheckConstraint("available_gpu >= 0 AND available_gpu <= total_gpu", name="ck_node_gpu"),
+        UniqueConstraint("cluster_id", "name", name="uq_cluster_node_name"),
+        Index("ix_nodes_cluster_id", "cluster_id")
+    )
@@ -3,6 +3,7 @@
 from .user import User
 from .Cluster import Cluster
 from .Deployment import Deployment
+from .Node import Node
 from .Organization import Organization
 from .UserOrganizations import UserOrganization
 from .base import Base 
\ No newline at end of file
@@ -24,3 +24,39 @@ class ClusterRead(ClusterBase):
 
     class Config:
         orm_mode = True
+
+class CapacitySnapshotRead(BaseModel):
+    version: int
+    age_seconds: float
+    max_age_seconds: float
+
+class ClusterStatusRead(BaseModel):
+    id: int
+    name: str
+    available_cpu: float
+    available_ram: int
+    available_gpu: int
+    free_cpu: float
+    free_ram: int
+    free_gpu: int
+    running: Optional[int] = None
+    queued: Optional[int] = None
+    snapshot: Optional[CapacitySnapshotRead] = None
+
+# --- Node Schemas ---
+class NodeCreate(BaseModel):
+    name: str
+    total_cpu: float
+    total_ram: int
+    total_gpu: int
+
+class NodeRead(NodeCreate):
+    id: int
+    cluster_id: int
+    available_cpu: float
+    available_ram: int
+    available_gpu: int
+    created_at: datetime
+
+    class Config:
+        orm_mode = True
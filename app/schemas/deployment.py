@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
 import enum
 from .cluster import ClusterRead # Import ClusterRead from the new cluster schema file
@@ -23,12 +23,22 @@ class DeploymentBase(BaseModel):
     priority: PriorityLevelEnum
 
 class DeploymentCreate(DeploymentBase):
-    cluster_id: int  
+    cluster_id: Optional[int] = None
+    # Set instead of cluster_id to let the scheduler pick any cluster of the organization
+    organization_id: Optional[int] = None
+    # Deployments with the same gang_id start (and are preempted) together once all gang_size are submitted
+    gang_id: Optional[str] = None
+    gang_size: Optional[int] = None
 
 class DeploymentRead(DeploymentBase):
     id: int
     owner_id: int
-    cluster_id: int
+    cluster_id: Optional[int] = None
+    organization_id: Optional[int] = None
+    any_cluster: bool = False
+    gang_id: Optional[str] = None
+    gang_size: Optional[int] = None
+    node_id: Optional[int] = None
     status: DeploymentStatusEnum
     retry_count: int
     created_at: datetime
@@ -39,4 +49,20 @@ class DeploymentRead(DeploymentBase):
         orm_mode = True 
 
 class DeploymentDeleteRequest(BaseModel):
-    cluster_id: int
+    cluster_id: Optional[int] = None  # None for an any-cluster deployment that is not placed yet
+
+class DeploymentFinishRequest(BaseModel):
+    status: DeploymentStatusEnum  # COMPLETED or FAILED
+
+class DeploymentBatchCreate(BaseModel):
+    deployments: List[DeploymentCreate]
+
+class DeploymentBatchItemResult(BaseModel):
+    index: int  # position in the submitted list
+    status_code: int  # 201 when created, otherwise the status the single endpoint would return
+    id: Optional[int] = None
+    detail: Optional[str] = None
+
+class DeploymentBatchResult(BaseModel):
+    created: int
+    results: List[DeploymentBatchItemResult]
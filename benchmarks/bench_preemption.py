@@ -0,0 +1,83 @@
+"""
+Preemption-heavy scheduling cycle at growing cluster occupancy.
+
+A full cluster runs N LOW jobs and receives N/10 HIGH jobs that can only be
+placed by preempting. With the victim index every preemption costs
+O(k log N), so the cycle should grow roughly linearly with N.
+
+    python -m benchmarks.bench_preemption [--max-running 50000]
+"""
+import argparse
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+from app.core.algorithm import schedule_jobs
+from app.core.vectorized import schedule_jobs_vectorized
+
+ENGINES = {"python": schedule_jobs, "numpy": schedule_jobs_vectorized}
+
+
+def build_cycle(n_running: int, seed: int = 0):
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    running = [{
+        'id': i,
+        'priority': 'LOW',
+        'cpu': float(rng.randint(1, 8)),
+        'ram': rng.randint(256, 4096),
+        'gpu': rng.choice([0, 0, 0, 1]),
+        'cluster_id': 1,
+        'started_at': now - timedelta(minutes=rng.randint(0, 600)),
+        'retry_count': rng.randint(0, 3),
+    } for i in range(n_running)]
+    total = {k: sum(j[k] for j in running) for k in ('cpu', 'ram', 'gpu')}
+    queue = [{
+        'id': n_running + i,
+        'priority': 'HIGH',
+        'cpu': float(rng.randint(4, 16)),
+        'ram': rng.randint(1024, 8192),
+        'gpu': rng.choice([0, 1]),
+        'cluster_id': 1,
+    } for i in range(n_running // 10)]
+    return queue, running, total, now
+
+
+def run(engine, preemption, n_running, repeat):
+    queue, running, total, now = build_cycle(n_running)
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        scheduled, preempted = ENGINES[engine](queue, running, total, preemption=preemption, now=now)
+        best = min(best, time.perf_counter() - start)
+    return best, len(scheduled), len(preempted)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--max-running", type=int, default=50_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--max-ratio", type=float, default=1.75,
+                        help="fail if time per running job at the largest size exceeds the smallest by this factor")
+    args = parser.parse_args()
+
+    sizes = [args.max_running // 8, args.max_running // 4, args.max_running // 2, args.max_running]
+    ok = True
+    for engine in ENGINES:
+        for preemption in ("largest-first", "min-cost"):
+            per_job = []
+            print(f"\n{engine} / {preemption}")
+            print(f"{'running':>9} {'scheduled':>10} {'preempted':>10} {'cycle ms':>10} {'us/running':>11}")
+            for n in sizes:
+                seconds, scheduled, preempted = run(engine, preemption, n, args.repeat)
+                per_job.append(seconds / n)
+                print(f"{n:>9} {scheduled:>10} {preempted:>10} {seconds * 1e3:>10.1f} {seconds / n * 1e6:>11.2f}")
+            ratio = per_job[-1] / per_job[0]
+            print(f"growth of per-job cost {sizes[0]} -> {sizes[-1]}: x{ratio:.2f}")
+            ok &= ratio <= args.max_ratio
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
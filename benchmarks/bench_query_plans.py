@@ -0,0 +1,158 @@
+"""
+Query plans and latency of the scheduler's and listing endpoints' hot queries on a large deployments table.
+
+Seeds a throwaway user, organization and clusters plus N deployments (default
+2 million, mostly COMPLETED/FAILED with a small RUNNING and QUEUED share, as
+a long-lived installation accumulates them) into the database at DATABASE_URL
+with one INSERT ... SELECT generate_series, analyzes the table and runs
+EXPLAIN ANALYZE for each hot query. A query fails if its plan scans the
+deployments table sequentially or its execution time exceeds --max-ms.
+Everything seeded is deleted again at the end.
+
+Apply the migrations first (`alembic upgrade head`).
+
+    python -m benchmarks.bench_query_plans [--rows 2000000] [--clusters 100] [--max-ms 100]
+"""
+import argparse
+import asyncio
+import json
+import sys
+import uuid
+
+from sqlalchemy import ARRAY, Integer, bindparam, delete, insert, select, text
+from sqlalchemy.dialects import postgresql
+
+from app.core import database
+from app.core.database import AsyncSessionLocal
+from app.core.scheduler_db import RUNNING_COLUMNS
+from app.models.Cluster import Cluster
+from app.models.Deployment import Deployment, DeploymentStatus
+from app.models.Organization import Organization
+from app.models.user import User
+
+SEED = text("""
+    INSERT INTO deployments (
+        owner_id, cluster_id, organization_id, any_cluster, image,
+        required_cpu, required_ram, required_gpu, priority, status,
+        created_at, started_at, finished_at, retry_count
+    )
+    SELECT
+        :owner_id, (:cluster_ids)[1 + i % cardinality(:cluster_ids)], :org_id, false, 'image-' || (i % 50),
+        1 + i % 8, 256 + i % 4096, i % 4 / 3, CASE WHEN i % 3 = 0 THEN 'HIGH' ELSE 'LOW' END::priority_level,
+        CASE
+            WHEN i % 100 = 0 THEN 'RUNNING'
+            WHEN i % 100 = 1 THEN 'QUEUED'
+            WHEN i % 100 < 5 THEN 'FAILED'
+            ELSE 'COMPLETED'
+        END::deployment_status,
+        now(), now(), now(), 0
+    FROM generate_series(1, :rows) AS i
+""").bindparams(bindparam("cluster_ids", type_=ARRAY(Integer)))
+
+
+def hot_queries(cluster_ids):
+    """The statements the scheduler and the listing endpoints run, by name."""
+    running = select(*RUNNING_COLUMNS.values()).where(Deployment.status == DeploymentStatus.RUNNING)
+    pending = cluster_ids[:max(1, len(cluster_ids) // 10)]
+    return {
+        "running (all clusters)": running,
+        "running (clusters with queued work)": running.where(Deployment.cluster_id.in_(pending)),
+        "queued on a cluster": select(Deployment.id).where(
+            Deployment.cluster_id == cluster_ids[0], Deployment.status == DeploymentStatus.QUEUED
+        ),
+        "list deployments of a cluster": select(Deployment).where(Deployment.cluster_id == cluster_ids[0]),
+    }
+
+
+def plan_nodes(plan: dict):
+    yield plan
+    for child in plan.get("Plans", []):
+        yield from plan_nodes(child)
+
+
+async def seed(n_rows: int, n_clusters: int):
+    tag = uuid.uuid4().hex[:12]
+    async with AsyncSessionLocal() as session:
+        user = User(username=f"bench-{tag}", hashed_password="-")
+        org = Organization(
+            name=f"bench-{tag}", admin_invite_code=f"a-{tag}",
+            developer_invite_code=f"d-{tag}", viewer_invite_code=f"v-{tag}",
+        )
+        session.add_all([user, org])
+        await session.flush()
+        cluster_ids = (await session.execute(
+            insert(Cluster).returning(Cluster.id, sort_by_parameter_order=True),
+            [dict(
+                name=f"bench-{i}", owner_id=user.id, organization_id=org.id,
+                total_cpu=1e6, total_ram=10**9, total_gpu=10**4,
+                available_cpu=1e6, available_ram=10**9, available_gpu=10**4,
+            ) for i in range(n_clusters)]
+        )).scalars().all()
+        await session.execute(SEED, {
+            "owner_id": user.id, "org_id": org.id, "cluster_ids": list(cluster_ids), "rows": n_rows,
+        })
+        await session.commit()
+        await session.execute(text("ANALYZE deployments"))
+        await session.commit()
+        return user.id, org.id, list(cluster_ids)
+
+
+async def cleanup(user_id: int, org_id: int) -> None:
+    async with AsyncSessionLocal() as session:
+        await session.execute(delete(Deployment).where(Deployment.owner_id == user_id))
+        await session.execute(delete(Cluster).where(Cluster.owner_id == user_id))
+        await session.execute(delete(Organization).where(Organization.id == org_id))
+        await session.execute(delete(User).where(User.id == user_id))
+        await session.commit()
+
+
+async def explain(query) -> dict:
+    sql = query.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True})
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(text(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {sql}"))
+        raw = result.scalar_one()
+    return (json.loads(raw) if isinstance(raw, str) else raw)[0]
+
+
+async def main_async(args) -> bool:
+    database.engine.echo = False
+    user_id, org_id, cluster_ids = await seed(args.rows, args.clusters)
+    ok = True
+    try:
+        print(f"{'query':>38} {'ms':>9} {'rows':>8}  plan")
+        for name, query in hot_queries(cluster_ids).items():
+            best = None
+            for _ in range(args.repeat):
+                report = await explain(query)
+                if best is None or report["Execution Time"] < best["Execution Time"]:
+                    best = report
+            nodes = list(plan_nodes(best["Plan"]))
+            seq_scan = any(
+                n["Node Type"] == "Seq Scan" and n.get("Relation Name") == "deployments" for n in nodes
+            )
+            plan = " > ".join(
+                n["Node Type"] + (f" [{n['Index Name']}]" if "Index Name" in n else "") for n in nodes
+            )
+            ms = best["Execution Time"]
+            passed = not seq_scan and ms <= args.max_ms
+            ok &= passed
+            print(f"{name:>38} {ms:>9.2f} {best['Plan']['Actual Rows']:>8}  {plan}{'' if passed else '  FAIL'}")
+    finally:
+        await cleanup(user_id, org_id)
+        await database.engine.dispose()
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=2_000_000)
+    parser.add_argument("--clusters", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--max-ms", type=float, default=100.0,
+                        help="fail if a hot query takes longer than this many milliseconds")
+    args = parser.parse_args()
+    sys.exit(0 if asyncio.run(main_async(args)) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""
+Loading the scheduler's cluster state from the DB with 100k running deployments.
+
+Seeds a throwaway user, organization, clusters and N RUNNING deployments in the
+database at DATABASE_URL, then times the ORM loader the scheduler used to run
+(full Deployment/Cluster objects copied into dicts and grouped afterwards)
+against the projected, cluster-grouped queries in app.core.scheduler_db, for
+all clusters and for a tenth of them (the clusters with queued work). Peak
+Python memory is measured with tracemalloc on a separate run. Everything
+seeded is deleted again at the end.
+
+    python -m benchmarks.bench_state_queries [--running 100000] [--clusters 100]
+"""
+import argparse
+import asyncio
+import random
+import sys
+import time
+import tracemalloc
+import uuid
+from datetime import datetime
+
+from sqlalchemy import delete, insert, select
+
+from app.core import database
+from app.core.database import AsyncSessionLocal
+from app.core.scheduler_db import fetch_all_cluster_resources_from_db, fetch_running_deployments_from_db
+from app.models.Cluster import Cluster
+from app.models.Deployment import Deployment, DeploymentStatus
+from app.models.Organization import Organization
+from app.models.user import User
+
+
+async def legacy_load(cluster_ids=None):
+    """The previous loader: ORM entities for every row, grouped in a second pass."""
+    async with AsyncSessionLocal() as session:
+        query = select(Deployment).where(Deployment.status == DeploymentStatus.RUNNING)
+        if cluster_ids is not None:
+            query = query.where(Deployment.cluster_id.in_(list(cluster_ids)))
+        running = [{
+            'id': dep.id, 'priority': dep.priority.value, 'cpu': dep.required_cpu,
+            'ram': dep.required_ram, 'gpu': dep.required_gpu, 'cluster_id': dep.cluster_id,
+            'organization_id': dep.organization_id, 'owner_id': dep.owner_id, 'image': dep.image,
+            'gang_id': dep.gang_id, 'gang_size': dep.gang_size, 'any_cluster': dep.any_cluster,
+            'node_id': dep.node_id, 'started_at': dep.started_at, 'retry_count': dep.retry_count,
+        } for dep in (await session.execute(query)).scalars().all()]
+        query = select(Cluster)
+        if cluster_ids is not None:
+            query = query.where(Cluster.id.in_(list(cluster_ids)))
+        resources = {c.id: {
+            'cluster_id': c.id, 'organization_id': c.organization_id,
+            'total_cpu': c.total_cpu, 'total_ram': c.total_ram, 'total_gpu': c.total_gpu,
+            'available_cpu': c.available_cpu, 'available_ram': c.available_ram, 'available_gpu': c.available_gpu,
+        } for c in (await session.execute(query)).scalars().all()}
+    by_cluster = {}
+    for job in running:
+        by_cluster.setdefault(job['cluster_id'], []).append(job)
+    return resources, by_cluster
+
+
+async def projected_load(cluster_ids=None):
+    return (
+        await fetch_all_cluster_resources_from_db(cluster_ids),
+        await fetch_running_deployments_from_db(cluster_ids),
+    )
+
+
+async def seed(n_running: int, n_clusters: int):
+    tag = uuid.uuid4().hex[:12]
+    rng = random.Random(0)
+    now = datetime.utcnow()
+    async with AsyncSessionLocal() as session:
+        user = User(username=f"bench-{tag}", hashed_password="-")
+        org = Organization(
+            name=f"bench-{tag}", admin_invite_code=f"a-{tag}",
+            developer_invite_code=f"d-{tag}", viewer_invite_code=f"v-{tag}",
+        )
+        session.add_all([user, org])
+        await session.flush()
+        cluster_ids = (await session.execute(
+            insert(Cluster).returning(Cluster.id, sort_by_parameter_order=True),
+            [dict(
+                name=f"bench-{i}", owner_id=user.id, organization_id=org.id,
+                total_cpu=1e6, total_ram=10**9, total_gpu=10**4,
+                available_cpu=0.0, available_ram=0, available_gpu=0,
+            ) for i in range(n_clusters)]
+        )).scalars().all()
+        for start in range(0, n_running, 10_000):
+            await session.execute(insert(Deployment), [dict(
+                owner_id=user.id, cluster_id=cluster_ids[i % n_clusters], organization_id=org.id,
+                image=f"image-{i % 50}", required_cpu=float(rng.randint(1, 8)),
+                required_ram=rng.randint(256, 4096), required_gpu=rng.choice([0, 0, 0, 1]),
+                priority=rng.choice(["HIGH", "LOW"]), status="RUNNING",
+                created_at=now, started_at=now, retry_count=0,
+            ) for i in range(start, min(start + 10_000, n_running))])
+        await session.commit()
+        return user.id, org.id, cluster_ids
+
+
+async def cleanup(user_id: int, org_id: int) -> None:
+    async with AsyncSessionLocal() as session:
+        await session.execute(delete(Deployment).where(Deployment.owner_id == user_id))
+        await session.execute(delete(Cluster).where(Cluster.owner_id == user_id))
+        await session.execute(delete(Organization).where(Organization.id == org_id))
+        await session.execute(delete(User).where(User.id == user_id))
+        await session.commit()
+
+
+async def measure(load, cluster_ids, repeat: int):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        await load(cluster_ids)
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    _, running = await load(cluster_ids)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return best, peak, sum(map(len, running.values()))
+
+
+async def main_async(args) -> bool:
+    database.engine.echo = False
+    user_id, org_id, cluster_ids = await seed(args.running, args.clusters)
+    ok = True
+    try:
+        print(f"{'scope':>9} {'loader':>10} {'rows':>8} {'seconds':>9} {'peak MiB':>9}")
+        for scope, ids in (("all", None), ("pending", cluster_ids[:max(1, len(cluster_ids) // 10)])):
+            legacy = await measure(legacy_load, ids, args.repeat)
+            projected = await measure(projected_load, ids, args.repeat)
+            for name, (seconds, peak, rows) in (("orm", legacy), ("projected", projected)):
+                print(f"{scope:>9} {name:>10} {rows:>8} {seconds:>9.3f} {peak / 2**20:>9.1f}")
+            ok &= projected[0] <= legacy[0] and projected[1] <= legacy[1]
+    finally:
+        await cleanup(user_id, org_id)
+        await database.engine.dispose()
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--running", type=int, default=100_000)
+    parser.add_argument("--clusters", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    sys.exit(0 if asyncio.run(main_async(args)) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Latency of unrelated requests while the API is verifying passwords.
+
+Drives an in-process FastAPI app with a storm of concurrent logins and,
+at the same time, a steady stream of requests to a trivial `/ping` route.
+Logins are served twice: once verifying the bcrypt hash on the event loop
+(the old login, which stalls every other request for the ~100-250 ms a
+verification takes) and once through the bounded hashing pool in
+`app.core.security`. Reports `/ping` p50/p99 with no logins and during each
+storm, and the login throughput; fails if `/ping` p99 during the pooled
+storm exceeds `--max-p99-ms`. No database or Redis is needed.
+
+    python -m benchmarks.load_login_storm [--logins 200] [--concurrency 32]
+"""
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+
+import httpx
+from fastapi import FastAPI
+
+from app.core.security import get_password_hash, hashing_stats, verify_password, verify_password_async
+
+PASSWORD = "correct horse battery staple"
+
+
+def build_app() -> FastAPI:
+    hashed = get_password_hash(PASSWORD)
+    app = FastAPI()
+
+    @app.post("/blocking/login")
+    async def login_blocking():
+        return {"ok": verify_password(PASSWORD, hashed)}
+
+    @app.post("/pooled/login")
+    async def login_pooled():
+        return {"ok": await verify_password_async(PASSWORD, hashed)}
+
+    @app.get("/ping")
+    async def ping():
+        return {"ok": True}
+
+    return app
+
+
+async def pings(client: httpx.AsyncClient, stop: asyncio.Event, interval: float) -> list:
+    # latency is measured from when the ping was due, so time the event loop
+    # spent blocked before it could even send the request counts too
+    latencies = []
+    due = time.perf_counter()
+    while True:
+        (await client.get("/ping")).raise_for_status()
+        done = time.perf_counter()
+        latencies.append(done - due)
+        if stop.is_set():
+            return latencies
+        due = done + interval
+        await asyncio.sleep(interval)
+
+
+async def storm(client: httpx.AsyncClient, route, n: int, concurrency: int, interval: float):
+    """Run n logins (none if route is None) while pinging; returns (ping latencies, logins/s)."""
+    slots = asyncio.Semaphore(concurrency)
+    stop = asyncio.Event()
+
+    async def one():
+        async with slots:
+            (await client.post(f"/{route}/login")).raise_for_status()
+
+    pinger = asyncio.create_task(pings(client, stop, interval))
+    start = time.perf_counter()
+    if route is None:
+        await asyncio.sleep(1.0)
+    else:
+        await asyncio.gather(*(one() for _ in range(n)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    return await pinger, (n / elapsed if route else 0.0)
+
+
+def p(latencies: list, q: int) -> float:
+    if len(latencies) < 2:
+        return latencies[0] * 1000 if latencies else 0.0
+    return statistics.quantiles(latencies, n=100, method="inclusive")[q - 1] * 1000
+
+
+async def main_async(args) -> bool:
+    transport = httpx.ASGITransport(app=build_app())
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        rows = []
+        for label, route in (("idle", None), ("blocking", "blocking"), ("pooled", "pooled")):
+            latencies, rate = await storm(client, route, args.logins, args.concurrency, args.ping_interval)
+            rows.append((label, len(latencies), p(latencies, 50), p(latencies, 99), rate))
+    print(f"{'login':>9} {'pings':>6} {'p50 ms':>8} {'p99 ms':>8} {'logins/s':>9}")
+    for label, count, p50, p99, rate in rows:
+        print(f"{label:>9} {count:>6} {p50:>8.1f} {p99:>8.1f} {rate:>9.1f}")
+    print(f"hashing pool: {hashing_stats.stats()}")
+    return rows[-1][3] <= args.max_p99_ms
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--ping-interval", type=float, default=0.005,
+                        help="seconds between /ping requests")
+    parser.add_argument("--max-p99-ms", type=float, default=50.0,
+                        help="fail if /ping p99 during the pooled storm is above this")
+    args = parser.parse_args()
+    sys.exit(0 if asyncio.run(main_async(args)) else 1)
+
+
+if __name__ == "__main__":
+    main()
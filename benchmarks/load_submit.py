@@ -0,0 +1,110 @@
+"""
+Submission throughput of the API's Redis producer under concurrent requests.
+
+Drives two in-process FastAPI routes with N concurrent requests: one pushes
+through a synchronous redis.Redis client (the old producer, which blocks the
+event loop for every round trip), the other through the pooled async
+producer. With a round-trip time of r the first is capped near 1/r requests
+per second whatever the concurrency; the second scales with it. The gap only
+shows with a real network RTT, so point REDIS_HOST at a remote Redis (or add
+latency with `tc qdisc add dev lo root netem delay 1ms`).
+
+Deployments are pushed for cluster -1 and removed again afterwards.
+
+    python -m benchmarks.load_submit [--requests 2000] [--concurrency 64]
+"""
+import argparse
+import asyncio
+import sys
+import time
+
+import httpx
+import redis
+from fastapi import FastAPI
+
+from app.config import REDIS_DB, REDIS_HOST, REDIS_PORT
+from app.core import redis_client
+from app.core.reliable_queue import (
+    DISCARD_SCRIPT, INFLIGHT_KEY, JOBS_KEY, PENDING_KEY, PUSH_SCRIPT, WHERE_KEY, push_args, queue_key
+)
+
+CLUSTER_ID = -1
+
+
+def message(dep_id: int) -> dict:
+    return {
+        "deployment_id": dep_id, "priority": "LOW", "required_cpu": 1.0, "required_ram": 1,
+        "required_gpu": 0, "cluster_id": CLUSTER_ID, "organization_id": None,
+    }
+
+
+def build_app() -> FastAPI:
+    sync_client = redis.Redis(host=REDIS_HOST, port=REDIS_PORT, db=REDIS_DB, decode_responses=True)
+    sync_push = sync_client.register_script(PUSH_SCRIPT)
+    app = FastAPI()
+
+    @app.post("/sync/{dep_id}")
+    async def submit_sync(dep_id: int):
+        keys, args = push_args(message(dep_id))
+        sync_push(keys=keys, args=args)
+        return {"id": dep_id}
+
+    @app.post("/async/{dep_id}")
+    async def submit_async(dep_id: int):
+        await redis_client.push_deployment_to_queue(message(dep_id))
+        return {"id": dep_id}
+
+    return app
+
+
+async def drive(app: FastAPI, route: str, n: int, concurrency: int, first_id: int) -> float:
+    slots = asyncio.Semaphore(concurrency)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def one(dep_id):
+            async with slots:
+                resp = await client.post(f"/{route}/{dep_id}")
+                resp.raise_for_status()
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(first_id + i) for i in range(n)))
+        return n / (time.perf_counter() - start)
+
+
+async def cleanup(ids) -> None:
+    client = await redis_client.init_redis()
+    discard = client.register_script(DISCARD_SCRIPT)
+    ids = list(ids)
+    for i in range(0, len(ids), 1000):
+        await discard(keys=[INFLIGHT_KEY, WHERE_KEY, JOBS_KEY], args=ids[i:i + 1000])
+    await client.srem(PENDING_KEY, queue_key(message(0)))
+
+
+async def main_async(args) -> bool:
+    app = build_app()
+    await redis_client.init_redis()
+    try:
+        sync_rate = await drive(app, "sync", args.requests, args.concurrency, 10**9)
+        async_rate = await drive(app, "async", args.requests, args.concurrency, 2 * 10**9)
+    finally:
+        await cleanup(list(range(10**9, 10**9 + args.requests)) + list(range(2 * 10**9, 2 * 10**9 + args.requests)))
+        await redis_client.close_redis()
+    print(f"{'producer':>9} {'requests':>9} {'concurrency':>12} {'req/s':>10}")
+    print(f"{'sync':>9} {args.requests:>9} {args.concurrency:>12} {sync_rate:>10.0f}")
+    print(f"{'async':>9} {args.requests:>9} {args.concurrency:>12} {async_rate:>10.0f}")
+    print(f"speedup x{async_rate / sync_rate:.2f}")
+    return async_rate >= sync_rate * args.min_speedup
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--min-speedup", type=float, default=1.0,
+                        help="fail if the async producer is not at least this much faster")
+    args = parser.parse_args()
+    sys.exit(0 if asyncio.run(main_async(args)) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -7,13 +7,15 @@ from app.core.jwt import create_access_token, verify_access_token, auth
 from app.crud.user import create_user, get_user_by_username, get_user_by_id
 from app.crud.org import get_organization_by_name, get_all_organizations, get_user_org_membership
 from app.crud.cluster import get_cluster, list_clusters, delete_cluster
-from app.crud.deployment import get_deployment_by_id_for_scheduling
-from app.core.security import get_password_hash, verify_password
+from app.crud.deployment import get_deployment_by_id_for_scheduling, create_deployments_batch, finish_deployment
+from app.schemas.deployment import DeploymentCreate
+from app.core.access import load_deployment_access
+from app.core.security import get_password_hash, verify_password, get_password_hash_async, verify_password_async, hashing_stats
 from app.models.user import User
 from app.models.Organization import Organization
 from app.models.UserOrganizations import UserOrganization
 from app.models.Cluster import Cluster
-from app.models.Deployment import Deployment
+from app.models.Deployment import Deployment, DeploymentStatus
 from app.models.Role import RoleEnum
 from app.config import SECRET_KEY
 
@@ -298,3 +300,110 @@ async def test_get_deployment_by_id_for_scheduling_not_found(monkeypatch):
     fake_session.execute.assert_awaited_once()
 
 
+
+@pytest.mark.asyncio
+@pytest.mark.test
+async def test_create_deployments_batch_reports_each_item(monkeypatch, dummy_user, dummy_cluster):
+    monkeypatch.setattr("app.crud.deployment.notify_outbox", MagicMock())
+    dummy_cluster.total_cpu = dummy_cluster.available_cpu = 4
+    dummy_cluster.total_ram = dummy_cluster.available_ram = 8
+    dummy_cluster.total_gpu = dummy_cluster.available_gpu = 0
+    clusters, roles, inserted = MagicMock(), MagicMock(), MagicMock()
+    clusters.scalars.return_value.all.return_value = [dummy_cluster]
+    roles.all.return_value = [(dummy_cluster.organization_id, RoleEnum.Developer)]
+    inserted.scalars.return_value.all.return_value = [501]
+    fake_session = AsyncMock()
+    fake_session.execute.side_effect = [clusters, roles, inserted, MagicMock()]
+
+    item = dict(image="nginx", required_cpu=3, required_ram=4, required_gpu=0, priority="LOW")
+    results = await create_deployments_batch(fake_session, dummy_user.id, [
+        DeploymentCreate(cluster_id=dummy_cluster.id, **item),
+        DeploymentCreate(cluster_id=dummy_cluster.id, **item),  # the first one used the room
+        DeploymentCreate(**item),
+    ])
+
+    assert results[0] == {"index": 0, "status_code": 201, "id": 501}
+    assert results[1]["status_code"] == 400
+    assert results[2]["status_code"] == 400
+    assert dummy_cluster.available_cpu == 1
+    assert fake_session.execute.await_count == 4  # clusters, roles, deployments, outbox
+    fake_session.commit.assert_awaited_once()
+
+@pytest.mark.asyncio
+@pytest.mark.test
+async def test_deployment_access_loads_role_in_one_query(monkeypatch, dummy_user, dummy_deployment):
+    monkeypatch.setattr("app.core.access.memberships", MagicMock())
+    row = MagicMock()
+    row.first.return_value = (dummy_deployment, 1, RoleEnum.Viewer)
+    fake_session = AsyncMock()
+    fake_session.execute.return_value = row
+
+    access = await load_deployment_access(fake_session, 7, dummy_deployment.id)
+    assert access.deployment is dummy_deployment and access.organization_id == 1
+    assert access.can_read and not access.can_manage  # a Viewer who does not own it
+    fake_session.execute.assert_awaited_once()
+
+@pytest.mark.asyncio
+@pytest.mark.test
+async def test_deployment_access_not_found():
+    row = MagicMock()
+    row.first.return_value = None
+    fake_session = AsyncMock()
+    fake_session.execute.return_value = row
+
+    with pytest.raises(HTTPException) as excinfo:
+        await load_deployment_access(fake_session, 7, 999)
+    assert excinfo.value.status_code == 404
+
+@pytest.mark.asyncio
+@pytest.mark.test
+async def test_password_hashing_runs_off_the_event_loop():
+    calls = hashing_stats.calls
+    hashed = await get_password_hash_async("s3cret")
+    assert await verify_password_async("s3cret", hashed)
+    assert not await verify_password_async("wrong", hashed)
+    assert verify_password("s3cret", hashed)
+    assert hashing_stats.calls == calls + 3
+    assert hashing_stats.waiting == 0
+
+@pytest.mark.asyncio
+@pytest.mark.test
+async def test_finish_deployment_pushes_event_for_scheduler(monkeypatch, dummy_deployment):
+    push = AsyncMock()
+    monkeypatch.setattr("app.crud.deployment.push_deployment_event", push)
+    dummy_deployment.status = DeploymentStatus.RUNNING
+    await finish_deployment(dummy_deployment, DeploymentStatus.FAILED)
+    push.assert_awaited_once_with({"event": "failed", "deployment_id": 201, "cluster_id": 101})
+
+    dummy_deployment.status = DeploymentStatus.QUEUED
+    with pytest.raises(HTTPException) as exc:
+        await finish_deployment(dummy_deployment, DeploymentStatus.COMPLETED)
+    assert exc.value.status_code == 409
+    assert push.await_count == 1
+
+
+@pytest.mark.test
+def test_cluster_status_has_the_same_fields_with_and_without_a_snapshot(monkeypatch, dummy_user):
+    from fastapi.testclient import TestClient
+    from app.main import app
+    from app.api.routes.cluster import get_async_db
+
+    async def db():
+        yield AsyncMock()
+
+    fresh = {"id": 101, "name": "TestCluster", "available_cpu": 2.0, "available_ram": 4, "available_gpu": 0,
+             "free_cpu": 6.0, "free_ram": 8, "free_gpu": 1, "running": 1, "queued": 3,
+             "snapshot": {"version": 42, "age_seconds": 1.0, "max_age_seconds": 30.0}}
+    fallback = dict(fresh, running=None, queued=None, snapshot=None)
+    status_of = AsyncMock(side_effect=[fresh, fallback])
+    monkeypatch.setattr("app.api.routes.cluster.get_cluster_status", status_of)
+    app.dependency_overrides[auth] = lambda: dummy_user
+    app.dependency_overrides[get_async_db] = db
+    try:
+        client = TestClient(app)
+        bodies = [client.get("/api/clusters/101/status").json() for _ in range(2)]
+    finally:
+        app.dependency_overrides.clear()
+
+    assert bodies == [fresh, fallback]
+    assert set(bodies[0]) == set(bodies[1])
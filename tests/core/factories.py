@@ -0,0 +1,5 @@
+def job(id, priority, cpu, ram=1, gpu=0, cluster_id=1, **fields):
+    """A job dict as the scheduler consumer builds it; extra fields left as None are omitted."""
+    j = {'id': id, 'priority': priority, 'cpu': cpu, 'ram': ram, 'gpu': gpu, 'cluster_id': cluster_id}
+    j.update((k, v) for k, v in fields.items() if v is not None)
+    return j
@@ -0,0 +1,38 @@
+from contextlib import asynccontextmanager
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql
+
+from app.core import archive
+
+
+@pytest.mark.test
+def test_archive_moves_rows_in_one_statement():
+    sql = str(archive.archive_statement(older_than=60, limit=500).compile(dialect=postgresql.dialect()))
+    assert "FOR UPDATE SKIP LOCKED" in sql
+    assert "DELETE FROM deployments" in sql
+    assert sql.count("INSERT INTO deployment_history") == 1
+
+
+@pytest.mark.test
+def test_with_history_reads_both_tables():
+    dep = archive.with_history()
+    sql = str(select(dep).where(dep.cluster_id == 1).compile(dialect=postgresql.dialect()))
+    assert "FROM deployments UNION ALL" in sql and "FROM deployment_history" in sql
+
+
+@pytest.mark.asyncio
+@pytest.mark.test
+async def test_archive_batch_commits_and_counts(monkeypatch):
+    session = AsyncMock()
+    session.execute.return_value = MagicMock(rowcount=3)
+
+    @asynccontextmanager
+    async def factory():
+        yield session
+
+    monkeypatch.setattr(archive, "AsyncSessionLocal", factory)
+    assert await archive.archive_batch() == 3
+    session.commit.assert_awaited_once()
@@ -0,0 +1,84 @@
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from app.core import auth_cache, jwt
+from app.core.auth_cache import TTLCache
+from app.crud import org as crud_org
+from app.models.Role import RoleEnum
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture(autouse=True)
+def empty_caches():
+    auth_cache.principals.clear()
+    auth_cache.memberships.clear()
+    yield
+    auth_cache.principals.clear()
+    auth_cache.memberships.clear()
+
+
+@pytest.mark.test
+def test_ttl_cache_expires_and_evicts_least_recently_used():
+    clock = Clock()
+    cache = TTLCache(maxsize=2, ttl=10, clock=clock)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1  # "b" is now the least recently used
+    cache.set("c", 3)
+    assert cache.get("b") is None and cache.get("c") == 3
+    clock.now = 10.0
+    assert cache.get("a") is None
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["evictions"], stats["size"]) == (2, 2, 1, 1)
+    assert stats["hit_rate"] == 0.5
+
+
+@pytest.mark.asyncio
+@pytest.mark.test
+async def test_auth_resolves_each_user_once(monkeypatch):
+    monkeypatch.setattr(jwt, "verify_access_token", lambda t: {"sub": "alice"})
+    lookup = AsyncMock(return_value=SimpleNamespace(id=42, username="alice"))
+    monkeypatch.setattr(jwt, "get_user_by_username", lookup)
+
+    first = await jwt.auth(token="t", db=AsyncMock())
+    second = await jwt.auth(token="t", db=AsyncMock())
+    assert first == second == auth_cache.Principal(id=42, username="alice")
+    lookup.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+@pytest.mark.test
+async def test_membership_roles_are_cached_until_invalidated():
+    session = AsyncMock()
+    found = MagicMock()
+    found.scalar_one_or_none.return_value = RoleEnum.Developer
+    session.execute.return_value = found
+
+    assert await crud_org.get_membership_role(session, 42, 1) == RoleEnum.Developer
+    assert await crud_org.get_membership_role(session, 42, 1) == RoleEnum.Developer
+    assert session.execute.await_count == 1
+    auth_cache.memberships.invalidate((42, 1))
+    assert await crud_org.get_membership_role(session, 42, 1) == RoleEnum.Developer
+    assert session.execute.await_count == 2
+
+
+@pytest.mark.asyncio
+@pytest.mark.test
+async def test_non_members_are_not_cached():
+    session = AsyncMock()
+    missing = MagicMock()
+    missing.scalar_one_or_none.return_value = None
+    session.execute.return_value = missing
+
+    assert await crud_org.get_membership_role(session, 42, 1) is None
+    assert await crud_org.get_membership_role(session, 42, 1) is None
+    assert session.execute.await_count == 2
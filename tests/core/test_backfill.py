@@ -0,0 +1,66 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.core.algorithm import schedule_jobs
+from app.core.backfill import EasyBackfill, RuntimeEstimator
+from tests.core.factories import job
+
+NOW = datetime(2025, 6, 1, 12, 0)
+
+
+def history(image, owner_id, minutes, count=3):
+    start = NOW - timedelta(days=1)
+    return [
+        {'image': image, 'owner_id': owner_id, 'started_at': start, 'finished_at': start + timedelta(minutes=minutes)}
+        for _ in range(count)
+    ]
+
+
+@pytest.mark.test
+def test_estimator_prefers_the_most_specific_history():
+    estimator = RuntimeEstimator.from_history(
+        history("train", 1, 120) + history("train", 2, 30) + history("serve", 1, 10, count=2),
+        default=600.0,
+    )
+    assert estimator.estimate({'image': "train", 'owner_id': 1}) == 120 * 60
+    assert estimator.estimate({'image': "train", 'owner_id': 3}) == pytest.approx(75 * 60 + 45 * 60 * 1.0954, rel=1e-3)
+    # two runs of "serve" are not enough: falls back to everything owner 1 ran
+    assert estimator.estimate({'image': "serve", 'owner_id': 1}) == pytest.approx(
+        estimator.by_owner[1].estimate()
+    )
+    assert RuntimeEstimator(default=600.0).estimate({'image': "x", 'owner_id': 1}) == 600.0
+
+
+@pytest.mark.test
+def test_easy_backfill_protects_the_blocked_high_job():
+    estimator = RuntimeEstimator.from_history(
+        history("long", 1, 300) + history("short", 1, 10) + history("hold", 1, 60)
+    )
+    running = [job(50, 'HIGH', 6.0, image="hold", owner_id=1, started_at=NOW)]
+    queue = [
+        job(1, 'HIGH', 8.0, image="long", owner_id=1),
+        job(2, 'LOW', 3.0, image="long", owner_id=1),   # would still run when job 1 is due
+        job(3, 'LOW', 1.0, image="short", owner_id=1),  # done well before job 1 can start
+        job(4, 'LOW', 2.0, image="long", owner_id=1),   # fits in what job 1 leaves free
+    ]
+    total = {'cpu': 10.0, 'ram': 100, 'gpu': 0}
+
+    scheduled, _ = schedule_jobs(queue, running, total)
+    assert [j['id'] for j in scheduled] == [2, 3]
+
+    backfill = EasyBackfill(estimator, running, now=NOW)
+    scheduled, _ = schedule_jobs(queue, running, total, backfill=backfill)
+    assert sorted(j['id'] for j in scheduled) == [3, 4]
+
+
+@pytest.mark.test
+def test_reservation_accounts_for_jobs_started_in_the_same_pass():
+    estimator = RuntimeEstimator(default=3600.0)
+    running = [job(50, 'HIGH', 4.0, image="x", owner_id=1, started_at=NOW - timedelta(minutes=30))]
+    backfill = EasyBackfill(estimator, running, now=NOW)
+    backfill.started(job(1, 'LOW', 4.0, image="x", owner_id=1))
+
+    reservation = backfill.reserve(job(2, 'HIGH', 8.0, image="x", owner_id=1), {'cpu': 2.0, 'ram': 10, 'gpu': 0})
+    assert reservation.shadow_time == NOW + timedelta(hours=1)
+    assert reservation.extra == {'cpu': 2.0, 'ram': 11, 'gpu': 0}
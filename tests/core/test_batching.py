@@ -0,0 +1,26 @@
+import pytest
+
+from app.core.batching import AdaptiveWindow, IdleBackoff
+
+
+@pytest.mark.test
+def test_window_grows_under_load_and_shrinks_when_quiet():
+    window = AdaptiveWindow(0.005, 0.04)
+    for _ in range(5):
+        window.update(300)
+    assert window.seconds == 0.04
+    window.update(1)
+    assert window.seconds == 0.02
+    for _ in range(5):
+        window.update(1)
+    assert window.seconds == 0.005
+
+
+@pytest.mark.test
+def test_idle_backoff_resets_on_work():
+    idle = IdleBackoff(1.0, 10.0)
+    for _ in range(5):
+        idle.update(0)
+    assert idle.seconds == 10.0
+    idle.update(3)
+    assert idle.seconds == 1.0
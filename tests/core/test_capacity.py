@@ -0,0 +1,118 @@
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from fastapi import HTTPException
+
+from app.core.capacity import SnapshotPublisher, decode_snapshot, snapshot_fields, snapshot_status
+from app.core.ledger import ResourceLedger
+from app.crud import cluster as cluster_crud
+from app.crud import deployment as deployment_crud
+from app.models.Role import RoleEnum
+
+
+def ledger_with_one_cluster():
+    ledger = ResourceLedger()
+    ledger.load(
+        {1: {'cluster_id': 1, 'organization_id': 3, 'owner_id': 7, 'name': 'gpu',
+             'total_cpu': 16.0, 'total_ram': 64, 'total_gpu': 2}},
+        {1: [{'id': 5, 'priority': 'LOW', 'cpu': 10.0, 'ram': 8, 'gpu': 1, 'cluster_id': 1}]}
+    )
+    return ledger
+
+
+def published(ledger, age=1.0):
+    """The snapshot as Redis would hold it after PUBLISH_SCRIPT, read ``age`` seconds later."""
+    fields = dict(snapshot_fields(ledger[1]), version="42", published_at="1000.000000", queued="3")
+    return decode_snapshot(fields, 1000.0 + age, max_age=30)
+
+
+def request(cpu, ram=1, gpu=0):
+    return SimpleNamespace(required_cpu=cpu, required_ram=ram, required_gpu=gpu)
+
+
+@pytest.mark.test
+def test_ledger_tracks_changed_clusters_for_snapshots():
+    ledger = ledger_with_one_cluster()
+    assert ledger.take_dirty() == {1} and ledger.take_dirty() == set()
+    ledger.on_released(5)
+    assert ledger.take_dirty() == {1}
+
+    snapshot = published(ledger_with_one_cluster())
+    assert snapshot["free_cpu"] == 6.0 and snapshot["free_gpu"] == 1 and snapshot["running"] == 1
+    assert snapshot["owner_id"] == 7 and snapshot["organization_id"] == 3 and snapshot["fresh"]
+    assert snapshot_status(snapshot)["snapshot"] == {"version": 42, "age_seconds": 1.0, "max_age_seconds": 30}
+    assert not published(ledger, age=31)["fresh"]
+    assert decode_snapshot({}, 0.0) is None
+
+
+@pytest.mark.asyncio
+@pytest.mark.test
+async def test_precheck_rejects_from_fresh_snapshot_for_cached_managers_only(monkeypatch):
+    snapshot = published(ledger_with_one_cluster())
+    monkeypatch.setattr(deployment_crud, "get_snapshot", AsyncMock(return_value=snapshot))
+    roles = {(7, 3): RoleEnum.Developer, (8, 3): RoleEnum.Admin}
+    monkeypatch.setattr(deployment_crud, "memberships", SimpleNamespace(get=lambda key: roles.get(key)))
+
+    await deployment_crud.precheck_capacity(7, 1, request(6.0))
+    with pytest.raises(HTTPException) as exc:
+        await deployment_crud.precheck_capacity(7, 1, request(8.0))
+    assert exc.value.status_code == 400 and "version 42" in exc.value.detail
+    # not the owner, not a cached member, or a stale snapshot: the database decides
+    await deployment_crud.precheck_capacity(8, 1, request(8.0))
+    roles.clear()
+    await deployment_crud.precheck_capacity(7, 1, request(8.0))
+    roles[(7, 3)] = RoleEnum.Admin
+    snapshot["fresh"] = False
+    await deployment_crud.precheck_capacity(7, 1, request(8.0))
+
+
+@pytest.mark.asyncio
+@pytest.mark.test
+async def test_cluster_status_served_from_snapshot(monkeypatch):
+    snapshot = published(ledger_with_one_cluster())
+    monkeypatch.setattr(cluster_crud, "get_snapshot", AsyncMock(return_value=snapshot))
+    cluster = SimpleNamespace(id=1, name="gpu", available_cpu=2.0, available_ram=40, available_gpu=0,
+                              total_cpu=16.0, total_ram=64, total_gpu=2)
+    row = MagicMock()
+    row.scalars.return_value.first.return_value = cluster
+    db = AsyncMock()
+    db.execute.return_value = row
+
+    status = await cluster_crud.get_cluster_status(db, SimpleNamespace(id=7), 1)
+    assert status["available_cpu"] == 2.0 and status["free_cpu"] == 6.0
+    assert status["queued"] == 3 and status["snapshot"]["version"] == 42
+    db.execute.assert_awaited_once()  # the row only; nothing is summed
+
+    # a stale snapshot: free capacity from the running deployments, no counts
+    snapshot["fresh"] = False
+    usage = MagicMock()
+    usage.one.return_value = (10.0, 8, 1)
+    db.execute.side_effect = [row, usage]
+    status = await cluster_crud.get_cluster_status(db, SimpleNamespace(id=7), 1)
+    assert (status["free_cpu"], status["free_ram"], status["free_gpu"]) == (6.0, 56, 1)
+    assert status["running"] is None and status["queued"] is None and status["snapshot"] is None
+
+    # someone else's cluster
+    db.execute.side_effect = None
+    row.scalars.return_value.first.return_value = None
+    with pytest.raises(HTTPException) as exc:
+        await cluster_crud.get_cluster_status(db, SimpleNamespace(id=8), 1)
+    assert exc.value.status_code == 404
+
+
+@pytest.mark.asyncio
+@pytest.mark.test
+async def test_publisher_registers_its_script_once():
+    r = MagicMock()
+    r.register_script.return_value = AsyncMock()
+    pipe = r.pipeline.return_value.__aenter__.return_value
+    pipe.execute = AsyncMock()
+    publisher = SnapshotPublisher(r, ttl=60)
+    ledger = ledger_with_one_cluster()
+
+    assert await publisher.publish([ledger[1]]) == 1
+    assert await publisher.publish([ledger[1]]) == 1
+    r.register_script.assert_called_once()
+    keys = r.register_script.return_value.await_args.kwargs["keys"]
+    assert keys[0] == "cluster_capacity:1" and pipe.execute.await_count == 2
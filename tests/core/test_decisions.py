@@ -0,0 +1,124 @@
+import asyncio
+import json
+from collections import namedtuple
+from contextlib import asynccontextmanager
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from app.core import run_deployments, scheduler_db
+from app.core.ledger import ResourceLedger
+from app.models.Deployment import DeploymentStatus
+from tests.core.factories import job
+
+Queued = namedtuple("Queued", "id gang_id gang_size")
+
+
+def result(scalars=None, tuples=None, rows=None):
+    res = MagicMock()
+    res.scalars.return_value.all.return_value = scalars or []
+    res.tuples.return_value = tuples or []
+    res.all.return_value = rows or []
+    return res
+
+
+@pytest.mark.asyncio
+@pytest.mark.test
+async def test_apply_decisions_uses_a_fixed_number_of_statements(monkeypatch):
+    session = AsyncMock()
+    session.execute.side_effect = [
+        result(scalars=[1]),                                       # lock clusters
+        result(tuples=[(5, 1, None, 2.0, 10, 0)]),                 # requeue preempted
+        result(),                                                  # outbox rows for them
+        result(rows=[Queued(6, None, None), Queued(7, "g", 2)]),   # queued among scheduled
+        result(tuples=[(6, 1, None, 4.0, 10, 0)]),                 # start
+        result(),                                                  # cluster capacity
+    ]
+
+    @asynccontextmanager
+    async def factory():
+        yield session
+
+    monkeypatch.setattr(scheduler_db, "AsyncSessionLocal", factory)
+    message = {"deployment_id": 5, "priority": "LOW"}
+    applied = await scheduler_db.apply_decisions({1: ([6, 7, 9], {5: message}, {}), 2: ([8], {}, {})})
+
+    # cluster 2 is gone; gang "g" has only one of its two members scheduled; 9 is no longer queued
+    assert applied == {1: ([6], [5], [9])}
+    assert session.execute.await_count == 6
+    # the preempted job's queue message is written in the same transaction
+    assert session.execute.await_args_list[2].args[1] == [{"deployment_id": 5, "payload": message}]
+    session.commit.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+@pytest.mark.test
+async def test_commit_decisions_applies_committed_jobs_to_ledger(monkeypatch):
+    ledger = ResourceLedger()
+    ledger.load({1: {'cluster_id': 1, 'total_cpu': 10.0, 'total_ram': 100, 'total_gpu': 0}}, [job(5, 'LOW', 6.0)])
+    monkeypatch.setattr(run_deployments, "apply_decisions", AsyncMock(return_value={1: ([6], [5], [8])}))
+    publish = AsyncMock()
+    monkeypatch.setattr(run_deployments, "publish_transitions", publish)
+    queue = AsyncMock()
+
+    # 7 was refused by the DB (e.g. its gang is incomplete there), 8 is no longer queued
+    scheduled = {1: [job(6, 'HIGH', 8.0), job(7, 'LOW', 1.0), job(8, 'LOW', 1.0)], 2: [job(9, 'LOW', 1.0, cluster_id=2)]}
+    decisions = {1: (scheduled[1], [job(5, 'LOW', 6.0)]), 2: (scheduled[2], [])}
+    settled = await run_deployments.commit_decisions(queue, ledger, decisions, asyncio.Semaphore(1))
+
+    assert settled == {6, 8}
+    # step 8 releases the claimed jobs that are still QUEUED in the DB
+    assert run_deployments.unsettled(decisions, scheduled, settled) == [7, 9]
+    assert list(ledger[1].running) == [6]
+    assert ledger[1].available()['cpu'] == 2.0
+    # the preempted job is requeued by apply_decisions (through the outbox), not pushed here
+    queue.push.assert_not_awaited()
+    assert run_deployments.apply_decisions.await_args.args[0][1][1][5]['deployment_id'] == 5
+    transitions = publish.await_args.args[1]
+    assert [(t['deployment_id'], t['previous'], t['status'], t['reason']) for t in transitions] == [
+        ("5", "RUNNING", "QUEUED", "preempted"), ("6", "QUEUED", "RUNNING", ""),
+    ]
+
+
+@pytest.mark.asyncio
+@pytest.mark.test
+async def test_finished_events_mark_jobs_and_release_ledger(monkeypatch):
+    ledger = ResourceLedger()
+    ledger.load({1: {'cluster_id': 1, 'total_cpu': 10.0, 'total_ram': 100, 'total_gpu': 0}}, [job(5, 'LOW', 6.0)])
+    finished = AsyncMock(return_value=[5])
+    monkeypatch.setattr(run_deployments, "mark_jobs_finished", finished)
+    monkeypatch.setattr(run_deployments, "publish_transitions", AsyncMock())
+    r = AsyncMock()
+    r.lpop.return_value = [json.dumps({"event": "completed", "deployment_id": 5, "cluster_id": 1})]
+
+    assert await run_deployments.apply_deployment_events(r, ledger) == 1
+    finished.assert_awaited_once_with(1, [5], DeploymentStatus.COMPLETED)
+    assert ledger[1].available()['cpu'] == 10.0
+
+
+@pytest.mark.asyncio
+@pytest.mark.test
+async def test_expired_gang_members_are_failed_not_left_queued(monkeypatch):
+    session = AsyncMock()
+    session.execute.return_value = result(tuples=[(1, 4), (2, None)])
+
+    @asynccontextmanager
+    async def factory():
+        yield session
+
+    monkeypatch.setattr(scheduler_db, "AsyncSessionLocal", factory)
+    publish = AsyncMock()
+    monkeypatch.setattr(run_deployments, "publish_transitions", publish)
+    expired = {"g": [{'id': 1, 'gang_id': "g"}, {'id': 2, 'gang_id': "g"}]}
+
+    assert await run_deployments.fail_expired_gangs(AsyncMock(), expired) == []
+    sql = str(session.execute.await_args.args[0])
+    assert sql.startswith("UPDATE deployments SET status") and "RETURNING" in sql
+    session.commit.assert_awaited_once()
+    assert [(t['deployment_id'], t['status'], t['reason']) for t in publish.await_args.args[1]] == [
+        ("1", "FAILED", "gang incomplete"), ("2", "FAILED", "gang incomplete"),
+    ]
+
+    # if the rows cannot be updated the members go back to their queue instead of being acked
+    session.execute.side_effect = RuntimeError("db down")
+    assert await run_deployments.fail_expired_gangs(AsyncMock(), expired) == [1, 2]
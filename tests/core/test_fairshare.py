@@ -0,0 +1,70 @@
+from collections import Counter
+
+import pytest
+
+from app.core.algorithm import schedule_jobs
+from app.core.fairshare import FairSharePolicy, parse_weights
+from app.core.ledger import ResourceLedger
+from tests.core.factories import job
+
+
+TOTAL = {'cpu': 60.0, 'ram': 1000, 'gpu': 0}
+
+
+def started_by(scheduled, key='organization_id'):
+    return Counter(j[key] for j in scheduled)
+
+
+@pytest.mark.test
+def test_drf_stops_one_tenant_from_taking_the_cluster():
+    flood = [job(i, 'LOW', 10.0, organization_id=1) for i in range(10)]
+    others = [job(100 + i, 'LOW', 10.0, organization_id=2) for i in range(3)]
+
+    scheduled, _ = schedule_jobs(flood + others, [], TOTAL)
+    assert started_by(scheduled) == {1: 6}
+
+    scheduled, _ = schedule_jobs(flood + others, [], TOTAL, fair_share=FairSharePolicy())
+    assert started_by(scheduled) == {1: 3, 2: 3}
+
+
+@pytest.mark.test
+def test_drf_counts_running_jobs_and_weights():
+    running = [job(50, 'HIGH', 20.0, organization_id=1)]
+    queue = [job(i, 'LOW', 5.0, organization_id=1) for i in range(10)] + [job(100 + i, 'LOW', 5.0, organization_id=2) for i in range(10)]
+
+    scheduled, _ = schedule_jobs(queue, running, TOTAL, fair_share=FairSharePolicy())
+    assert started_by(scheduled) == {1: 2, 2: 6}    # both end at 30 cpu
+
+    policy = FairSharePolicy(org_weights=parse_weights("2:3"))
+    scheduled, _ = schedule_jobs(queue, [], TOTAL, fair_share=policy)
+    assert started_by(scheduled) == {1: 3, 2: 9}
+
+
+@pytest.mark.test
+def test_drf_by_owner_within_an_organization():
+    queue = [job(i, 'LOW', 10.0, organization_id=1, owner_id=7) for i in range(6)] + [job(10, 'LOW', 10.0, organization_id=1, owner_id=8)]
+
+    scheduled, _ = schedule_jobs(queue, [], {'cpu': 40.0, 'ram': 1000, 'gpu': 0}, fair_share=FairSharePolicy())
+    assert 10 not in {j['id'] for j in scheduled}  # the first four jobs in score order
+
+    policy = FairSharePolicy(by_owner=True)
+    scheduled, _ = schedule_jobs(queue, [], {'cpu': 40.0, 'ram': 1000, 'gpu': 0}, fair_share=policy)
+    assert started_by(scheduled, 'owner_id') == {7: 3, 8: 1}
+
+
+@pytest.mark.test
+def test_drf_preemption_refunds_victim_share():
+    running = [job(50, 'LOW', 30.0, organization_id=1, owner_id=1), job(51, 'LOW', 30.0, organization_id=2, owner_id=1)]
+    queue = [job(1, 'HIGH', 30.0, organization_id=2), job(2, 'HIGH', 30.0, organization_id=1)]
+    ledger = ResourceLedger()
+    ledger.load({1: {'cluster_id': 1, 'organization_id': 1, 'total_cpu': 60.0, 'total_ram': 1000, 'total_gpu': 0}}, running)
+    cluster = ledger[1]
+
+    scheduled, preempted = schedule_jobs(
+        queue, cluster.preemptible_jobs(), cluster.total, cluster.available(),
+        fair_share=FairSharePolicy(), tenant_usage=cluster.tenant_usage()
+    )
+    assert sorted(j['id'] for j in scheduled) == [1, 2]
+    assert sorted(j['id'] for j in preempted) == [50, 51]
+    assert cluster.tenant_usage() == {(1, 1): {'cpu': 30.0, 'ram': 1, 'gpu': 0},
+                                      (2, 1): {'cpu': 30.0, 'ram': 1, 'gpu': 0}}
@@ -0,0 +1,115 @@
+import json
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+import pytest
+
+from app.core import run_deployments
+from app.core.algorithm import schedule_jobs
+from app.core.gang import GangBuffer
+from app.core.ledger import ClusterLedger
+from app.core.run_deployments import claim_gang_members, claim_scope, normalize_messages
+from app.core.vectorized import schedule_jobs_vectorized
+from app.crud.deployment import gang_error
+from app.models.Deployment import PriorityLevel
+from app.schemas.deployment import PriorityLevelEnum
+from tests.core.factories import job
+
+
+TOTAL = {'cpu': 64.0, 'ram': 100, 'gpu': 4}
+
+
+def ids(jobs):
+    return sorted(j['id'] for j in jobs)
+
+
+@pytest.mark.test
+@pytest.mark.parametrize("engine", [schedule_jobs, schedule_jobs_vectorized])
+def test_gang_starts_whole_or_not_at_all(engine):
+    running = [job(50, 'HIGH', 1.0, gpu=1)]
+    gang = [job(i, 'LOW', 4.0, gpu=1, gang_id="train", gang_size=4) for i in range(1, 5)]
+    scheduled, _ = engine(gang + [job(9, 'LOW', 1.0, gpu=1)], running, TOTAL)
+    assert ids(scheduled) == [9]
+
+    scheduled, _ = engine(gang, [], TOTAL)
+    assert ids(scheduled) == [1, 2, 3, 4]
+
+    # a gang that is not fully queued yet never starts partially
+    scheduled, _ = engine(gang[:3], [], TOTAL)
+    assert scheduled == []
+
+
+@pytest.mark.test
+def test_running_gang_is_preempted_as_a_whole():
+    running = [job(50 + i, 'LOW', 2.0, gpu=1, gang_id="sweep", gang_size=3) for i in range(3)] + [job(60, 'LOW', 8.0, gpu=1)]
+    scheduled, preempted = schedule_jobs([job(1, 'HIGH', 4.0, gpu=3)], running, TOTAL, preemption="largest-first")
+    assert ids(scheduled) == [1]
+    assert ids(preempted) == [50, 51, 52]
+
+    # evicting the single job is cheaper than evicting all three sweep members
+    scheduled, preempted = schedule_jobs(
+        [job(1, 'HIGH', 1.0, gpu=1, gang_id="ddp", gang_size=2), job(2, 'HIGH', 1.0, gang_id="ddp", gang_size=2)], running, TOTAL
+    )
+    assert ids(scheduled) == [1, 2]
+    assert ids(preempted) == [60]
+
+
+@pytest.mark.test
+def test_gang_members_are_packed_onto_nodes_atomically():
+    nodes = [
+        {'id': n, 'total_cpu': 16.0, 'total_ram': 50, 'total_gpu': 2, 'cpu': 16.0, 'ram': 50, 'gpu': 2}
+        for n in (1, 2)
+    ]
+    gang = [job(i, 'LOW', 2.0, gpu=2, gang_id="ddp", gang_size=2) for i in (1, 2)]
+    scheduled, _ = schedule_jobs(gang, [], TOTAL, nodes=nodes)
+    assert sorted(j['node_id'] for j in scheduled) == [1, 2]
+
+    # three 2-GPU members cannot all get a node, so none is placed and the
+    # nodes stay free for the single job behind the gang
+    big = [job(i, 'HIGH', 2.0, gpu=2, gang_id="big", gang_size=3) for i in (1, 2, 3)]
+    scheduled, _ = schedule_jobs(big + [job(9, 'LOW', 2.0, gpu=2)], [], {'cpu': 64.0, 'ram': 100, 'gpu': 6}, nodes=nodes)
+    assert ids(scheduled) == [9]
+
+
+@pytest.mark.test
+def test_gang_buffer_waits_for_all_members():
+    buffer = GangBuffer(timeout=60)
+    first = [job(1, 'LOW', 1.0, gang_id="g", gang_size=2), job(5, 'LOW', 1.0), job(7, 'LOW', 1.0, gang_id="h", gang_size=2)]
+    assert ids(buffer.add(first, now=0)) == [5]
+    assert ids(buffer.add([job(2, 'LOW', 1.0, gang_id="g", gang_size=2)], now=10)) == [1, 2]
+    assert buffer.expire(now=59) == {}
+    assert {g: ids(m) for g, m in buffer.expire(now=60).items()} == {"h": [7]}
+    assert len(buffer) == 0
+
+
+def message(dep_id, priority):
+    return json.dumps({'deployment_id': dep_id, 'priority': priority, 'required_cpu': 1.0, 'required_ram': 1,
+                       'required_gpu': 0, 'cluster_id': 1, 'gang_id': "g", 'gang_size': 2})
+
+
+@pytest.mark.asyncio
+@pytest.mark.test
+async def test_mixed_priority_gang_on_a_full_cluster(monkeypatch):
+    # a full cluster with only LOW jobs running is only claimed from for HIGH jobs,
+    # so a gang's LOW members would never join its HIGH ones: such gangs are refused
+    full = ClusterLedger(1, {'cpu': 4.0, 'ram': 8, 'gpu': 0}, [{'id': 50, 'priority': 'LOW', 'cpu': 4.0, 'ram': 8, 'gpu': 0}])
+    assert claim_scope([full]) == "high"
+    high = SimpleNamespace(organization_id=3, any_cluster=False, cluster_id=1, gang_size=2, priority=PriorityLevel.HIGH)
+    data = SimpleNamespace(gang_id="g", gang_size=2, priority=PriorityLevelEnum.LOW)
+    assert "same priority" in gang_error(data, 1, 3, [high])
+    data.priority = PriorityLevelEnum.HIGH
+    assert gang_error(data, 1, 3, [high]) is None
+
+    # the first member was claimed alone (CLAIM_LIMIT); the other is claimed in the same cycle
+    buffer = GangBuffer(timeout=60)
+    assert buffer.add(normalize_messages([(1, message(1, 'HIGH'))]), now=0) == []
+    monkeypatch.setattr(run_deployments, "fetch_queued_gang_members", AsyncMock(return_value=[1, 2]))
+    asked = []
+
+    async def claim_ids(ids):
+        asked.append(list(ids))
+        return [(2, message(2, 'HIGH'))]
+
+    rest = await claim_gang_members(SimpleNamespace(claim_ids=claim_ids), list(buffer.waiting), {1})
+    assert asked == [[2]]
+    assert ids(buffer.add(normalize_messages(rest), now=0)) == [1, 2] and len(buffer) == 0
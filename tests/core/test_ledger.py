@@ -0,0 +1,72 @@
+import pytest
+
+from app.core.algorithm import schedule_jobs
+from app.core.vectorized import schedule_jobs_vectorized
+from app.core.ledger import ResourceLedger
+from tests.core.factories import job
+
+
+RESOURCES = {
+    1: {'cluster_id': 1, 'total_cpu': 100.0, 'total_ram': 1000, 'total_gpu': 8},
+    2: {'cluster_id': 2, 'total_cpu': 10.0, 'total_ram': 100, 'total_gpu': 0},
+}
+
+
+@pytest.fixture
+def ledger():
+    ledger = ResourceLedger()
+    ledger.load(RESOURCES, [job(1, 'HIGH', 10.0, 100, 2), job(2, 'LOW', 20.0, 50, 1)])
+    return ledger
+
+
+@pytest.mark.test
+def test_ledger_tracks_free_capacity(ledger):
+    assert ledger[1].available() == {'cpu': 70.0, 'ram': 850, 'gpu': 5}
+    assert [j['id'] for j in ledger[1].preemptible_jobs()] == [2]
+    assert ledger[2].available() == {'cpu': 10.0, 'ram': 100, 'gpu': 0}
+
+
+@pytest.mark.test
+def test_ledger_events_update_incrementally(ledger):
+    ledger.on_scheduled(1, [job(3, 'LOW', 5.0, 10, 0)])
+    assert ledger[1].available() == {'cpu': 65.0, 'ram': 840, 'gpu': 5}
+    assert ledger.on_released(2)['id'] == 2
+    assert ledger.on_released(2) is None
+    assert ledger[1].available() == {'cpu': 85.0, 'ram': 890, 'gpu': 6}
+    assert [j['id'] for j in ledger[1].preemptible_jobs()] == [3]
+
+
+@pytest.mark.test
+def test_ledger_reconcile_rebuilds_drifted_clusters(ledger):
+    ledger.on_released(1)  # e.g. a missed event would leave this out of sync
+    drifted = ledger.reconcile(
+        {1: RESOURCES[1]},
+        [job(1, 'HIGH', 10.0, 100, 2), job(2, 'LOW', 20.0, 50, 1)]
+    )
+    assert sorted(drifted) == [1, 2]
+    assert 2 not in ledger
+    assert ledger[1].available() == {'cpu': 70.0, 'ram': 850, 'gpu': 5}
+    assert ledger.reconcile({1: RESOURCES[1]}, list(ledger[1].running.values())) == []
+
+
+@pytest.mark.test
+def test_ledger_accepts_running_grouped_by_cluster():
+    grouped = ResourceLedger()
+    grouped.load(RESOURCES, {1: [job(1, 'HIGH', 10.0, 100, 2), job(2, 'LOW', 20.0, 50, 1)]})
+    assert grouped[1].available() == {'cpu': 70.0, 'ram': 850, 'gpu': 5}
+    assert grouped[2].available() == {'cpu': 10.0, 'ram': 100, 'gpu': 0}
+    assert grouped.reconcile(RESOURCES, {1: list(grouped[1].running.values())}) == []
+
+
+@pytest.mark.test
+def test_schedule_jobs_with_ledger_matches_full_state(ledger):
+    queue = [job(10, 'HIGH', 60.0, 500, 6), job(11, 'LOW', 50.0, 10, 0)]
+    running = list(ledger[1].running.values())
+    total = ledger[1].total
+
+    expected = schedule_jobs(queue, running, total)
+    actual = schedule_jobs(queue, ledger[1].preemptible_jobs(), total, ledger[1].available())
+    assert actual == expected
+    assert [j['id'] for j in actual[1]] == [2]
+    vectorized = schedule_jobs_vectorized(queue, ledger[1].preemptible_jobs(), total, ledger[1].available())
+    assert vectorized == expected
@@ -0,0 +1,51 @@
+from contextlib import asynccontextmanager
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from app.core import outbox
+
+
+def fake_session(rows):
+    session = AsyncMock()
+    selected = MagicMock()
+    selected.all.return_value = rows
+    session.execute.side_effect = [selected, MagicMock()]
+
+    @asynccontextmanager
+    async def factory():
+        yield session
+
+    return session, factory
+
+
+@pytest.mark.asyncio
+@pytest.mark.test
+async def test_relay_pushes_one_batch_and_marks_it_delivered(monkeypatch):
+    rows = [(1, {'deployment_id': 10}), (2, {'deployment_id': 11})]
+    session, factory = fake_session(rows)
+    pushed = []
+    monkeypatch.setattr(outbox, "AsyncSessionLocal", factory)
+    monkeypatch.setattr(outbox, "push_deployments_to_queue", AsyncMock(side_effect=lambda msgs: pushed.extend(msgs)))
+
+    assert await outbox.relay_batch(100) == 2
+    assert pushed == [{'deployment_id': 10}, {'deployment_id': 11}]
+    select_stmt, update_stmt = (call.args[0] for call in session.execute.await_args_list)
+    assert "FOR UPDATE SKIP LOCKED" in str(select_stmt.compile(dialect=postgresql.dialect()))
+    assert str(update_stmt).startswith("UPDATE deployment_outbox")
+    session.commit.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+@pytest.mark.test
+async def test_rows_stay_undelivered_when_the_push_fails(monkeypatch):
+    session, factory = fake_session([(1, {'deployment_id': 10})])
+    monkeypatch.setattr(outbox, "AsyncSessionLocal", factory)
+    monkeypatch.setattr(outbox, "push_deployments_to_queue", AsyncMock(side_effect=ConnectionError("redis down")))
+
+    with pytest.raises(ConnectionError):
+        await outbox.relay_batch(100)
+    assert session.execute.await_count == 1
+    session.commit.assert_not_awaited()
+
@@ -0,0 +1,93 @@
+import random
+
+import pytest
+
+from app.core.algorithm import schedule_jobs
+from app.core.ledger import ResourceLedger
+from app.core.packing import NodePacker
+from tests.core.factories import job
+
+
+def node(id, cpu, ram, gpu, free=None):
+    free = free or (cpu, ram, gpu)
+    return {
+        'id': id, 'total_cpu': cpu, 'total_ram': ram, 'total_gpu': gpu,
+        'cpu': free[0], 'ram': free[1], 'gpu': free[2],
+    }
+
+
+TOTAL = {'cpu': 64.0, 'ram': 512, 'gpu': 4}
+ONE_GPU_NODES = [node(i, 16.0, 128, 1) for i in range(1, 5)]
+
+
+@pytest.mark.test
+def test_job_larger_than_any_node_is_not_scheduled():
+    queue = [job(1, 'HIGH', 4.0, 16, 4)]
+    assert schedule_jobs(queue, [], TOTAL)[0]                      # scalar view says it fits
+    assert schedule_jobs(queue, [], TOTAL, nodes=ONE_GPU_NODES) == ([], [])
+
+
+@pytest.mark.test
+def test_best_fit_packs_tightest_node_and_worst_fit_spreads():
+    nodes = [node(1, 32.0, 256, 2), node(2, 8.0, 64, 1), node(3, 16.0, 128, 1)]
+    queue = [job(1, 'LOW', 4.0, 32, 1), job(2, 'LOW', 2.0, 16, 0)]
+
+    scheduled, _ = schedule_jobs(queue, [], TOTAL, nodes=nodes)
+    assert {j['id']: j['node_id'] for j in scheduled} == {1: 2, 2: 2}
+
+    scheduled, _ = schedule_jobs(queue, [], TOTAL, nodes=nodes, packing="worst-fit")
+    assert {j['id']: j['node_id'] for j in scheduled} == {1: 1, 2: 1}
+
+
+@pytest.mark.test
+def test_node_preemption_evicts_only_from_the_hosting_node():
+    nodes = [node(1, 16.0, 128, 2, free=(8.0, 64, 1)), node(2, 16.0, 128, 2, free=(8.0, 64, 0))]
+    running = [
+        job(10, 'LOW', 8.0, 64, 1, node_id=1),
+        job(11, 'LOW', 4.0, 32, 1, node_id=2),
+        job(12, 'LOW', 4.0, 32, 1, node_id=2),
+    ]
+    total = {'cpu': 32.0, 'ram': 256, 'gpu': 4}
+    available = {'cpu': 16.0, 'ram': 128, 'gpu': 1}
+
+    scheduled, preempted = schedule_jobs(
+        [job(1, 'HIGH', 8.0, 64, 2)], running, total, available, nodes=nodes
+    )
+    assert [(j['id'], j['node_id']) for j in scheduled] == [(1, 1)]
+    assert [j['id'] for j in preempted] == [10]
+
+
+@pytest.mark.test
+def test_packer_index_stays_consistent():
+    rng = random.Random(7)
+    nodes = [node(i, float(rng.choice([8, 16, 32])), rng.choice([64, 128]), rng.randint(0, 8))
+             for i in range(2000)]
+    packer = NodePacker(nodes)
+    placed = []
+    for i in range(3000):
+        j = job(i, 'LOW', float(rng.randint(1, 8)), rng.randint(1, 64), rng.randint(0, 2))
+        node_id = packer.place(j)
+        if node_id is not None:
+            placed.append((node_id, j))
+    for node_id, j in placed[::2]:
+        packer.release(node_id, j)
+
+    entries = sorted(e for bucket in packer.buckets.values() for e in bucket)
+    expected = sorted((f['cpu'], f['ram'], nid) for nid, f in packer.free.items())
+    assert entries == expected
+    assert packer.levels == sorted(packer.buckets)
+    assert all(f[r] >= 0 for f in packer.free.values() for r in ('cpu', 'ram', 'gpu'))
+
+
+@pytest.mark.test
+def test_ledger_tracks_node_capacity():
+    resources = {1: {'cluster_id': 1, 'total_cpu': 64.0, 'total_ram': 512, 'total_gpu': 4}}
+    db_nodes = {1: [{'id': 1, 'total_cpu': 16.0, 'total_ram': 128, 'total_gpu': 1}]}
+    ledger = ResourceLedger()
+    ledger.load(resources, [job(1, 'LOW', 4.0, 32, 1, node_id=1)], db_nodes)
+
+    assert ledger[1].node_capacity()[0]['gpu'] == 0
+    ledger.on_released(1)
+    assert ledger[1].node_capacity()[0] == {
+        'id': 1, 'total_cpu': 16.0, 'total_ram': 128, 'total_gpu': 1, 'cpu': 16.0, 'ram': 128, 'gpu': 1,
+    }
@@ -0,0 +1,59 @@
+import pytest
+
+from app.core.ledger import ResourceLedger
+from app.core.placement import OrgCapacityIndex, assign_clusters
+from tests.core.factories import job
+
+
+RESOURCES = {
+    1: {'cluster_id': 1, 'organization_id': 1, 'total_cpu': 100.0, 'total_ram': 1000, 'total_gpu': 8},
+    2: {'cluster_id': 2, 'organization_id': 1, 'total_cpu': 100.0, 'total_ram': 1000, 'total_gpu': 8},
+    3: {'cluster_id': 3, 'organization_id': 2, 'total_cpu': 400.0, 'total_ram': 4000, 'total_gpu': 32},
+}
+
+
+@pytest.fixture
+def ledger():
+    running = [
+        {'id': 100, 'priority': 'HIGH', 'cpu': 60.0, 'ram': 500, 'gpu': 4, 'cluster_id': 1},
+        {'id': 101, 'priority': 'LOW', 'cpu': 20.0, 'ram': 100, 'gpu': 4, 'cluster_id': 2},
+    ]
+    ledger = ResourceLedger()
+    ledger.load(RESOURCES, running)
+    return ledger
+
+
+def index_for(ledger, policy, pending=None):
+    pending = pending or {}
+    clusters = ledger.organization_clusters([1])
+    return OrgCapacityIndex((c.capacity(pending.get(c.cluster_id, ())) for c in clusters), policy)
+
+
+@pytest.mark.test
+def test_spread_and_pack_stay_inside_the_organization(ledger):
+    assigned, _ = assign_clusters([job(1, 'LOW', 10.0, 10, 0, cluster_id=None, organization_id=1)], index_for(ledger, "spread"))
+    assert assigned[0]['cluster_id'] == 2        # most headroom (cpu 80%)
+
+    assigned, _ = assign_clusters([job(1, 'LOW', 10.0, 10, 0, cluster_id=None, organization_id=1)], index_for(ledger, "pack"))
+    assert assigned[0]['cluster_id'] == 1        # fullest cluster that still fits
+
+
+@pytest.mark.test
+def test_placements_reserve_capacity_within_a_cycle(ledger):
+    jobs = [job(i, 'LOW', 30.0, 100, 0, cluster_id=None, organization_id=1) for i in range(1, 5)]
+    assigned, unplaced = assign_clusters(jobs, index_for(ledger, "spread"))
+    assert sorted(j['cluster_id'] for j in assigned) == [1, 2, 2]
+    assert [j['id'] for j in unplaced] == [4]
+
+
+@pytest.mark.test
+def test_pending_pinned_jobs_and_preemption_fallback(ledger):
+    pending = {2: [{'id': 50, 'priority': 'HIGH', 'cpu': 70.0, 'ram': 100, 'gpu': 0}]}
+    index = index_for(ledger, "spread", pending)
+
+    # no free room anywhere, but cluster 2 can preempt its LOW job for a HIGH one
+    assigned, unplaced = assign_clusters(
+        [job(1, 'LOW', 30.0, 10, 6, cluster_id=None, organization_id=1), job(2, 'HIGH', 5.0, 10, 6, cluster_id=None, organization_id=1)], index
+    )
+    assert [(j['id'], j['cluster_id']) for j in assigned] == [(2, 2)]
+    assert [j['id'] for j in unplaced] == [1]
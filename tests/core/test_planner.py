@@ -0,0 +1,61 @@
+import asyncio
+import random
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.core.backfill import RuntimeEstimator
+from app.core.fairshare import FairSharePolicy
+from app.core.planner import plan_clusters
+from app.core.vectorized import schedule_jobs_vectorized
+
+
+def random_jobs(rng, n, start, cluster_id):
+    return [
+        {'id': start + i, 'priority': rng.choice(['HIGH', 'LOW']), 'cpu': float(rng.randint(1, 8)),
+         'ram': rng.randint(1, 32), 'gpu': rng.randint(0, 2), 'cluster_id': cluster_id,
+         'organization_id': rng.randint(1, 3), 'owner_id': rng.randint(1, 5), 'image': rng.choice('abc')}
+        for i in range(n)
+    ]
+
+
+def plans(seed=7):
+    rng = random.Random(seed)
+    estimator = RuntimeEstimator.from_history(
+        {'image': rng.choice('abc'), 'owner_id': rng.randint(1, 5),
+         'started_at': datetime(2024, 1, 1), 'finished_at': datetime(2024, 1, 1) + timedelta(minutes=rng.randint(1, 90))}
+        for _ in range(50)
+    )
+    out = {}
+    for cid in (1, 2, 3):
+        total = {'cpu': 200.0, 'ram': 800, 'gpu': 40}
+        running = random_jobs(rng, 30, 1000 * cid, cid)
+        available = {r: total[r] - sum(j[r] for j in running) for r in total}
+        out[cid] = dict(
+            schedule=schedule_jobs_vectorized,
+            new_jobs=random_jobs(rng, 80, 1000 * cid + 100, cid),
+            preemptible=[j for j in running if j['priority'] == 'LOW'],
+            total=total,
+            available=available,
+            fair_share=FairSharePolicy() if cid == 2 else None,
+            estimator=estimator if cid == 3 else None,
+            running=running,
+        )
+    return out
+
+
+def decision_ids(decisions):
+    return {cid: (sorted(j['id'] for j in s), sorted(j['id'] for j in p)) for cid, (s, p) in decisions.items()}
+
+
+@pytest.mark.test
+def test_process_pool_gives_the_inline_decisions():
+    inline = asyncio.run(plan_clusters(plans()))
+    with ProcessPoolExecutor(2) as pool:
+        pooled = asyncio.run(plan_clusters(plans(), pool))
+        # clusters below min_jobs stay in this process
+        mixed = asyncio.run(plan_clusters(plans(), pool, min_jobs=10_000))
+    assert list(pooled) == [1, 2, 3]
+    assert decision_ids(pooled) == decision_ids(inline) == decision_ids(mixed)
+    assert all(s for s, _ in inline.values())
@@ -0,0 +1,64 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.core.algorithm import schedule_jobs
+from app.core.preemption import cheapest_cover, plan_preemption, job_preemption_cost
+from app.core.vectorized import schedule_jobs_vectorized
+from tests.core.factories import job
+
+NOW = datetime(2025, 6, 1, 12, 0)
+
+
+def with_cost(jobs):
+    return [dict(j, _cost=job_preemption_cost(j, NOW)) for j in jobs]
+
+
+@pytest.mark.test
+def test_plan_prefers_small_victims_over_gpu_job():
+    gpu_job = job(1, 'LOW', 8.0, 64, 4)
+    cpu_jobs = [job(2, 'LOW', 4.0, 8, 0), job(3, 'LOW', 4.0, 8, 0)]
+    victims = plan_preemption(
+        {'cpu': 6.0, 'ram': 0, 'gpu': 0},
+        with_cost([gpu_job] + cpu_jobs),
+        {'cpu': 0.0, 'ram': 100, 'gpu': 0}
+    )
+    assert sorted(v['id'] for v in victims) == [2, 3]
+
+
+@pytest.mark.test
+def test_plan_prefers_jobs_with_less_lost_work():
+    old = job(1, 'LOW', 4.0, 8, 0, started_at=NOW - timedelta(hours=10))
+    fresh = job(2, 'LOW', 4.0, 8, 0, started_at=NOW - timedelta(hours=0.1))
+    retried = job(3, 'LOW', 4.0, 8, 0, retry_count=5)
+    victims = plan_preemption(
+        {'cpu': 4.0, 'ram': 8, 'gpu': 0},
+        with_cost([old, fresh, retried]),
+        {'cpu': 0.0, 'ram': 0, 'gpu': 0}
+    )
+    assert [v['id'] for v in victims] == [2]
+
+
+@pytest.mark.test
+def test_cheapest_cover_beats_greedy_and_respects_budget():
+    # greedy by cost-effectiveness takes 0 then needs 1 (cost 10); {2} alone costs 8.5
+    freed = [(6.0, 0, 0), (4.0, 0, 0), (10.0, 0, 0)]
+    costs = [5.0, 5.0, 8.5]
+    assert cheapest_cover([10.0, 0, 0], freed, costs) == [2]
+    assert cheapest_cover([10.0, 0, 0], freed, costs, budget=0) == [0, 1]
+    assert cheapest_cover([30.0, 0, 0], freed, costs) is None
+
+
+@pytest.mark.test
+@pytest.mark.parametrize("engine", [schedule_jobs, schedule_jobs_vectorized])
+def test_min_cost_preemption_in_engines(engine):
+    running = [job(1, 'LOW', 8.0, 64, 4, started_at=NOW - timedelta(hours=3)), job(2, 'LOW', 4.0, 8, 0), job(3, 'LOW', 4.0, 9, 0)]
+    queue = [{'id': 10, 'priority': 'HIGH', 'cpu': 6.0, 'ram': 8, 'gpu': 0, 'cluster_id': 1}]
+    total = {'cpu': 16.0, 'ram': 100, 'gpu': 4}
+
+    scheduled, preempted = engine(queue, running, total, now=NOW)
+    assert [j['id'] for j in scheduled] == [10]
+    assert sorted(j['id'] for j in preempted) == [2, 3]
+
+    _, preempted = engine(queue, running, total, preemption="largest-first", now=NOW)
+    assert [j['id'] for j in preempted] == [1]
@@ -0,0 +1,31 @@
+import pytest
+
+from app.core.ledger import ClusterLedger
+from app.core.reliable_queue import parse_queue_key, push_args, queue_key, queue_score
+from app.core.run_deployments import claim_scope
+
+
+def msg(dep_id, priority, cluster_id=1, organization_id=7):
+    return {'deployment_id': dep_id, 'priority': priority, 'required_cpu': 1.0, 'required_ram': 1,
+            'required_gpu': 0, 'cluster_id': cluster_id, 'organization_id': organization_id}
+
+
+@pytest.mark.test
+def test_queue_keys_and_scores():
+    assert parse_queue_key(queue_key(msg(1, 'LOW'))) == ("cluster", 1)
+    assert parse_queue_key(queue_key(msg(1, 'LOW', cluster_id=None))) == ("org", 7)
+    # HIGH before LOW whatever the enqueue time, FIFO within a band
+    assert queue_score('HIGH', 2e9) < queue_score('LOW', 1.0) < queue_score('low', 2.0)
+    keys, args = push_args(msg(5, 'HIGH'), enqueued_at=100.0)
+    assert keys[2] == "deployment_queue:cluster:1" and args[0] == 5 and float(args[2]) == 100.0
+
+
+@pytest.mark.test
+def test_claim_scope_skips_clusters_that_cannot_start_anything():
+    total = {'cpu': 4.0, 'ram': 8, 'gpu': 0}
+    full_high = ClusterLedger(1, total, [{'id': 1, 'priority': 'HIGH', 'cpu': 4.0, 'ram': 8, 'gpu': 0}])
+    full_low = ClusterLedger(2, total, [{'id': 2, 'priority': 'LOW', 'cpu': 4.0, 'ram': 8, 'gpu': 0}])
+    empty = ClusterLedger(3, total)
+    assert claim_scope([full_high]) is None
+    assert claim_scope([full_high, full_low]) == "high"
+    assert claim_scope([full_low, empty]) == "all"
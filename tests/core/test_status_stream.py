@@ -0,0 +1,120 @@
+import json
+from datetime import datetime
+from unittest.mock import AsyncMock
+
+import pytest
+
+from app.core import status_stream
+from app.core.status_stream import RESET_SSE, StatusHub, decode, event_stream, format_sse, stream_id, transition
+from app.models.Deployment import DeploymentStatus
+
+
+def event(entry_id, dep_id, cluster_id, status="RUNNING"):
+    at = datetime(2024, 1, 1)
+    return decode(entry_id, transition(dep_id, cluster_id, status, DeploymentStatus.QUEUED, at))
+
+
+class Client:
+    def __init__(self, disconnect_after):
+        self.polls = 0
+        self.disconnect_after = disconnect_after
+
+    async def is_disconnected(self):
+        self.polls += 1
+        return self.polls > self.disconnect_after
+
+
+@pytest.mark.test
+def test_transitions_round_trip_and_format_as_sse():
+    e = event("1700000000000-3", 7, None)
+    assert e == {"id": "1700000000000-3", "deployment_id": 7, "cluster_id": None, "status": "RUNNING",
+                 "previous": "QUEUED", "reason": None, "at": "2024-01-01T00:00:00"}
+    lines = format_sse(e).splitlines()
+    assert lines[:2] == ["id: 1700000000000-3", "event: status"]
+    assert json.loads(lines[2].removeprefix("data: "))["deployment_id"] == 7
+    assert stream_id("10-2") < stream_id("10-10") < stream_id("11-0")
+
+
+@pytest.mark.asyncio
+@pytest.mark.test
+async def test_hub_routes_events_by_deployment_and_cluster(monkeypatch):
+    monkeypatch.setattr(status_stream, "STATUS_STREAM_BUFFER", 2)
+    hub = StatusHub()
+    monkeypatch.setattr(hub, "_read", AsyncMock())
+    by_dep = hub.subscribe(deployment_id=5)
+    by_cluster = hub.subscribe(cluster_id=1)
+    slow = hub.subscribe(cluster_id=2)
+
+    hub.dispatch([event("1-0", 5, 1), event("2-0", 6, 1), event("3-0", 7, 2), event("4-0", 8, 2), event("5-0", 9, 2)])
+
+    assert [by_dep.queue.get_nowait()["id"]] == ["1-0"] and by_dep.queue.empty()
+    assert [by_cluster.queue.get_nowait()["id"] for _ in range(2)] == ["1-0", "2-0"]
+    # the third event did not fit: the slow client is told to reconnect (and resume after 4-0) and dropped
+    assert slow.overflowed
+    assert [slow.queue.get_nowait() for _ in range(3)] == [event("3-0", 7, 2), event("4-0", 8, 2), None]
+    assert len(hub) == 2
+    hub.unsubscribe(by_dep)
+    hub.unsubscribe(by_cluster)
+    assert len(hub) == 0 and hub._reader is None
+
+
+@pytest.mark.asyncio
+@pytest.mark.test
+async def test_event_stream_replays_then_skips_duplicates(monkeypatch):
+    hub = StatusHub()
+    monkeypatch.setattr(hub, "_read", AsyncMock())
+    monkeypatch.setattr(hub, "replay", AsyncMock(return_value=[event("2-0", 5, 1), event("3-0", 5, 1)]))
+
+    stream = event_stream(Client(disconnect_after=2), deployment_id=5, last_event_id="1-0", hub=hub)
+    sent = [await stream.__anext__(), await stream.__anext__()]
+    # published while the replay was read: already sent, then a new one
+    hub.dispatch([event("3-0", 5, 1), event("4-0", 5, 1, "COMPLETED")])
+    sent += [chunk async for chunk in stream]
+
+    assert [chunk.split("\n")[0] for chunk in sent] == ["id: 2-0", "id: 3-0", "id: 4-0"]
+    hub.replay.assert_awaited_once_with("1-0", None, 5)
+    assert len(hub) == 0
+
+
+class Stream:
+    """xrange over a list of (id, fields) entries, recording the pages asked for."""
+
+    def __init__(self, entries):
+        self.entries = entries
+        self.calls = []
+
+    async def xrange(self, key, min, count):
+        self.calls.append(min)
+        after = stream_id(min.lstrip("("))
+        return [e for e in self.entries if stream_id(e[0]) > after][:count]
+
+
+@pytest.mark.asyncio
+@pytest.mark.test
+async def test_replay_pages_past_other_deployments_events(monkeypatch):
+    at = datetime(2024, 1, 1)
+    entries = [(f"{i}-0", transition(5 if i % 3 == 0 else 6, 1, "RUNNING", "QUEUED", at)) for i in range(1, 10)]
+    client = Stream(entries)
+    monkeypatch.setattr(status_stream, "init_redis", AsyncMock(return_value=client))
+    monkeypatch.setattr(status_stream, "_READ_COUNT", 2)
+    monkeypatch.setattr(status_stream, "STATUS_STREAM_REPLAY", 3)
+    hub = StatusHub()
+
+    # matches past the first page are still found
+    assert [e["id"] for e in await hub.replay("1-0", deployment_id=5)] == ["3-0", "6-0", "9-0"]
+    assert client.calls == ["(1-0", "(3-0", "(5-0", "(7-0", "(9-0"]
+    # more missed events than may be replayed
+    assert await hub.replay("0-0", cluster_id=1) is None
+
+
+@pytest.mark.asyncio
+@pytest.mark.test
+async def test_event_stream_sends_reset_when_replay_is_too_long(monkeypatch):
+    hub = StatusHub()
+    monkeypatch.setattr(hub, "_read", AsyncMock())
+    monkeypatch.setattr(hub, "replay", AsyncMock(return_value=None))
+
+    stream = event_stream(Client(disconnect_after=1), deployment_id=5, last_event_id="1-0", hub=hub)
+    assert await stream.__anext__() == RESET_SSE
+    hub.dispatch([event("9-0", 5, 1)])
+    assert [chunk.split("\n")[0] async for chunk in stream] == ["id: 9-0"]
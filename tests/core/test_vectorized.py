@@ -0,0 +1,59 @@
+import random
+
+import pytest
+
+from app.core.algorithm import schedule_jobs
+from app.core.vectorized import schedule_jobs_vectorized, greedy_pass
+
+import numpy as np
+
+
+def make_jobs(rng, n, start_id, running=False):
+    jobs = []
+    for i in range(n):
+        jobs.append({
+            'id': start_id + i,
+            'priority': rng.choice(['HIGH', 'LOW', 'low']),
+            'cpu': float(rng.randint(1, 40)),
+            'ram': rng.randint(1, 64),
+            'gpu': rng.randint(0, 4),
+            'cluster_id': 1,
+        })
+    return jobs
+
+
+@pytest.mark.test
+@pytest.mark.parametrize("preemption", ["min-cost", "largest-first"])
+@pytest.mark.parametrize("seed", range(20))
+def test_vectorized_matches_reference(seed, preemption):
+    rng = random.Random(seed)
+    queue = make_jobs(rng, rng.randint(0, 120), 1)
+    running = make_jobs(rng, rng.randint(0, 150), 10_000)
+    total = {'cpu': 400.0, 'ram': 700, 'gpu': 30}
+    used = {k: sum(j[k] for j in running) for k in ('cpu', 'ram', 'gpu')}
+    total = {k: max(total[k], used[k]) for k in total}
+
+    expected = schedule_jobs(queue, running, total, preemption=preemption)
+    actual = schedule_jobs_vectorized(queue, running, total, preemption=preemption)
+
+    assert [j['id'] for j in actual[0]] == [j['id'] for j in expected[0]]
+    assert [j['id'] for j in actual[1]] == [j['id'] for j in expected[1]]
+
+
+@pytest.mark.test
+def test_vectorized_returns_normalized_copies():
+    queue = [{'id': 1, 'priority': 'high', 'cpu': 1.0, 'ram': 1, 'gpu': 0, 'cluster_id': 1}]
+    scheduled, preempted = schedule_jobs_vectorized(queue, [], {'cpu': 4.0, 'ram': 4, 'gpu': 0})
+    assert scheduled == [{'id': 1, 'priority': 'HIGH', 'cpu': 1.0, 'ram': 1, 'gpu': 0, 'cluster_id': 1}]
+    assert preempted == []
+    assert queue[0]['priority'] == 'high'
+
+
+@pytest.mark.test
+def test_greedy_pass_skips_misfits_across_blocks():
+    demand = np.array([[1.0, 0, 0]] * 200 + [[50.0, 0, 0]] + [[1.0, 0, 0]] * 10)
+    accepted, available = greedy_pass(demand, np.array([205.0, 0, 0]))
+    assert accepted[:200].all()
+    assert not accepted[200]
+    assert accepted[201:206].all() and not accepted[206:].any()
+    assert available[0] == 0
@@ -0,0 +1,46 @@
+import pytest
+
+from app.core.victim_index import PreemptionIndex, VictimIndex
+from tests.core.factories import job
+
+
+@pytest.mark.test
+def test_victim_index_pop_restore_remove():
+    jobs = [job(i, 'LOW', cpu) for i, cpu in enumerate([5.0, 9.0, 9.0, 1.0])]
+    for ordinal, j in enumerate(jobs):
+        j['_ordinal'] = ordinal
+    index = VictimIndex(lambda j: -j['cpu'], jobs)
+
+    first = index.pop()
+    assert first['id'] == 1          # ties break by position in the running list
+    index.restore(first)
+    index.remove(2)
+    assert 2 not in index and len(index) == 3
+    assert [index.pop()['id'] for _ in range(3)] == [1, 0, 3]
+    assert index.pop() is None
+
+
+@pytest.mark.test
+def test_victim_index_compacts_tombstones():
+    jobs = [job(i, 'LOW', float(i)) for i in range(1000)]
+    for j in jobs:
+        j['_ordinal'] = j['id']
+    index = VictimIndex(lambda j: -j['cpu'], jobs)
+    for i in range(990):
+        index.remove(i)
+    assert len(index._heap) < 200
+    assert [index.pop()['id'] for _ in range(10)] == list(range(999, 989, -1))
+
+
+@pytest.mark.test
+def test_preemption_index_candidates_and_coverage():
+    jobs = [job(1, 'LOW', 8.0, ram=0, gpu=4, _cost=500.0), job(2, 'LOW', 2.0, ram=0, _cost=30.0), job(3, 'LOW', 2.0, ram=0, _cost=20.0), job(4, 'LOW', 0.0, ram=64, _cost=5.0)]
+    index = PreemptionIndex(jobs)
+    need = {'cpu': 3.0, 'ram': 0, 'gpu': 0}
+    free = {'cpu': 0.0, 'ram': 0, 'gpu': 0}
+
+    assert [j['id'] for j in index.candidates(need, free, per_resource=2)] == [2, 3]
+    assert index.can_cover({'cpu': 12.0, 'ram': 0, 'gpu': 0}, free)
+    index.remove(1)
+    assert not index.can_cover({'cpu': 12.0, 'ram': 0, 'gpu': 0}, free)
+    assert [j['id'] for j in index.candidates(need, free)] == [2, 3]